@@ -0,0 +1,37 @@
+import heapq
+
+
+def assign_interviewers(loads: dict, interviewed: dict, candidate_ids: list):
+    """
+    Pick the least loaded employee for every candidate, skipping the employees who already
+    interviewed the candidate, with a priority queue of the employees by their number of interviews
+
+    :param loads: Dictionary of employee id to number of interviews, the eligible employees
+    :param interviewed: Dictionary of candidate id to the set of employee ids who interviewed the candidate
+    :param candidate_ids: Ids of the candidates to be assigned, in order
+
+    :returns result: List of the assigned employee ids in the order of the candidates, None when no employee is left
+    """
+
+    # Ties go to the lowest employee id
+    queue = [(load, employee_id) for employee_id, load in loads.items()]
+    heapq.heapify(queue)
+
+    assigned = []
+    for candidate_id in candidate_ids:
+        # Set aside the employees the candidate already met, at most one per previous interview
+        excluded = interviewed.get(candidate_id, ())
+        skipped = []
+        while queue and queue[0][1] in excluded:
+            skipped.append(heapq.heappop(queue))
+
+        if queue:
+            load, employee_id = queue[0]
+            heapq.heapreplace(queue, (load + 1, employee_id))
+            assigned.append(employee_id)
+        else:
+            assigned.append(None)
+
+        for entry in skipped:
+            heapq.heappush(queue, entry)
+    return assigned
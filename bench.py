@@ -0,0 +1,304 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Routes are measured against this file unless --database is given
+BENCH_DATABASE = "bench.db"
+
+# Requests sent to every route unless --requests is given
+BENCH_REQUESTS = 50
+
+# Relative growth of the p95 latency reported as a regression by --compare
+BENCH_THRESHOLD = 0.2
+
+STATUSES = ["pre-hire", "active", "inactive"]
+DESIGNATIONS = ["CEO", "Developer", "Designer", "Manager"]
+FIRST_NAMES = ["aman", "asha", "dev", "gita", "hari", "jatin", "kiran", "mayank", "neha", "ravi", "sunil", "uma"]
+LAST_NAMES = ["bansal", "chopra", "gupta", "iyer", "jain", "kapoor", "mehta", "nair", "rao", "sharma", "verma"]
+
+
+def volumes(rows: int):
+    """
+    Number of records seeded in each table
+
+    :param rows: Number of candidates and interviews
+
+    :returns result: Dictionary of table name to number of records
+    """
+
+    return {"candidates": rows, "employees": max(rows // 10, 1), "interviews": rows}
+
+
+def seed(engine, rows: int, models, crud, search):
+    """
+    Fill the empty tables with the requested volumes
+
+    :param engine: Engine of the benchmark database
+    :param rows: Number of candidates and interviews
+    """
+
+    # Rows are numbered by their id so that the routes can address them without reading first,
+    # the names repeat like real ones do so that the search reads realistic trigram postings
+    counts = volumes(rows)
+    name = lambda i: f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]} {i}"
+    tables = {
+        models.Candidate: lambda i: {"id": i, "name": name(i), "email": f"candidate{i}@bench.test", "status": STATUSES[i % len(STATUSES)]},
+        models.Employee: lambda i: {"id": i, "name": name(i), "email": f"employee{i}@bench.test", "designation": DESIGNATIONS[i % len(DESIGNATIONS)]},
+        models.Interview: lambda i: {"id": i, "round": i % 3 + 1, "candidate_id": i, "employee_id": i % counts["employees"] + 1},
+    }
+    with engine.begin() as conn:
+        for model, row in tables.items():
+            table = model.__table__
+            for chunk in crud.chunked(range(1, counts[table.name] + 1), 10000):
+                conn.execute(table.insert(), [row(i) for i in chunk])
+
+    # The seed bypasses the crud functions, build the search index of the names afterwards
+    for model in search.INDEXES:
+        search.reindex(engine, model)
+
+
+def scenarios(rows: int):
+    """
+    Requests exercising every route, each scenario builds the request of its i-th iteration
+
+    :param rows: Number of candidates and interviews seeded
+
+    :returns result: List of (method, route path, request builder, maximum iterations)
+    """
+
+    counts = volumes(rows)
+    candidate = lambda i: {"name": f"bench {i}", "email": f"bench{i}@bench.test", "status": "active"}
+    employee = lambda i: {"name": f"bench {i}", "email": f"bench{i}@bench.test", "designation": "Developer"}
+    # The seeded interview of a candidate is with the employee at offset 0, new ones use other offsets
+    interview = lambda candidate_id, offset: {"round": offset + 2, "candidate_id": candidate_id, "employee_id": (candidate_id + offset) % counts["employees"] + 1}
+
+    # Reads come first, then the writes, then the deletes of the records the writes created
+    return [
+        ("GET", "/candidate/{candidate_id}", lambda i: ("/candidate/%d" % (i % counts["candidates"] + 1), None), None),
+        ("GET", "/candidates/", lambda i: ("/candidates/?status=active&count=exact&limit=10&skip=%d" % (i * 10 % max(counts["candidates"] // len(STATUSES) - 10, 1)), None), None),
+        ("GET", "/candidates/search", lambda i: ("/candidates/search?q=%s" % ["aman gu", "kirn", "neha sh", "jat"][i % 4], None), None),
+        ("GET", "/candidates/export", lambda i: ("/candidates/export", None), 3),
+        ("GET", "/employee/{employee_id}", lambda i: ("/employee/%d" % (i % counts["employees"] + 1), None), None),
+        ("GET", "/employees/", lambda i: ("/employees/?designation=Developer", None), None),
+        ("GET", "/employees/search", lambda i: ("/employees/search?q=%s" % ["asha", "dev bansl", "gita"][i % 3], None), None),
+        ("GET", "/employees/workload", lambda i: ("/employees/workload", None), None),
+        ("GET", "/employees/export", lambda i: ("/employees/export?format=csv", None), 3),
+        ("GET", "/interview/{interview_id}", lambda i: ("/interview/%d?expand=candidate,employee" % (i % counts["interviews"] + 1), None), None),
+        ("GET", "/interviews/", lambda i: ("/interviews/?round=1&expand=candidate", None), None),
+        ("GET", "/interviews/export", lambda i: ("/interviews/export", None), 3),
+        ("POST", "/candidate/", lambda i: ("/candidate/", candidate(i)), None),
+        ("POST", "/candidates/bulk", lambda i: ("/candidates/bulk", [candidate(f"{i}-{j}") for j in range(10)]), None),
+        ("PUT", "/candidate/{candidate_id}", lambda i: ("/candidate/%d" % (i % counts["candidates"] + 1), {"name": f"candidate {i % counts['candidates'] + 1}", "email": f"candidate{i % counts['candidates'] + 1}@bench.test", "status": "inactive"}), None),
+        ("POST", "/employee/", lambda i: ("/employee/", employee(i)), None),
+        ("POST", "/employees/bulk", lambda i: ("/employees/bulk", [employee(f"{i}-{j}") for j in range(10)]), None),
+        ("PUT", "/employee/{employee_id}", lambda i: ("/employee/%d" % (i % counts["employees"] + 1), {"name": f"employee {i % counts['employees'] + 1}", "email": f"employee{i % counts['employees'] + 1}@bench.test", "designation": "Manager"}), None),
+        ("POST", "/interview/", lambda i: ("/interview/", interview(i % counts["candidates"] + 1, 1)), None),
+        ("POST", "/interviews/bulk", lambda i: ("/interviews/bulk", [interview((i * 10 + j) % counts["candidates"] + 1, 2) for j in range(10)]), None),
+        ("POST", "/interviews/schedule", lambda i: ("/interviews/schedule", {"round": 6, "employee_id": (i + 3) % counts["employees"] + 1, "candidate_ids": [(i * 10 + j) % counts["candidates"] + 1 for j in range(10)]}), None),
+        ("PUT", "/interview/{interview_id}", lambda i: ("/interview/%d" % (i % counts["interviews"] + 1), interview(i % counts["interviews"] + 1, 0)), None),
+        ("PATCH", "/candidate/{candidate_id}", lambda i: ("/candidate/%d" % (i % counts["candidates"] + 1), {"status": "active"}), None),
+        ("PATCH", "/employee/{employee_id}", lambda i: ("/employee/%d" % (i % counts["employees"] + 1), {"designation": "Developer"}), None),
+        ("PATCH", "/interview/{interview_id}", lambda i: ("/interview/%d" % (i % counts["interviews"] + 1), {"round": 3}), None),
+        ("DELETE", "/interview/{interview_id}", lambda i: ("/interview/%d" % (counts["interviews"] + 1 + i), None), None),
+        ("DELETE", "/candidate/{candidate_id}", lambda i: ("/candidate/%d" % (counts["candidates"] + 1 + i), None), None),
+        ("DELETE", "/candidate/", lambda i: ("/candidate/?email=bench%d-0@bench.test" % i, None), None),
+        ("DELETE", "/employee/{employee_id}", lambda i: ("/employee/%d" % (counts["employees"] + 1 + i), None), None),
+        ("DELETE", "/employee/", lambda i: ("/employee/?email=bench%d-0@bench.test" % i, None), None),
+        ("DELETE", "/candidates/", lambda i: ("/candidates/", {"ids": [1], "emails": [f"bench{i}-{j}@bench.test" for j in range(1, 10)]}), None),
+        ("DELETE", "/employees/", lambda i: ("/employees/", {"ids": [1], "emails": [f"bench{i}-{j}@bench.test" for j in range(1, 10)]}), None),
+        # Runs after the employee deletes, the employees created above would otherwise be assigned and kept
+        ("POST", "/interviews/auto-assign", lambda i: ("/interviews/auto-assign", {"round": 8, "designation": "Developer", "candidate_ids": [(i * 100 + j) % counts["candidates"] + 1 for j in range(100)]}), None),
+        ("GET", "/changes", lambda i: ("/changes?since=%d&limit=100" % (i * 100), None), None),
+        ("GET", "/internal/pool", lambda i: ("/internal/pool", None), None),
+        ("GET", "/internal/cache", lambda i: ("/internal/cache", None), None),
+        ("GET", "/internal/startup", lambda i: ("/internal/startup", None), None),
+        ("GET", "/metrics", lambda i: ("/metrics", None), None),
+    ]
+
+
+def percentile(values: list, p: float):
+    """
+    Nearest rank percentile of sorted values
+
+    :param values: Sorted values
+    :param p: Percentile between 0 and 100
+
+    :returns result: Value at the percentile
+    """
+
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+@contextmanager
+def count_statements(engine):
+    # Count the statements sent to the database while the block runs
+    statements = []
+    listener = lambda conn, cursor, statement, parameters, context, executemany: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
+def run(client, engine, rows: int, requests: int):
+    """
+    Send the requests of every scenario and measure them
+
+    :param client: Test client of the app
+    :param engine: Sync engine the statements are counted on
+    :param rows: Number of candidates and interviews seeded
+    :param requests: Number of requests sent to every route
+
+    :returns result: Dictionary of route to its latency percentiles, throughput and queries per request
+    """
+
+    results = {}
+    for method, route, build, limit in scenarios(rows):
+        latencies = []
+        failures = 0
+        with count_statements(engine) as statements:
+            started = time.perf_counter()
+            for i in range(requests if limit is None else min(requests, limit)):
+                path, body = build(i)
+                begin = time.perf_counter()
+                res = client.request(method, path, json=body)
+                latencies.append(time.perf_counter() - begin)
+                failures += res.status_code >= 400
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        results[f"{method} {route}"] = {
+            "requests": len(latencies),
+            "failures": failures,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "throughput": len(latencies) / elapsed,
+            "queries": len(statements) / len(latencies),
+        }
+    return results
+
+
+def missing_routes(app, rows: int):
+    """
+    Routes of the app which no scenario measures
+
+    :param app: Fastapi app
+    :param rows: Number of candidates and interviews seeded
+
+    :returns result: Sorted "METHOD path" of the routes without a scenario
+    """
+
+    from fastapi.routing import APIRoute
+    covered = {f"{method} {route}" for method, route, build, limit in scenarios(rows)}
+    routes = {f"{method} {route.path}" for route in app.routes if isinstance(route, APIRoute) for method in route.methods}
+    return sorted(routes - covered)
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """
+    Routes which got slower or run more queries than in the baseline
+
+    :param results: Measurements of this run
+    :param baseline: Measurements of the baseline run
+    :param threshold: Relative growth of the p95 latency tolerated
+
+    :returns result: List of regression descriptions
+    """
+
+    regressions = []
+    for route, result in results.items():
+        before = baseline.get(route)
+        if before is None:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{route}: p95 {before['p95_ms']:.2f} ms -> {result['p95_ms']:.2f} ms")
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{route}: queries per request {before['queries']:.2f} -> {result['queries']:.2f}")
+    return regressions
+
+
+def report(settings: dict, results: dict):
+    """
+    Format the measurements as a table
+
+    :param settings: Volumes and options of the run
+    :param results: Measurements of every route
+
+    :returns result: Text of the report
+    """
+
+    lines = [
+        "Benchmark of %(candidates)d candidates, %(employees)d employees, %(interviews)d interviews, %(requests)d requests per route, async %(async)s" % settings,
+        "",
+        f"{'route':<36} {'requests':>8} {'failures':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'queries':>8}",
+    ]
+    for route, result in results.items():
+        lines.append(
+            f"{route:<36} {result['requests']:>8} {result['failures']:>8} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['p99_ms']:>9.2f} {result['throughput']:>9.1f} {result['queries']:>8.2f}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the latency, throughput and queries per request of every route against a seeded sqlite database")
+    parser.add_argument("--rows", type=int, default=1000, help="number of candidates and interviews to seed, Ex: 1000, 100000, 1000000")
+    parser.add_argument("--requests", type=int, default=BENCH_REQUESTS, help="number of requests sent to every route")
+    parser.add_argument("--database", default=BENCH_DATABASE, help="sqlite file seeded and measured")
+    parser.add_argument("--output", default="bench_output.txt", help="file the report is written to")
+    parser.add_argument("--save-baseline", metavar="PATH", help="store the measurements as the baseline")
+    parser.add_argument("--compare", metavar="PATH", help="fail when a route regressed against the baseline")
+    parser.add_argument("--threshold", type=float, default=BENCH_THRESHOLD, help="relative growth of the p95 latency tolerated by --compare")
+    args = parser.parse_args()
+
+    # The database module reads the connection string when it is imported
+    os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.database)}"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import crud, database, models, schema, search
+    from fastapi.testclient import TestClient
+    from main import app
+
+    # Every route has to be measured, a new route needs its scenario
+    missing = missing_routes(app, args.rows)
+    if missing:
+        sys.exit("Routes without a benchmark scenario: " + ", ".join(missing))
+
+    # Start from a fresh database, the previous run left its own writes behind
+    database.engine.dispose()
+    if os.path.exists(args.database):
+        os.remove(args.database)
+    schema.sync_schema(database.engine)
+    seed(database.engine, args.rows, models, crud, search)
+
+    settings = {**volumes(args.rows), "requests": args.requests, "async": database.SQLALCHEMY_ASYNC}
+    engine = database.async_engine.sync_engine if database.SQLALCHEMY_ASYNC else database.engine
+    with TestClient(app) as client:
+        results = run(client, engine, args.rows, args.requests)
+    text = report(settings, results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"settings": settings, "routes": results}, f, indent=2)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["routes"], args.threshold)
+        text += "\nCompared with %s, threshold %d%%\n" % (args.compare, args.threshold * 100)
+        if baseline["settings"] != settings:
+            text += "The baseline was measured with other settings: %s\n" % json.dumps(baseline["settings"])
+        text += "".join(f"REGRESSION {regression}\n" for regression in regressions) or "No regressions\n"
+
+    with open(args.output, "w") as f:
+        f.write(text)
+    print(text, end="")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,275 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+# Load key-value pairs from .env file
+load_dotenv()
+
+# Maximum number of records and seconds a record is kept in each entity cache
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+
+
+class LRUCache:
+    """
+    Thread safe least recently used cache whose entries expire after a time to live
+
+    Every key has a generation bumped when it is invalidated, a value loaded before an
+    invalidation is not stored after it
+    """
+
+    def __init__(self, max_size: int = CACHE_MAX_SIZE, ttl: float = CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Fetch the value stored for the key
+
+        :param key: Key of the entry
+
+        :returns result: Stored value, None when missing or expired
+        """
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                # Drop the expired entry so that it does not count against the size
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+
+            # Mark the entry as the most recently used
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def generation(self, key):
+        """
+        Read the generation of the key, before loading the value to be stored
+
+        :param key: Key of the entry
+
+        :returns result: Opaque generation to be passed to set
+        """
+
+        with self.lock:
+            return (self.epoch, self.generations.get(key, 0))
+
+    def set(self, key, value, generation=None):
+        """
+        Store the value for the key, evicting the least recently used entry when full
+
+        :param key: Key of the entry
+        :param value: Value to be stored
+        :param generation: Generation of the key read before the value was loaded, the value
+            is dropped when the key was invalidated since
+        """
+
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            if generation is not None and generation != (self.epoch, self.generations.get(key, 0)):
+                return
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        """
+        Remove the entries of the given keys
+
+        :param keys: Keys of the entries to be removed
+        """
+
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+                self.generations[key] = self.generations.get(key, 0) + 1
+
+            # Forget the generations of the keys past the size of the cache, a new epoch
+            # stands for all of them
+            if len(self.generations) > max(self.max_size, 1):
+                self.generations.clear()
+                self.epoch += 1
+
+    def clear(self):
+        """
+        Remove every entry
+        """
+
+        with self.lock:
+            self.entries.clear()
+            self.generations.clear()
+            self.epoch += 1
+
+    def stats(self):
+        """
+        Report the size and counters of the cache
+
+        :returns result: Dictionary of size, hits, misses and evictions
+        """
+
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Caches of single records fetched by id
+candidates = LRUCache()
+employees = LRUCache()
+interviews = LRUCache()
+
+# Counts of the list filters, cleared by every write to their table
+candidate_counts = LRUCache()
+employee_counts = LRUCache()
+interview_counts = LRUCache()
+
+
+def workload_row(employee_id: int, rounds: dict):
+    """
+    Build the workload row of an employee as the route serves it
+
+    :param employee_id: Id of the employee
+    :param rounds: Dictionary of round to number of interviews
+
+    :returns result: Dictionary of employee_id, total and rounds, the rounds ordered and keyed as json object keys
+    """
+
+    return {"employee_id": employee_id, "total": sum(rounds.values()), "rounds": {str(round): rounds[round] for round in sorted(rounds)}}
+
+
+class WorkloadCache:
+    """
+    Interview counts per employee and round, loaded with one aggregate query and then kept
+    current by the writes of this worker until it expires, Ex: after the writes of other workers
+
+    The rows are kept as the route serves them and never changed once built, a write replaces
+    the row of its employee so that the lists already handed out stay as they were
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL):
+        self.ttl = ttl
+        self.counts = None
+        self.rows = None
+        self.view = None
+        self.expires = 0
+        self.generation = 0
+        self.loads = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        """
+        Fetch the workload rows ordered by employee id, shared between the callers which must not change them
+
+        :returns result: List of workload rows, None when not loaded or expired
+        """
+
+        with self.lock:
+            if self.counts is None or self.expires < time.monotonic():
+                return None
+            # Sort the rows again only after a write
+            if self.view is None:
+                self.view = [self.rows[employee_id] for employee_id in sorted(self.rows)]
+            return self.view
+
+    def load(self, counts: dict, generation: int):
+        """
+        Store the counts read by the aggregate query, unless a write happened while it ran
+
+        :param counts: Dictionary of employee id to a dictionary of round to count
+        :param generation: Value of the generation attribute read before the query
+
+        :returns result: List of workload rows of the counts ordered by employee id, stored or not
+        """
+
+        view = [workload_row(employee_id, counts[employee_id]) for employee_id in sorted(counts)]
+        with self.lock:
+            if generation != self.generation:
+                return view
+            self.counts = counts
+            self.rows = {row["employee_id"]: row for row in view}
+            self.view = view
+            self.expires = time.monotonic() + self.ttl
+            self.loads += 1
+        return view
+
+    def add(self, employee_id: int, round: int = None, delta: int = 1):
+        """
+        Count an interview created or deleted, or an employee created when no round is given
+
+        :param employee_id: Id of the interviewing employee
+        :param round: Round of the interview
+        :param delta: 1 for a created interview, -1 for a deleted one
+        """
+
+        with self.lock:
+            self.generation += 1
+            if self.counts is None:
+                return
+            rounds = self.counts.setdefault(employee_id, {})
+            if round is not None:
+                rounds[round] = rounds.get(round, 0) + delta
+                if rounds[round] <= 0:
+                    del rounds[round]
+            self.rows[employee_id] = workload_row(employee_id, rounds)
+            self.view = None
+
+    def discard(self, *employee_ids):
+        """
+        Remove the deleted employees
+
+        :param employee_ids: Ids of the deleted employees
+        """
+
+        with self.lock:
+            self.generation += 1
+            if self.counts is not None:
+                for employee_id in employee_ids:
+                    self.counts.pop(employee_id, None)
+                    self.rows.pop(employee_id, None)
+                self.view = None
+
+    def clear(self):
+        """
+        Drop the counts, the next read loads them again
+        """
+
+        with self.lock:
+            self.generation += 1
+            self.counts = None
+            self.rows = None
+            self.view = None
+
+    def stats(self):
+        """
+        Report the size of the cache and the number of times it was loaded
+
+        :returns result: Dictionary of size, ttl and loads
+        """
+
+        with self.lock:
+            return {"size": len(self.counts or {}), "ttl": self.ttl, "loads": self.loads}
+
+
+# Interview counts of every employee
+workload = WorkloadCache()
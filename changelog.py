@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+from sqlalchemy import func, insert, or_, select
+
+try:
+    from . import cache, database, models
+except:
+    import cache, database, models
+
+# Load key-value pairs from .env file
+load_dotenv()
+
+# Seconds between two reads of the change log by a worker, the longest a cached record
+# stays stale after a write of another worker which this worker serves requests meanwhile
+CHANGE_LOG_POLL_INTERVAL = float(os.getenv("CHANGE_LOG_POLL_INTERVAL", "1"))
+
+# Seconds an id skipped in the log is read again, the transaction holding it may commit after later ids
+CHANGE_LOG_GAP_TIMEOUT = float(os.getenv("CHANGE_LOG_GAP_TIMEOUT", "30"))
+
+# Largest run of skipped ids followed at once, longer runs come from sequence jumps rather than transactions
+CHANGE_LOG_MAX_GAP = 1000
+
+# Seconds between two reads of the change log by a long polling change feed request, and the longest wait allowed
+CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "0.5"))
+CHANGE_FEED_MAX_WAIT = float(os.getenv("CHANGE_FEED_MAX_WAIT", "30"))
+
+# Identifies the changes of this worker, which evicts its own caches as it writes
+WORKER_ID = uuid.uuid4().hex
+
+# Name of the entity of every logged model
+ENTITIES = {
+    models.Candidate: "candidate",
+    models.Employee: "employee",
+    models.Interview: "interview",
+}
+
+# Record cache and derived caches to be evicted for every entity
+EVICTIONS = {
+    "candidate": (cache.candidates, (cache.candidate_counts,)),
+    "employee": (cache.employees, (cache.employee_counts, cache.workload)),
+    "interview": (cache.interviews, (cache.interview_counts, cache.workload)),
+}
+
+
+def record(db, model, operation: str, ids: list):
+    """
+    Append the changes of records to the change log, inside the transaction of the caller
+    so that the log holds exactly the committed changes
+
+    :param db: Existing database session
+    :param model: Model of the changed records
+    :param operation: "insert", "update" or "delete"
+    :param ids: Ids of the changed records
+    """
+
+    if not ids:
+        return
+    entity = ENTITIES[model]
+    rows = [{"entity": entity, "record_id": record_id, "operation": operation, "worker": WORKER_ID} for record_id in ids]
+    db.execute(insert(models.ChangeLog.__table__), rows)
+
+
+def evict(entity: str, ids: set):
+    """
+    Drop the cached records of an entity along with the caches derived from the entity
+
+    :param entity: Name of the entity
+    :param ids: Ids of the changed records
+    """
+
+    records, derived = EVICTIONS[entity]
+    records.invalidate(*ids)
+    for entries in derived:
+        entries.clear()
+
+
+class ChangeLogTailer:
+    """
+    Reads the changes other workers appended to the change log and evicts them from the
+    caches of this worker, lazily from the requests reading the caches
+
+    With read replicas the log is only read through them, the change log rows reach a replica
+    along with the rows they describe, so the changes of this worker are evicted again once the
+    replica caught up, dropping the values cached from it in the meantime
+    """
+
+    def __init__(self, interval: float = CHANGE_LOG_POLL_INTERVAL, gap_timeout: float = CHANGE_LOG_GAP_TIMEOUT, replicas: list = None):
+        self.interval = interval
+        self.gap_timeout = gap_timeout
+        self.replicas = replicas or []
+        self.position = None
+        self.gaps = {}
+        self.checked = 0
+        self.polls = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def catch_up(self, db):
+        """
+        Poll the change log when the interval elapsed since the last poll
+
+        :param db: Existing database session
+        """
+
+        if time.monotonic() - self.checked < self.interval:
+            return
+
+        # The primary runs ahead of the replicas the caches are filled from
+        if self.replicas and db.get_bind() not in self.replicas:
+            return
+
+        # A single request polls for the whole worker, the others keep serving from the caches
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.poll(db)
+            self.checked = time.monotonic()
+        finally:
+            self.lock.release()
+
+    def poll(self, db):
+        """
+        Read the changes appended since the last poll and evict them
+
+        :param db: Existing database session
+        """
+
+        log = models.ChangeLog
+        self.polls += 1
+
+        # A new worker starts from the end of the log, its caches are empty
+        if self.position is None:
+            self.position = db.execute(select(func.max(log.id))).scalar() or 0
+            return
+
+        # Read past the position with the primary key, along with the ids skipped so far
+        condition = log.id > self.position
+        if self.gaps:
+            condition = or_(condition, log.id.in_(sorted(self.gaps)))
+        rows = db.execute(select(log.id, log.entity, log.record_id, log.worker).where(condition).order_by(log.id)).all()
+
+        now = time.monotonic()
+        changed = {}
+        for id, entity, record_id, worker in rows:
+            self.gaps.pop(id, None)
+            if id > self.position:
+                # Ids skipped over may belong to transactions which commit later
+                if id - self.position <= CHANGE_LOG_MAX_GAP:
+                    self.gaps.update((missing, now) for missing in range(self.position + 1, id))
+                self.position = id
+            if worker != WORKER_ID or self.replicas:
+                changed.setdefault(entity, set()).add(record_id)
+
+        # Skipped ids still missing after the timeout were rolled back
+        self.gaps = {id: seen for id, seen in self.gaps.items() if now - seen < self.gap_timeout}
+
+        for entity, ids in changed.items():
+            evict(entity, ids)
+            self.evicted += len(ids)
+
+    def stats(self):
+        """
+        Report the position of the tailer in the change log
+
+        :returns result: Dictionary of position, gaps, polls and evicted records
+        """
+
+        return {
+            "position": self.position,
+            "gaps": len(self.gaps),
+            "interval": self.interval,
+            "replicas": len(self.replicas),
+            "polls": self.polls,
+            "evicted": self.evicted,
+        }
+
+
+# Tailer of the change log of this worker, reading from the replicas when configured
+tailer = ChangeLogTailer(replicas=database.read_engines)
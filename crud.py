@@ -1,9 +1,337 @@
-from sqlalchemy.orm import Session
+import base64
+import json
+
+from sqlalchemy import Integer, delete, exists, func, insert, literal, select, text, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
 
 try:
-    from . import models, schemas
+    from . import cache, changelog, database, models, schemas, search
 except:
-    import models, schemas
+    import cache, changelog, database, models, schemas, search
+
+
+def encode_cursor(last_id: int):
+    """
+    Build an opaque pagination cursor pointing after the given record id
+
+    :param last_id: Id of the last record on the current page
+
+    :returns cursor: Url safe cursor string
+    """
+
+    # Serialize the position and hide it behind url safe base64
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """
+    Read the record id back from a pagination cursor
+
+    :param cursor: Cursor string returned by a previous page
+
+    :returns last_id: Id of the last record on the previous page
+    """
+
+    # Restore the base64 padding and decode the position
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_id = json.loads(payload)["id"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if type(last_id) is not int:
+        raise ValueError("Invalid cursor")
+    return last_id
+
+def paginate(records: list, limit: int):
+    """
+    Split a page fetched with one extra row into the page and its next cursor
+
+    :param records: Records fetched with a limit of limit + 1
+    :param limit: Number of records requested by the client
+
+    :returns page, next_cursor: Records to return and cursor for the next page, if any
+    """
+
+    # The extra row only tells whether another page exists
+    if limit > 0 and len(records) > limit:
+        page = records[:limit]
+        return page, encode_cursor(page[-1].id)
+    return records, None
+
+def chunked(values: list, size: int = 1000):
+    """
+    Split values in chunks small enough for the bind parameter limits of the database
+
+    :param values: Values to be split
+    :param size: Maximum number of values in a chunk
+
+    :returns chunks: Generator of lists of values
+    """
+
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def insert_rows(db: Session, model, rows: list, key: tuple):
+    """
+    Insert rows of a table in a single transaction, skipping the rows rejected by a constraint
+
+    :param db: Existing database session
+    :param model: Model of the table to insert into
+    :param rows: Dictionaries of column values to be inserted
+    :param key: Names of the columns identifying a row, used to read back the created rows
+
+    :returns created, rejected: List of created records and positions of the rejected rows
+    """
+
+    table = model.__table__
+    returning = db.get_bind().dialect.insert_executemany_returning
+    created = []
+    inserted = []
+    rejected = []
+
+    def execute(chunk):
+        # Databases with executemany RETURNING hand back the generated ids in the same round trip
+        if returning:
+            created.extend(db.execute(insert(table).returning(*table.c), chunk).all())
+        else:
+            db.execute(insert(table), chunk)
+
+    for chunk in chunked(list(enumerate(rows))):
+        # Insert the chunk with one executemany inside a savepoint
+        try:
+            with db.begin_nested():
+                execute([row for _, row in chunk])
+            inserted.extend(row for _, row in chunk)
+            continue
+        except IntegrityError:
+            pass
+
+        # A row of the chunk broke a constraint, retry them one by one to find the offending ones
+        for position, row in chunk:
+            try:
+                with db.begin_nested():
+                    execute([row])
+                inserted.append(row)
+            except IntegrityError:
+                rejected.append(position)
+
+    # Databases without executemany RETURNING (MySQL) need the created rows read back by their key
+    if not returning:
+        columns = [table.c[name] for name in key]
+        identity = tuple_(*columns) if len(columns) > 1 else columns[0]
+        for chunk in chunked([tuple(row[name] for name in key) if len(key) > 1 else row[key[0]] for row in inserted]):
+            created.extend(db.execute(table.select().where(identity.in_(chunk))).all())
+
+    # Index the names of the created records and log them in the same transaction
+    for chunk in chunked(created):
+        search.index_records(db, model, [(record.id, getattr(record, "name", None)) for record in chunk])
+    changelog.record(db, model, "insert", [record.id for record in created])
+    db.commit()
+    return sorted(created, key=lambda record: record.id), rejected
+
+def insert_row(db: Session, model, schema, values: dict):
+    """
+    Insert a single row with one statement and build the created record without a refresh
+
+    :param db: Existing database session
+    :param model: Model of the table to insert into
+    :param schema: Schema of the created record
+    :param values: Dictionary of column values to be inserted
+
+    :returns result: Created record as the given schema
+    """
+
+    # Fetch the generated columns with RETURNING where the database supports it, else use
+    # the last inserted id the driver already received with the insert
+    table = model.__table__
+    returning = db.get_bind().dialect.insert_returning
+    statement = insert(table).values(**values)
+    if returning:
+        statement = statement.returning(*table.c)
+
+    # Execute the insert and index the name in the same transaction, constraint errors are left to the caller
+    try:
+        result = db.execute(statement)
+        record = result.one() if returning else None
+        record_id = record.id if returning else result.inserted_primary_key[0]
+        search.index_records(db, model, [(record_id, values.get("name"))])
+        changelog.record(db, model, "insert", [record_id])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+
+    if record is not None:
+        return schema.from_orm(record)
+    return schema(id=record_id, **values)
+
+def row_columns(model, schema):
+    """
+    Columns of a model read by a schema, for the read only queries
+
+    :param model: Model of the table
+    :param schema: Schema the rows are serialized with
+
+    :returns result: List of the model columns named like the schema fields
+    """
+
+    return [getattr(model, name) for name in schema.__fields__ if name in model.__table__.c]
+
+def destroy_rows(db: Session, model, interview_column, ids: list, emails: list):
+    """
+    Delete the records of the given ids and emails which no interview refers to, with one
+    set based delete per chunk instead of a lookup and a delete per record
+
+    :param db: Existing database session
+    :param model: Model of the table to delete from
+    :param interview_column: Column of the interviews referring to the records
+    :param ids: Ids of the records to be deleted
+    :param emails: Emails of the records to be deleted
+
+    :returns result: Tuple of the deleted ids, the blocked ids, the missing ids and the missing emails
+    """
+
+    # Resolve the requested ids and emails to the existing records
+    found = {}
+    for chunk in chunked(sorted(set(ids))):
+        found.update(db.query(model.id, model.email).filter(model.id.in_(chunk)).all())
+    for chunk in chunked(sorted(set(emails))):
+        found.update(db.query(model.id, model.email).filter(model.email.in_(chunk)).all())
+
+    # Delete the records no interview refers to, the check and the delete are one statement
+    referred = exists().where(interview_column == model.id)
+    for chunk in chunked(sorted(found)):
+        db.query(model).filter(model.id.in_(chunk), ~referred).delete(synchronize_session=False)
+
+    # The records still present after the delete are the ones blocked by an interview
+    blocked = set()
+    for chunk in chunked(sorted(found)):
+        blocked.update(id for id, in db.query(model.id).filter(model.id.in_(chunk)))
+
+    # Remove the deleted records from the search index and log them in the same transaction
+    deleted = sorted(set(found) - blocked)
+    for chunk in chunked(deleted):
+        search.unindex_records(db, model, chunk)
+    changelog.record(db, model, "delete", deleted)
+    db.commit()
+
+    missing_ids = sorted(set(ids) - set(found))
+    missing_emails = sorted(set(emails) - set(found.values()))
+    return deleted, sorted(blocked), missing_ids, missing_emails
+
+def update_row(db: Session, model, record_id: int, values: dict, *conditions):
+    """
+    Update the given columns of a record with one statement, bumping its version
+
+    :param db: Existing database session
+    :param model: Model of the table to be updated
+    :param record_id: Id of the record to be updated
+    :param values: Dictionary of the column values to be written
+    :param conditions: Extra conditions the record has to meet to be updated
+
+    :returns result: Number of updated rows, 0 when the record or a condition is missing
+    """
+
+    statement = update(model).where(model.id == record_id, *conditions).values(**values, version=model.version + 1)
+
+    # Execute and Commit the update along with the search index of a new name and the change log, constraint errors are left to the caller
+    try:
+        res = db.execute(statement.execution_options(synchronize_session=False))
+        if res.rowcount and "name" in values:
+            search.index_records(db, model, [(record_id, values["name"])], replace=True)
+        if res.rowcount:
+            changelog.record(db, model, "update", [record_id])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+    return res.rowcount
+
+def uses_cache(db: Session):
+    """
+    Tell whether the session reads and fills the in-process caches, with read replicas only the
+    replica sessions do, the caches follow the replicas the change log is tailed from while the
+    writes and the reads pinned to the primary see the primary itself
+
+    :param db: Existing database session
+
+    :returns result: True when the caches apply to the session
+    """
+
+    return not database.read_engines or db.get_bind() in database.read_engines
+
+def get_version(db: Session, model, records, record_id: int):
+    """
+    Fetch only the version of a record, without building the record itself
+
+    :param db: Existing database session
+    :param model: Model of the table of the record
+    :param records: Cache of the records of the model
+    :param record_id: Id of the record
+
+    :returns result: Version of the record, None when it does not exist
+    """
+
+    # The cached record already carries its version, once the changes of other workers are evicted
+    if uses_cache(db):
+        changelog.tailer.catch_up(db)
+        cached = records.get(record_id)
+        if cached is not None:
+            return cached.version
+    return db.execute(select(model.version).where(model.id == record_id)).scalar()
+
+def estimate_rows(db: Session, model):
+    """
+    Estimate the number of records of a whole table without counting them
+
+    :param db: Existing database session
+    :param model: Model of the table
+
+    :returns result: Approximate number of records
+    """
+
+    # MySQL keeps an estimate of the row count in the table statistics
+    if db.get_bind().dialect.name == "mysql":
+        statement = text("SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name")
+        return db.execute(statement, {"name": model.__tablename__}).scalar() or 0
+
+    # Elsewhere the largest id bounds the count, read from the end of the primary key index
+    return db.execute(select(func.max(model.id))).scalar() or 0
+
+def count_rows(db: Session, model, counts, filters: dict, query, approximate: bool = False):
+    """
+    Count the records of a list with one COUNT(*), cached per filter signature until the next write
+
+    :param db: Existing database session
+    :param model: Model of the table
+    :param counts: Cache of the counts of the model
+    :param filters: Dictionary of the filters of the list, the signature of the count
+    :param query: Count query with the filters applied
+    :param approximate: Estimate the count of an unfiltered list from the table statistics
+
+    :returns total, approximated: Number of records and whether it is an estimate
+    """
+
+    # Only the whole table can be estimated, filtered counts stay exact
+    if approximate and not any(filters.values()):
+        return estimate_rows(db, model), True
+
+    # Sessions of the primary count on the primary
+    if not uses_cache(db):
+        return query.scalar(), False
+
+    # Evict the counts changed by other workers before reading the cache
+    changelog.tailer.catch_up(db)
+    key = tuple(sorted(filters.items()))
+    total = counts.get(key)
+    if total is None:
+        # A write clearing the counts while the query runs keeps its total out of the cache
+        generation = counts.generation(key)
+        total = query.scalar()
+        counts.set(key, total, generation)
+    return total, False
 
 def get_candidate(db: Session, candidate_id: int):
     """
@@ -12,11 +340,38 @@ def get_candidate(db: Session, candidate_id: int):
     :param db: Existing database session
     :param candidate_id: Id of the candidate to be fetched
 
-    :returns result: Single candidate record
+    :returns result: Single candidate record, served from the cache when possible
     """
 
-    # Build and Return the query after adding filter
-    return db.query(models.Candidate).filter(models.Candidate.id == candidate_id).first()
+    # Serve the candidate from the cache when it was fetched recently and not changed by another worker since,
+    # the generation is read first so that a write committed while the candidate is loaded keeps it out of the cache
+    cached_session = uses_cache(db)
+    if cached_session:
+        generation = cache.candidates.generation(candidate_id)
+        changelog.tailer.catch_up(db)
+        cached = cache.candidates.get(candidate_id)
+        if cached is not None:
+            return cached
+
+    # Build the query after adding filter and keep the found record in the cache
+    db_candidate = db.query(models.Candidate).filter(models.Candidate.id == candidate_id).first()
+    if db_candidate is not None:
+        db_candidate = schemas.Candidate.from_orm(db_candidate)
+        if cached_session:
+            cache.candidates.set(candidate_id, db_candidate, generation)
+    return db_candidate
+
+def get_candidate_version(db: Session, candidate_id: int):
+    """
+    Fetch the version of the candidate with given id
+
+    :param db: Existing database session
+    :param candidate_id: Id of the candidate
+
+    :returns result: Version of the candidate, None when it does not exist
+    """
+
+    return get_version(db, models.Candidate, cache.candidates, candidate_id)
 
 def get_candidate_by_name(db: Session, name: str):
     """
@@ -58,7 +413,27 @@ def get_candidate_by_status(db: Session, status: str):
     return db.query(models.Candidate).filter(models.Candidate.status == status).first()
 
 
-def get_candidates(db: Session, name: str = None, email: str=None, status: str = None, skip: int = 0, limit: int = 100):
+def filter_candidates(query, name: str = None, email: str = None, status: str = None):
+    """
+    Add the filters of the candidates list to a query, shared by the list and its count
+
+    :param query: Query of the candidates table
+    :param name: Name of the candidate
+    :param email: Email id of the candidate
+    :param status: Status of the candidate
+
+    :returns query: Filtered query
+    """
+
+    if name:
+        query = query.filter(models.Candidate.name == name)
+    if email:
+        query = query.filter(models.Candidate.email == email)
+    if status:
+        query = query.filter(models.Candidate.status == status)
+    return query
+
+def get_candidates(db: Session, name: str = None, email: str=None, status: str = None, skip: int = 0, limit: int = 100, cursor: str = None, read_only: bool = False):
     """
     Fetch all candidates with given filters
 
@@ -68,24 +443,66 @@ def get_candidates(db: Session, name: str = None, email: str=None, status: str =
     :param status: Status of the candidate to be fetched
     :param skip: Number of records to skip
     :param limit: Number of records to return after skipping
+    :param cursor: Cursor of the previous page, replaces skip when given
+    :param read_only: Select only the columns into plain rows, which the session does not track
 
-    :returns results: List of candidate records
+    :returns results: List of candidate records, or rows in read only mode
     """
 
-    # Build a query for the candidates table
-    query = db.query(models.Candidate)
+    # Build a query for the candidates table, of the bare columns when the rows are read only
+    if read_only:
+        query = db.query(*row_columns(models.Candidate, schemas.Candidate))
+    else:
+        query = db.query(models.Candidate)
 
     # Add filters to the query
-    if name:
-        query = query.filter(models.Candidate.name == name)
-    if email:
-        query = query.filter(models.Candidate.email == email)
-    if status:
-        query = query.filter(models.Candidate.status == status)
+    query = filter_candidates(query, name, email, status)
+
+    # Order by id so that pages are stable between calls
+    query = query.order_by(models.Candidate.id)
+
+    # Seek past the cursor instead of scanning skipped rows
+    if cursor:
+        query = query.filter(models.Candidate.id > decode_cursor(cursor))
+        return query.limit(limit).all()
 
     # Return list of records after adding offset and limit
     return query.offset(skip).limit(limit).all()
 
+def count_candidates(db: Session, name: str = None, email: str = None, status: str = None, approximate: bool = False):
+    """
+    Count the candidates with given filters, the same filters as get_candidates
+
+    :param db: Existing database session
+    :param name: Name of the candidate
+    :param email: Email id of the candidate
+    :param status: Status of the candidate
+    :param approximate: Estimate the count from the table statistics when no filter is given
+
+    :returns total, approximated: Number of candidates and whether it is an estimate
+    """
+
+    query = filter_candidates(db.query(func.count(models.Candidate.id)), name, email, status)
+    return count_rows(db, models.Candidate, cache.candidate_counts, {"name": name, "email": email, "status": status}, query, approximate)
+
+
+def search_candidates(db: Session, q: str, limit: int = 20):
+    """
+    Fetch the candidates whose name best matches the search text, from the trigram index
+
+    :param db: Existing database session
+    :param q: Search text, Ex: the start of a name or a misspelled name
+    :param limit: Number of records to return
+
+    :returns results: List of candidate rows, the best match first
+    """
+
+    # Build the ranked query over the trigram index, a text without any word matches nothing
+    query = search.search_query(db, models.Candidate, row_columns(models.Candidate, schemas.Candidate), q, limit)
+    if query is None:
+        return []
+    return db.execute(query).all()
+
 
 def create_candidate(db: Session, candidate: schemas.CandidateBase):
     """
@@ -97,16 +514,59 @@ def create_candidate(db: Session, candidate: schemas.CandidateBase):
     :returns result: Single created candidate record
     """
 
-    # Initialize candidate model object
-    db_candidate = models.Candidate(name=candidate.name, email=candidate.email, status=candidate.status)
-    
-    # Add and Commit the record in the table
-    db.add(db_candidate)
-    db.commit()
-    db.refresh(db_candidate)
+    # Insert the record with a single statement, a duplicate email raises IntegrityError
+    created = insert_row(db, models.Candidate, schemas.Candidate, candidate.dict())
+    cache.candidate_counts.clear()
+    return created
 
-    # Return created candidate
-    return db_candidate
+def get_registered_candidate_emails(db: Session, emails: list):
+    """
+    Fetch which of the given email ids already belong to a candidate
+
+    :param db: Existing database session
+    :param emails: Email ids to be checked
+
+    :returns result: Set of registered email ids
+    """
+
+    # Check all the emails with set based queries instead of one lookup per email
+    registered = set()
+    for chunk in chunked(list(emails)):
+        query = db.query(models.Candidate.email).filter(models.Candidate.email.in_(chunk))
+        registered.update(email for email, in query)
+    return registered
+
+def get_registered_candidate_ids(db: Session, ids: list):
+    """
+    Fetch which of the given ids belong to a candidate
+
+    :param db: Existing database session
+    :param ids: Candidate ids to be checked
+
+    :returns result: Set of registered candidate ids
+    """
+
+    # Check all the ids with set based queries instead of one lookup per id
+    registered = set()
+    for chunk in chunked(list(ids)):
+        query = db.query(models.Candidate.id).filter(models.Candidate.id.in_(chunk))
+        registered.update(id for id, in query)
+    return registered
+
+def create_candidates(db: Session, candidates: list):
+    """
+    Create all the given candidates in a single transaction
+
+    :param db: Existing database session
+    :param candidates: Schemas of the candidates to be created
+
+    :returns created, rejected: List of created candidate records and positions of the candidates rejected by a constraint
+    """
+
+    # Insert all the records together, the unique emails identify them on databases without RETURNING
+    result = insert_rows(db, models.Candidate, [candidate.dict() for candidate in candidates], key=("email",))
+    cache.candidate_counts.clear()
+    return result
 
 def destroy_candidate(db: Session, id: int):
     """
@@ -118,9 +578,14 @@ def destroy_candidate(db: Session, id: int):
     :returns result: Integer status of deletion
     """
 
-    # Build and Commit the delete query
+    # Build and Commit the delete query along with the removal from the search index and the change log
     res = db.query(models.Candidate).filter(models.Candidate.id == id).delete()
+    if res:
+        search.unindex_records(db, models.Candidate, [id])
+        changelog.record(db, models.Candidate, "delete", [id])
     db.commit()
+    cache.candidates.invalidate(id)
+    cache.candidate_counts.clear()
 
     # Return the integer status of deletion
     return res
@@ -135,25 +600,50 @@ def destroy_candidate_by_email(db: Session, email: str):
     :returns result: Integer status of deletion
     """
 
-    # Build and Commit the delete query by email
+    # Find the ids to be evicted from the cache and the search index, then Build and Commit the delete query by email
+    ids = [id for id, in db.query(models.Candidate.id).filter(models.Candidate.email==email)]
     res = db.query(models.Candidate).filter(models.Candidate.email==email).delete()
+    search.unindex_records(db, models.Candidate, ids)
+    changelog.record(db, models.Candidate, "delete", ids)
     db.commit()
+    cache.candidates.invalidate(*ids)
+    cache.candidate_counts.clear()
 
     # Return the integer status of deletion
     return res
 
-def put_candidate(db: Session, new_candidate: models.Candidate):
+def destroy_candidates(db: Session, ids: list, emails: list):
     """
-    Update the candidate with given candidate schema
+    Delete the candidates with given ids and emails which have no interview scheduled
 
     :param db: Existing database session
-    :param candidate: Schema of the new candidate
+    :param ids: Ids of the candidates to be deleted
+    :param emails: Emails of the candidates to be deleted
 
+    :returns result: Tuple of the deleted ids, the blocked ids, the missing ids and the missing emails
     """
 
-    # Build and Commit the update query by merging the record
-    res = db.merge(new_candidate)
-    db.commit()
+    # Delete with set based statements and evict the deleted candidates from the cache
+    result = destroy_rows(db, models.Candidate, models.Interview.candidate_id, ids, emails)
+    cache.candidates.invalidate(*result[0])
+    cache.candidate_counts.clear()
+    return result
+
+def put_candidate(db: Session, candidate_id: int, values: dict):
+    """
+    Update the given fields of the candidate with one statement
+
+    :param db: Existing database session
+    :param candidate_id: Id of the candidate to be updated
+    :param values: Dictionary of the fields to be written, Ex: all of them for a put
+
+    :returns result: Number of updated rows, 0 when the candidate does not exist
+    """
+
+    # Build and Commit the update query, email conflicts surface from the unique constraint
+    res = update_row(db, models.Candidate, candidate_id, values)
+    cache.candidates.invalidate(candidate_id)
+    cache.candidate_counts.clear()
     return res
 
 
@@ -164,11 +654,38 @@ def get_employee(db: Session, employee_id: int):
     :param db: Existing database session
     :param employee_id: Id of the employee to be fetched
 
-    :returns result: Single employee record
+    :returns result: Single employee record, served from the cache when possible
     """
 
-    # Build and Return the query after adding filter
-    return db.query(models.Employee).filter(models.Employee.id == employee_id).first()
+    # Serve the employee from the cache when it was fetched recently and not changed by another worker since,
+    # the generation is read first so that a write committed while the employee is loaded keeps it out of the cache
+    cached_session = uses_cache(db)
+    if cached_session:
+        generation = cache.employees.generation(employee_id)
+        changelog.tailer.catch_up(db)
+        cached = cache.employees.get(employee_id)
+        if cached is not None:
+            return cached
+
+    # Build the query after adding filter and keep the found record in the cache
+    db_employee = db.query(models.Employee).filter(models.Employee.id == employee_id).first()
+    if db_employee is not None:
+        db_employee = schemas.Employee.from_orm(db_employee)
+        if cached_session:
+            cache.employees.set(employee_id, db_employee, generation)
+    return db_employee
+
+def get_employee_version(db: Session, employee_id: int):
+    """
+    Fetch the version of the employee with given id
+
+    :param db: Existing database session
+    :param employee_id: Id of the employee
+
+    :returns result: Version of the employee, None when it does not exist
+    """
+
+    return get_version(db, models.Employee, cache.employees, employee_id)
 
 def get_employee_by_name(db: Session, name: str):
     """
@@ -209,7 +726,27 @@ def get_employee_by_designation(db: Session, designation: str):
     # Build and Return the query after adding designation filter
     return db.query(models.Employee).filter(models.Employee.designation == designation).first()
 
-def get_employees(db: Session, name: str = None, email: str=None, designation: str = None, skip: int = 0, limit: int = 100):
+def filter_employees(query, name: str = None, email: str = None, designation: str = None):
+    """
+    Add the filters of the employees list to a query, shared by the list and its count
+
+    :param query: Query of the employees table
+    :param name: Name of the employee
+    :param email: Email id of the employee
+    :param designation: Designation of the employee
+
+    :returns query: Filtered query
+    """
+
+    if name:
+        query = query.filter(models.Employee.name == name)
+    if email:
+        query = query.filter(models.Employee.email == email)
+    if designation:
+        query = query.filter(models.Employee.designation == designation)
+    return query
+
+def get_employees(db: Session, name: str = None, email: str=None, designation: str = None, skip: int = 0, limit: int = 100, cursor: str = None, read_only: bool = False):
     """
     Fetch all employees with given filters
 
@@ -219,24 +756,102 @@ def get_employees(db: Session, name: str = None, email: str=None, designation: s
     :param designation: Designation of the employee to be fetched
     :param skip: Number of records to skip
     :param limit: Number of records to return after skipping
+    :param cursor: Cursor of the previous page, replaces skip when given
+    :param read_only: Select only the columns into plain rows, which the session does not track
 
-    :returns results: List of employee records 
+    :returns results: List of employee records, or rows in read only mode 
     """
 
-    # Build a query for the employees table
-    query = db.query(models.Employee)
+    # Build a query for the employees table, of the bare columns when the rows are read only
+    if read_only:
+        query = db.query(*row_columns(models.Employee, schemas.Employee))
+    else:
+        query = db.query(models.Employee)
 
     # Add filters to the query
-    if name:
-        query = query.filter(models.Employee.name == name)
-    if email:
-        query = query.filter(models.Employee.email == email)
-    if designation:
-        query = query.filter(models.Employee.designation == designation)
+    query = filter_employees(query, name, email, designation)
+
+    # Order by id so that pages are stable between calls
+    query = query.order_by(models.Employee.id)
+
+    # Seek past the cursor instead of scanning skipped rows
+    if cursor:
+        query = query.filter(models.Employee.id > decode_cursor(cursor))
+        return query.limit(limit).all()
 
     # Return list of records after adding offset and limit
     return query.offset(skip).limit(limit).all()
 
+def count_employees(db: Session, name: str = None, email: str = None, designation: str = None, approximate: bool = False):
+    """
+    Count the employees with given filters, the same filters as get_employees
+
+    :param db: Existing database session
+    :param name: Name of the employee
+    :param email: Email id of the employee
+    :param designation: Designation of the employee
+    :param approximate: Estimate the count from the table statistics when no filter is given
+
+    :returns total, approximated: Number of employees and whether it is an estimate
+    """
+
+    query = filter_employees(db.query(func.count(models.Employee.id)), name, email, designation)
+    return count_rows(db, models.Employee, cache.employee_counts, {"name": name, "email": email, "designation": designation}, query, approximate)
+
+
+def get_workload(db: Session):
+    """
+    Fetch the number of interviews of every employee by round, with one GROUP BY over the
+    interviews the first time and then from the cache the writes keep current
+
+    :param db: Existing database session
+
+    :returns results: List of dictionaries of employee_id, total and rounds, ordered by employee id,
+        shared with the cache and not to be changed
+    """
+
+    # Evict the workload changed by other workers before reading the cache, the sessions of the primary count on the primary
+    cached_session = uses_cache(db)
+    rows = None
+    if cached_session:
+        changelog.tailer.catch_up(db)
+        rows = cache.workload.get()
+    if rows is None:
+        # Employees without interviews are part of the result through the outer join
+        generation = cache.workload.generation
+        query = (
+            select(models.Employee.id, models.Interview.round, func.count(models.Interview.id))
+            .outerjoin(models.Interview, models.Interview.employee_id == models.Employee.id)
+            .group_by(models.Employee.id, models.Interview.round)
+        )
+        counts = {}
+        for employee_id, round, count in db.execute(query):
+            rounds = counts.setdefault(employee_id, {})
+            if round is not None:
+                rounds[round] = count
+        if not cached_session:
+            return [cache.workload_row(employee_id, counts[employee_id]) for employee_id in sorted(counts)]
+        rows = cache.workload.load(counts, generation)
+    return rows
+
+
+def search_employees(db: Session, q: str, limit: int = 20):
+    """
+    Fetch the employees whose name best matches the search text, from the trigram index
+
+    :param db: Existing database session
+    :param q: Search text, Ex: the start of a name or a misspelled name
+    :param limit: Number of records to return
+
+    :returns results: List of employee rows, the best match first
+    """
+
+    # Build the ranked query over the trigram index, a text without any word matches nothing
+    query = search.search_query(db, models.Employee, row_columns(models.Employee, schemas.Employee), q, limit)
+    if query is None:
+        return []
+    return db.execute(query).all()
+
 
 def create_employee(db: Session, employee: schemas.EmployeeBase):
     """
@@ -248,16 +863,62 @@ def create_employee(db: Session, employee: schemas.EmployeeBase):
     :returns result: Single created employee record
     """
 
-    # Initialize employee model object
-    db_employee = models.Employee(name=employee.name, email=employee.email, designation=employee.designation)
+    # Insert the record with a single statement, a duplicate email raises IntegrityError
+    created = insert_row(db, models.Employee, schemas.Employee, employee.dict())
+    cache.employee_counts.clear()
+    cache.workload.add(created.id)
+    return created
 
-    # Add and Commit the record in the table
-    db.add(db_employee)
-    db.commit()
-    db.refresh(db_employee)
+def get_registered_employee_emails(db: Session, emails: list):
+    """
+    Fetch which of the given email ids already belong to an employee
 
-    # Return created employee
-    return db_employee
+    :param db: Existing database session
+    :param emails: Email ids to be checked
+
+    :returns result: Set of registered email ids
+    """
+
+    # Check all the emails with set based queries instead of one lookup per email
+    registered = set()
+    for chunk in chunked(list(emails)):
+        query = db.query(models.Employee.email).filter(models.Employee.email.in_(chunk))
+        registered.update(email for email, in query)
+    return registered
+
+def get_registered_employee_ids(db: Session, ids: list):
+    """
+    Fetch which of the given ids belong to an employee
+
+    :param db: Existing database session
+    :param ids: Employee ids to be checked
+
+    :returns result: Set of registered employee ids
+    """
+
+    # Check all the ids with set based queries instead of one lookup per id
+    registered = set()
+    for chunk in chunked(list(ids)):
+        query = db.query(models.Employee.id).filter(models.Employee.id.in_(chunk))
+        registered.update(id for id, in query)
+    return registered
+
+def create_employees(db: Session, employees: list):
+    """
+    Create all the given employees in a single transaction
+
+    :param db: Existing database session
+    :param employees: Schemas of the employees to be created
+
+    :returns created, rejected: List of created employee records and positions of the employees rejected by a constraint
+    """
+
+    # Insert all the records together, the unique emails identify them on databases without RETURNING
+    result = insert_rows(db, models.Employee, [employee.dict() for employee in employees], key=("email",))
+    cache.employee_counts.clear()
+    for employee in result[0]:
+        cache.workload.add(employee.id)
+    return result
 
 def destroy_employee(db: Session, id: int):
     """
@@ -269,9 +930,15 @@ def destroy_employee(db: Session, id: int):
     :returns result: Integer status of deletion
     """
 
-    # Build and Commit the delete query
+    # Build and Commit the delete query along with the removal from the search index and the change log
     res = db.query(models.Employee).filter(models.Employee.id == id).delete()
+    if res:
+        search.unindex_records(db, models.Employee, [id])
+        changelog.record(db, models.Employee, "delete", [id])
     db.commit()
+    cache.employees.invalidate(id)
+    cache.employee_counts.clear()
+    cache.workload.discard(id)
 
     # Return the integer status of deletion
     return res
@@ -286,41 +953,119 @@ def destroy_employee_by_email(db: Session, email: str):
     :returns result: Integer status of deletion
     """
 
-    # Build and Commit the delete query by email
+    # Find the ids to be evicted from the cache and the search index, then Build and Commit the delete query by email
+    ids = [id for id, in db.query(models.Employee.id).filter(models.Employee.email==email)]
     res = db.query(models.Employee).filter(models.Employee.email==email).delete()
+    search.unindex_records(db, models.Employee, ids)
+    changelog.record(db, models.Employee, "delete", ids)
     db.commit()
+    cache.employees.invalidate(*ids)
+    cache.employee_counts.clear()
+    cache.workload.discard(*ids)
 
     # Return the integer status of deletion
     return res
 
 
-def put_employee(db: Session, new_employee: models.Employee):
+def destroy_employees(db: Session, ids: list, emails: list):
     """
-    Update the employee with given employee schema
+    Delete the employees with given ids and emails which have no interview scheduled
 
     :param db: Existing database session
-    :param employee: Schema of the new employee
+    :param ids: Ids of the employees to be deleted
+    :param emails: Emails of the employees to be deleted
 
+    :returns result: Tuple of the deleted ids, the blocked ids, the missing ids and the missing emails
     """
 
-    # Build and Commit the update query by merging the record
-    res = db.merge(new_employee)
-    db.commit()
+    # Delete with set based statements and evict the deleted employees from the cache
+    result = destroy_rows(db, models.Employee, models.Interview.employee_id, ids, emails)
+    cache.employees.invalidate(*result[0])
+    cache.employee_counts.clear()
+    cache.workload.discard(*result[0])
+    return result
+
+def put_employee(db: Session, employee_id: int, values: dict):
+    """
+    Update the given fields of the employee with one statement
+
+    :param db: Existing database session
+    :param employee_id: Id of the employee to be updated
+    :param values: Dictionary of the fields to be written, Ex: all of them for a put
+
+    :returns result: Number of updated rows, 0 when the employee does not exist
+    """
+
+    # Build and Commit the update query, email conflicts surface from the unique constraint
+    res = update_row(db, models.Employee, employee_id, values)
+    cache.employees.invalidate(employee_id)
+    cache.employee_counts.clear()
     return res
 
 
-def get_interview(db: Session, interview_id: int):
+# Relationships of an interview which can be embedded in the responses
+INTERVIEW_EXPANSIONS = {
+    "candidate": models.Interview.candidates,
+    "employee": models.Interview.employees,
+}
+
+def interview_options(expand: tuple):
+    """
+    Build the loader options fetching the related records of interviews with the interviews
+
+    :param expand: Names of the related records to be loaded, Ex: ("candidate", "employee")
+
+    :returns options: List of joinedload options
+    """
+
+    # Many-to-one relationships are joined into the same query
+    return [joinedload(INTERVIEW_EXPANSIONS[name]) for name in expand]
+
+def get_interview(db: Session, interview_id: int, expand: tuple = ()):
     """
     Fetch the interview with given id
 
     :param db: Existing database session
     :param interview_id: Id of the interview to be fetched
+    :param expand: Names of the related records to be loaded with the interview
 
-    :returns result: Single interview record
+    :returns result: Single interview record, served from the cache when possible
+    """
+
+    # Expanded interviews come with their related records in a single joined query
+    if expand:
+        query = db.query(models.Interview).options(*interview_options(expand))
+        return query.filter(models.Interview.id == interview_id).first()
+
+    # Serve the interview from the cache when it was fetched recently and not changed by another worker since,
+    # the generation is read first so that a write committed while the interview is loaded keeps it out of the cache
+    cached_session = uses_cache(db)
+    if cached_session:
+        generation = cache.interviews.generation(interview_id)
+        changelog.tailer.catch_up(db)
+        cached = cache.interviews.get(interview_id)
+        if cached is not None:
+            return cached
+
+    # Build the query after adding filter and keep the found record in the cache
+    db_interview = db.query(models.Interview).filter(models.Interview.id == interview_id).first()
+    if db_interview is not None:
+        db_interview = schemas.Interview.from_orm(db_interview)
+        if cached_session:
+            cache.interviews.set(interview_id, db_interview, generation)
+    return db_interview
+
+def get_interview_version(db: Session, interview_id: int):
+    """
+    Fetch the version of the interview with given id
+
+    :param db: Existing database session
+    :param interview_id: Id of the interview
+
+    :returns result: Version of the interview, None when it does not exist
     """
 
-    # Build and Return the query after adding filter
-    return db.query(models.Interview).filter(models.Interview.id == interview_id).first()
+    return get_version(db, models.Interview, cache.interviews, interview_id)
 
 def get_interview_by_round(db: Session, round: int):
     """
@@ -361,7 +1106,27 @@ def get_interview_by_employee(db: Session, employee_id: int):
     # Build and Return the query after adding employee_id filter
     return db.query(models.Interview).filter(models.Interview.employee_id == employee_id).first()
 
-def get_interviews(db: Session, round: str = None, candidate_id: str=None, employee_id: str = None, skip: int = 0, limit: int = 100):
+def filter_interviews(query, round: int = None, candidate_id: int = None, employee_id: int = None):
+    """
+    Add the filters of the interviews list to a query, shared by the list and its count
+
+    :param query: Query of the interviews table
+    :param round: Round of the interview
+    :param candidate_id: Candidate Id of the interview
+    :param employee_id: Employee Id of the interview
+
+    :returns query: Filtered query
+    """
+
+    if round:
+        query = query.filter(models.Interview.round == round)
+    if candidate_id:
+        query = query.filter(models.Interview.candidate_id == candidate_id)
+    if employee_id:
+        query = query.filter(models.Interview.employee_id == employee_id)
+    return query
+
+def get_interviews(db: Session, round: str = None, candidate_id: str=None, employee_id: str = None, skip: int = 0, limit: int = 100, cursor: str = None, read_only: bool = False, expand: tuple = ()):
     """
     Fetch all interviews with given filters
 
@@ -371,44 +1136,211 @@ def get_interviews(db: Session, round: str = None, candidate_id: str=None, emplo
     :param employee_id: Employee Id of the interview to be fetched
     :param skip: Number of records to skip
     :param limit: Number of records to return after skipping
+    :param cursor: Cursor of the previous page, replaces skip when given
+    :param read_only: Select only the columns into plain rows, which the session does not track, ignored when expanding
+    :param expand: Names of the related records to be loaded with the interviews
 
-    :returns results: List of interview records 
+    :returns results: List of interview records, or rows in read only mode 
     """
 
-    # Build a query for the interviews table
-    query = db.query(models.Interview)
+    # Build a query for the interviews table, joined with the related records to be expanded
+    if read_only and not expand:
+        query = db.query(*row_columns(models.Interview, schemas.Interview))
+    else:
+        query = db.query(models.Interview).options(*interview_options(expand))
 
     # Add filters to the query
-    if round:
-        query = query.filter(models.Interview.round == round)
-    if candidate_id:
-        query = query.filter(models.Interview.candidate_id == candidate_id)
-    if employee_id:
-        query = query.filter(models.Interview.employee_id == employee_id)
+    query = filter_interviews(query, round, candidate_id, employee_id)
+
+    # Order by id so that pages are stable between calls
+    query = query.order_by(models.Interview.id)
+
+    # Seek past the cursor instead of scanning skipped rows
+    if cursor:
+        query = query.filter(models.Interview.id > decode_cursor(cursor))
+        return query.limit(limit).all()
 
     # Return list of records after adding offset and limit
     return query.offset(skip).limit(limit).all()
 
+def count_interviews(db: Session, round: int = None, candidate_id: int = None, employee_id: int = None, approximate: bool = False):
+    """
+    Count the interviews with given filters, the same filters as get_interviews
+
+    :param db: Existing database session
+    :param round: Round of the interview
+    :param candidate_id: Candidate Id of the interview
+    :param employee_id: Employee Id of the interview
+    :param approximate: Estimate the count from the table statistics when no filter is given
+
+    :returns total, approximated: Number of interviews and whether it is an estimate
+    """
+
+    query = filter_interviews(db.query(func.count(models.Interview.id)), round, candidate_id, employee_id)
+    return count_rows(db, models.Interview, cache.interview_counts, {"round": round, "candidate_id": candidate_id, "employee_id": employee_id}, query, approximate)
+
 def create_interview(db: Session, interview: schemas.InterviewBase):
     """
-    Create the interview with given interview schema
+    Create the interview with one INSERT ... SELECT which only yields a row when the
+    candidate and employee exist, duplicates are refused by the unique pair constraint
 
     :param db: Existing database session
     :param interview: Schema of the interview to be created
 
-    :returns result: Single created interview record
+    :returns result: Single created interview record, None when the candidate or employee does not exist
     """
 
-    # Initialize interview model object
-    db_interview = models.Interview(round=interview.round, candidate_id = interview.candidate_id, employee_id = interview.employee_id)
+    # Select the row to be inserted from the candidate and employee themselves
+    table = models.Interview.__table__
+    source = (
+        select(literal(interview.round, Integer), models.Candidate.id, models.Employee.id)
+        .join(models.Employee, models.Employee.id == interview.employee_id)
+        .where(models.Candidate.id == interview.candidate_id)
+    )
+    statement = insert(table).from_select(["round", "candidate_id", "employee_id"], source)
+    returning = db.get_bind().dialect.insert_returning
+    if returning:
+        statement = statement.returning(*table.c)
+
+    # Execute and Commit the insert along with the change log, constraint errors are left to the caller
+    try:
+        result = db.execute(statement)
+        if returning:
+            record = result.first()
+            created = schemas.Interview.from_orm(record) if record is not None else None
+        elif result.rowcount:
+            created = schemas.Interview(id=result.lastrowid, **interview.dict())
+        else:
+            created = None
+        if created is not None:
+            changelog.record(db, models.Interview, "insert", [created.id])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+    cache.interview_counts.clear()
+
+    # Count the interview in the workload of the employee
+    if created is not None:
+        cache.workload.add(created.employee_id, created.round)
+    return created
+
+def schedule_interviews(db: Session, round: int, employee_id: int, candidate_ids: list):
+    """
+    Create the interviews of a round with the given employee for many candidates, with one
+    INSERT ... SELECT per chunk skipping the unregistered and already scheduled candidates
 
-    # Add and Commit the record in the table
-    db.add(db_interview)
-    db.commit()
-    db.refresh(db_interview)
+    :param db: Existing database session
+    :param round: Round of the interviews
+    :param employee_id: Id of the interviewing employee
+    :param candidate_ids: Ids of the candidates to be interviewed
 
-    # Return created Interview
-    return db_interview
+    :returns result: List of created interview records
+    """
+
+    table = models.Interview.__table__
+    returning = db.get_bind().dialect.insert_returning
+    scheduled = exists().where(models.Interview.candidate_id == models.Candidate.id, models.Interview.employee_id == employee_id)
+    registered = exists().where(models.Employee.id == employee_id)
+
+    # Insert every chunk in the same transaction
+    created = []
+    try:
+        for chunk in chunked(sorted(set(candidate_ids))):
+            # Without RETURNING the pairs scheduled before are needed to tell the created rows apart
+            before = set() if returning else get_scheduled_pairs(db, {(candidate_id, employee_id) for candidate_id in chunk})
+
+            source = select(literal(round, Integer), models.Candidate.id, literal(employee_id, Integer)).where(models.Candidate.id.in_(chunk), ~scheduled, registered)
+            statement = insert(table).from_select(["round", "candidate_id", "employee_id"], source)
+            if returning:
+                created.extend(db.execute(statement.returning(*table.c)).all())
+            else:
+                db.execute(statement)
+                new_ids = [candidate_id for candidate_id in chunk if (candidate_id, employee_id) not in before]
+                created.extend(db.query(*table.c).filter(table.c.employee_id == employee_id, table.c.candidate_id.in_(new_ids)).all())
+        changelog.record(db, models.Interview, "insert", [row.id for row in created])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+    cache.interview_counts.clear()
+    for row in created:
+        cache.workload.add(row.employee_id, row.round)
+
+    return sorted((schemas.Interview.from_orm(row) for row in created), key=lambda interview: interview.id)
+
+def get_scheduled_pairs(db: Session, pairs: list):
+    """
+    Fetch which of the given candidate and employee pairs already have an interview
+
+    :param db: Existing database session
+    :param pairs: Tuples of candidate id and employee id to be checked
+
+    :returns result: Set of scheduled (candidate_id, employee_id) tuples
+    """
+
+    # Check all the pairs with set based queries instead of one lookup per pair
+    scheduled = set()
+    pair = tuple_(models.Interview.candidate_id, models.Interview.employee_id)
+    for chunk in chunked(list(pairs)):
+        query = db.query(models.Interview.candidate_id, models.Interview.employee_id).filter(pair.in_(chunk))
+        scheduled.update((candidate_id, employee_id) for candidate_id, employee_id in query)
+    return scheduled
+
+def get_employee_loads(db: Session, designation: str = None):
+    """
+    Fetch the number of interviews of every employee, with one aggregate query
+
+    :param db: Existing database session
+    :param designation: Designation of the employees to be fetched, all of them when None
+
+    :returns result: Dictionary of employee id to number of interviews
+    """
+
+    # Employees without interviews are part of the result through the outer join
+    query = (
+        select(models.Employee.id, func.count(models.Interview.id))
+        .outerjoin(models.Interview, models.Interview.employee_id == models.Employee.id)
+        .group_by(models.Employee.id)
+    )
+    if designation:
+        query = query.where(models.Employee.designation == designation)
+    return dict(db.execute(query).all())
+
+def get_interviewed_employees(db: Session, candidate_ids: list):
+    """
+    Fetch the employees who already interviewed each of the given candidates
+
+    :param db: Existing database session
+    :param candidate_ids: Ids of the candidates
+
+    :returns result: Dictionary of candidate id to the set of employee ids
+    """
+
+    # Read the interviews of all the candidates with set based queries instead of one per candidate
+    interviewed = {}
+    for chunk in chunked(sorted(candidate_ids)):
+        query = db.query(models.Interview.candidate_id, models.Interview.employee_id).filter(models.Interview.candidate_id.in_(chunk))
+        for candidate_id, employee_id in query:
+            interviewed.setdefault(candidate_id, set()).add(employee_id)
+    return interviewed
+
+def create_interviews(db: Session, interviews: list):
+    """
+    Create all the given interviews in a single transaction
+
+    :param db: Existing database session
+    :param interviews: Schemas of the interviews to be created
+
+    :returns created, rejected: List of created interview records and positions of the interviews rejected by a constraint
+    """
+
+    # Insert all the records together, the candidate and employee pairs identify them on databases without RETURNING
+    result = insert_rows(db, models.Interview, [interview.dict() for interview in interviews], key=("candidate_id", "employee_id"))
+    cache.interview_counts.clear()
+    for interview in result[0]:
+        cache.workload.add(interview.employee_id, interview.round)
+    return result
 
 def destroy_interview(db: Session, id: int):
     """
@@ -420,23 +1352,101 @@ def destroy_interview(db: Session, id: int):
     :returns result: Integer status of deletion
     """
 
-    # Build and Commit the delete query
-    res = db.query(models.Interview).filter(models.Interview.id == id).delete()
+    # Build and Commit the delete query along with the change log, reading back the deleted interview where the database supports it
+    statement = delete(models.Interview).where(models.Interview.id == id).execution_options(synchronize_session=False)
+    returning = db.get_bind().dialect.delete_returning
+    if returning:
+        deleted = db.execute(statement.returning(models.Interview.employee_id, models.Interview.round)).all()
+        res = len(deleted)
+    else:
+        res = db.execute(statement).rowcount
+    if res:
+        changelog.record(db, models.Interview, "delete", [id])
     db.commit()
+    cache.interviews.invalidate(id)
+    cache.interview_counts.clear()
+
+    # Uncount the interview from the workload, without RETURNING the workload is loaded again
+    if returning:
+        for employee_id, round in deleted:
+            cache.workload.add(employee_id, round, -1)
+    elif res:
+        cache.workload.clear()
 
     # Return the integer status of deletion
     return res
 
-def put_interview(db: Session, new_interview: models.Interview):
+def put_interview(db: Session, interview_id: int, values: dict):
     """
-    Update the interview with given interview schema
+    Update the given fields of the interview with one statement, only when the
+    candidate and employee it refers to are registered
 
     :param db: Existing database session
-    :param new_interview: Schema of the new interview
+    :param interview_id: Id of the interview to be updated
+    :param values: Dictionary of the fields to be written, Ex: all of them for a put
 
+    :returns result: Number of updated rows, 0 when the interview, the candidate or the employee does not exist
     """
 
-    # Build and Commit the update query by merging the record
-    res = db.merge(new_interview)
-    db.commit()
-    return res
\ No newline at end of file
+    # Check the candidate and employee in the same statement as the update
+    conditions = []
+    if "candidate_id" in values:
+        conditions.append(exists().where(models.Candidate.id == values["candidate_id"]))
+    if "employee_id" in values:
+        conditions.append(exists().where(models.Employee.id == values["employee_id"]))
+
+    # Read the employee and round the interview is counted under, locked until the update commits
+    moved = "employee_id" in values or "round" in values
+    if moved:
+        statement = select(models.Interview.employee_id, models.Interview.round).where(models.Interview.id == interview_id)
+        before = db.execute(statement.with_for_update()).first()
+
+    # Build and Commit the update query
+    res = update_row(db, models.Interview, interview_id, values, *conditions)
+    cache.interviews.invalidate(interview_id)
+    cache.interview_counts.clear()
+
+    # Count the interview under its new employee and round only when one of them changed
+    if res and moved:
+        after = (values.get("employee_id", before.employee_id), values.get("round", before.round))
+        if after != tuple(before):
+            cache.workload.add(before.employee_id, before.round, -1)
+            cache.workload.add(*after)
+    return res
+
+def get_changes(db: Session, since: int, limit: int):
+    """
+    Fetch the changes logged after a sequence number in commit order, stopping before an id
+    skipped recently whose transaction may still commit, so that no change is ever passed over
+
+    :param db: Existing database session
+    :param since: Sequence number of the last change already read, 0 for the whole log
+    :param limit: Maximum number of changes to return
+
+    :returns result: List of change dictionaries and the sequence number to read from next
+    """
+
+    log = models.ChangeLog
+    rows = db.execute(
+        select(log.id, log.entity, log.record_id, log.operation, log.created_at)
+        .where(log.id > since)
+        .order_by(log.id)
+        .limit(limit)
+    ).all()
+
+    changes = []
+    position = since
+    now = None
+    for id, entity, record_id, operation, created_at in rows:
+        # Ids skipped over may belong to transactions which commit later, longer runs come from sequence jumps
+        if 1 < id - position <= changelog.CHANGE_LOG_MAX_GAP:
+            if now is None:
+                now = db.execute(select(func.now())).scalar()
+            if (now - created_at).total_seconds() < changelog.CHANGE_LOG_GAP_TIMEOUT:
+                break
+        changes.append({"seq": id, "entity": entity, "id": record_id, "operation": operation, "changed_at": created_at})
+        position = id
+
+    # End the read transaction, the next poll of a long poll must see the commits made meanwhile
+    db.rollback()
+    return changes, position
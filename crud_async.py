@@ -0,0 +1,68 @@
+import functools
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from . import crud
+    from .database import SQLALCHEMY_ASYNC
+except:
+    import crud
+    from database import SQLALCHEMY_ASYNC
+
+
+async def run(db, function, *args, **kwargs):
+    """
+    Run a sync crud function without blocking the event loop
+
+    :param db: Existing database session, either a Session or an AsyncSession
+    :param function: Crud function taking the session as first argument
+
+    :returns result: Whatever the crud function returns
+    """
+
+    # Async sessions run the function on their greenlet, sync sessions on the threadpool
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(function, *args, **kwargs)
+    return await run_in_threadpool(function, db, *args, **kwargs)
+
+
+def awaitable(function):
+    """
+    Build the awaitable version of a crud function
+
+    :param function: Crud function taking the session as first argument
+
+    :returns wrapper: Coroutine function with the same arguments
+    """
+
+    @functools.wraps(function)
+    async def wrapper(db, *args, **kwargs):
+        return await run(db, function, *args, **kwargs)
+
+    return wrapper
+
+
+def endpoint(function):
+    """
+    Run the whole body of a sync endpoint in one AsyncSession.run_sync call when
+    SQLALCHEMY_ASYNC is enabled, otherwise fastapi runs it on the threadpool as before
+
+    :param function: Endpoint taking the database session as the db keyword argument
+
+    :returns wrapper: Coroutine endpoint with the same signature
+    """
+
+    if not SQLALCHEMY_ASYNC:
+        return function
+
+    @functools.wraps(function)
+    async def wrapper(*args, db, **kwargs):
+        return await db.run_sync(lambda session: function(*args, db=session, **kwargs))
+
+    return wrapper
+
+
+# Awaitable versions of the crud functions called from async routes
+
+get_changes = awaitable(crud.get_changes)
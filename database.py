@@ -1,21 +1,131 @@
+import itertools
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
+try:
+    from .metrics import instrument_engine, instrumented_pool_class
+except:
+    from metrics import instrument_engine, instrumented_pool_class
+
 # Load key-value pairs from .env file
 load_dotenv()
 
 # The connection string for database from environment variable
 SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
 
+# Connection strings of read only replicas separated by commas, the GET requests are spread over them in turn
+SQLALCHEMY_READ_DATABASE_URLS = [url.strip() for url in os.getenv("SQLALCHEMY_READ_DATABASE_URL", "").split(",") if url.strip()]
+
+# Seconds a client keeps reading from the primary after its own write, 0 to always read from the replicas
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Serve the requests from an asyncio engine instead of the threadpool when enabled
+SQLALCHEMY_ASYNC = os.getenv("SQLALCHEMY_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Connection pool settings, the defaults are the ones of sqlalchemy
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("SQLALCHEMY_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("SQLALCHEMY_MAX_OVERFLOW", "10")),
+    "pool_timeout": float(os.getenv("SQLALCHEMY_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("SQLALCHEMY_POOL_RECYCLE", "-1")),
+    "pool_pre_ping": os.getenv("SQLALCHEMY_POOL_PRE_PING", "false").lower() in ("1", "true", "yes"),
+}
+
+# Async drivers used in place of the sync drivers of the connection string
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str):
+    """
+    Convert a sync connection string to the matching async driver
+
+    :param url: Connection string using a sync driver
+
+    :returns url: Connection string using an async driver
+    """
+
+    # Swap the driver while keeping the credentials, host and database
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def engine_options(url):
+    """
+    Build the pool arguments of an engine for the given connection string
+
+    :param url: Connection string of the engine
+
+    :returns options: Keyword arguments for create_engine
+    """
+
+    # Keep the pool the dialect picks, only queue pools take the size, overflow and timeout
+    url = make_url(url)
+    pool_class = instrumented_pool_class(url.get_dialect().get_pool_class(url))
+    if pool_class is None:
+        return {"pool_recycle": POOL_OPTIONS["pool_recycle"], "pool_pre_ping": POOL_OPTIONS["pool_pre_ping"]}
+    return {"poolclass": pool_class, **POOL_OPTIONS}
+
+
 # Initialize sqlalchemy engine
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL
+    SQLALCHEMY_DATABASE_URL,
+    **engine_options(SQLALCHEMY_DATABASE_URL)
 )
 
+# Count and time the statements of every request
+instrument_engine(engine)
+
 # Create a local session for the connection
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Initialize the async engine and session only when the async mode is enabled
+async_engine = None
+AsyncSessionLocal = None
+if SQLALCHEMY_ASYNC:
+    SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL") or to_async_url(SQLALCHEMY_DATABASE_URL)
+    async_engine = create_async_engine(
+        SQLALCHEMY_ASYNC_DATABASE_URL,
+        **engine_options(SQLALCHEMY_ASYNC_DATABASE_URL)
+    )
+    instrument_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Initialize an engine and a session per replica, async ones in the async mode, the sync
+# engines are kept to tell the replica sessions apart
+read_engines = []
+async_read_engines = []
+ReadSessionLocals = []
+for url in SQLALCHEMY_READ_DATABASE_URLS:
+    if SQLALCHEMY_ASYNC:
+        async_read_engines.append(create_async_engine(to_async_url(url), **engine_options(to_async_url(url))))
+        ReadSessionLocals.append(async_sessionmaker(async_read_engines[-1], autoflush=False, expire_on_commit=False))
+        read_engine = async_read_engines[-1].sync_engine
+    else:
+        read_engine = create_engine(url, **engine_options(url))
+        ReadSessionLocals.append(sessionmaker(autocommit=False, autoflush=False, bind=read_engine))
+    instrument_engine(read_engine)
+    read_engines.append(read_engine)
+
+# Turns of the replicas, itertools.count can be shared between threads
+replica_turns = itertools.count()
+
+
+def read_session_local():
+    """
+    Pick the session of the next replica in turn
+
+    :returns result: Session factory of a replica, Ex: AsyncSession factory in the async mode
+    """
+
+    return ReadSessionLocals[next(replica_turns) % len(ReadSessionLocals)]
+
+
 # Initialize declarative base for sqlalchemy models
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
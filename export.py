@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Number of rows fetched from the server side cursor and written at a time
+EXPORT_BATCH_SIZE = 1000
+
+
+def encode_ndjson(columns: list, rows: list, first: bool):
+    """
+    Encode rows as newline delimited json objects
+
+    :param columns: Names of the columns of the rows
+    :param rows: Row tuples to be encoded
+    :param first: Whether these are the first rows of the export
+
+    :returns result: Encoded text
+    """
+
+    return "".join(json.dumps(dict(zip(columns, row)), separators=(",", ":")) + "\n" for row in rows)
+
+
+def encode_csv(columns: list, rows: list, first: bool):
+    """
+    Encode rows as csv lines, preceded by the header line for the first rows
+
+    :param columns: Names of the columns of the rows
+    :param rows: Row tuples to be encoded
+    :param first: Whether these are the first rows of the export
+
+    :returns result: Encoded text
+    """
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if first:
+        writer.writerow(columns)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+# Media type, file extension and encoder of every export format
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson", encode_ndjson),
+    "csv": ("text/csv", "csv", encode_csv),
+}
+
+
+def stream_sync(db, statement, columns: list, encode):
+    # Read the rows in batches from a server side cursor, a single select sees one consistent snapshot
+    result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    first = True
+    for rows in result.partitions():
+        yield encode(columns, rows, first)
+        first = False
+    if first:
+        yield encode(columns, [], first)
+
+
+async def stream_async(db: AsyncSession, statement, columns: list, encode):
+    # Same as stream_sync on the async session
+    result = await db.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    first = True
+    async for rows in result.partitions():
+        yield encode(columns, rows, first)
+        first = False
+    if first:
+        yield encode(columns, [], first)
+
+
+def export_table(db, model, format: str):
+    """
+    Stream every row of a table without building orm objects
+
+    :param db: Existing database session, either a Session or an AsyncSession
+    :param model: Model of the table to be exported
+    :param format: Export format, one of the keys of FORMATS
+
+    :returns response: Streaming response of the encoded rows
+    """
+
+    media_type, extension, encode = FORMATS[format]
+
+    # Select only the columns ordered by id
+    table = model.__table__
+    columns = [column.name for column in table.c]
+    statement = select(*table.c).order_by(table.c.id)
+
+    # The session stays open until the response is fully sent
+    if isinstance(db, AsyncSession):
+        content = stream_async(db, statement, columns, encode)
+    else:
+        content = stream_sync(db, statement, columns, encode)
+    headers = {"Content-Disposition": f'attachment; filename="{table.name}.{extension}"'}
+    return StreamingResponse(content, media_type=media_type, headers=headers)
@@ -1,33 +1,192 @@
-from fastapi import Depends, FastAPI, HTTPException
+import asyncio
+import math
+import time
+
+# Start of the import, the cold start report measures from here
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError, PendingRollbackError
 
 try:
-    from . import crud, models, schemas
-    from .database import SessionLocal, engine
+    from . import assignment, cache, changelog, crud, crud_async, export, metrics, models, schema, schemas, serialization
+    from . import database
+    from .database import POOL_OPTIONS, SQLALCHEMY_ASYNC, AsyncSessionLocal, SessionLocal, async_engine, engine
 except:
-    import crud, models, schemas
-    from database import SessionLocal, engine
+    import assignment, cache, changelog, crud, crud_async, export, metrics, models, schema, schemas, serialization
+    import database
+    from database import POOL_OPTIONS, SQLALCHEMY_ASYNC, AsyncSessionLocal, SessionLocal, async_engine, engine
 
-# Bind the engine to create all tables
-models.Base.metadata.create_all(bind=engine)
+# Durations in seconds of the cold start phases and the outcome of the schema check
+startup_report = {"phases": {}, "schema": None}
 
 # Initalize the fastapi app
 app = FastAPI()
 
+# Time every route and report the queries it sends in the Server-Timing header
+app.router.route_class = metrics.TimedRoute
+app.add_middleware(metrics.MetricsMiddleware)
 
-# Create dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
+# Cookie holding the time until which a client which wrote reads from the primary
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+
+def session_local(request: Request, response: Response):
+    """
+    Pick the database of a request, the replicas serve the reads in turn while the primary
+    serves the writes and the reads of a client within the read your writes window of its last write
+
+    :param request: Incoming request
+    :param response: Response the read your writes cookie is set on
+
+    :returns result: Session factory, async in the async mode
+    """
+
+    primary = AsyncSessionLocal if SQLALCHEMY_ASYNC else SessionLocal
+    if not database.ReadSessionLocals:
+        return primary
+
+    if request.method in ("GET", "HEAD"):
+        # A malformed cookie reads from the replicas
+        try:
+            pinned = float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        return primary if pinned else database.read_session_local()
+
+    # Keep the client on the primary until the replicas caught up with the write
+    if database.READ_YOUR_WRITES_SECONDS > 0:
+        until = time.time() + database.READ_YOUR_WRITES_SECONDS
+        response.set_cookie(READ_PRIMARY_COOKIE, f"{until:.3f}", max_age=math.ceil(database.READ_YOUR_WRITES_SECONDS), httponly=True)
+    return primary
+
+
+# Create dependency, the session is async when SQLALCHEMY_ASYNC is enabled
+if SQLALCHEMY_ASYNC:
+    async def get_db(request: Request, response: Response):
+        async with session_local(request, response)() as db:
+            yield db
+else:
+    def get_db(request: Request, response: Response):
+        db = session_local(request, response)()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+@app.on_event("startup")
+def prepare_database():
+    # Importing the app does not touch the database, the first connection and the schema check happen here
+    phases = startup_report["phases"]
+    phases["boot"] = time.perf_counter() - IMPORT_STARTED
+
+    # Open the first pooled connection, it is kept for the first request
+    start = time.perf_counter()
+    with engine.connect():
+        pass
+    phases["connect"] = time.perf_counter() - start
+
+    # Run the ddl only when the models changed since the last sync
+    if schema.SCHEMA_SYNC_ON_STARTUP:
+        start = time.perf_counter()
+        created = schema.sync_schema(engine)
+        phases["schema"] = time.perf_counter() - start
+        startup_report["schema"] = "unchanged" if created is None else "synced"
+    else:
+        startup_report["schema"] = "skipped"
+    phases["total"] = time.perf_counter() - IMPORT_STARTED
+
+
+@app.on_event("shutdown")
+async def dispose_engines():
+    # Close the pooled connections, async drivers keep worker threads alive until then
+    if async_engine is not None:
+        await async_engine.dispose()
+    for read_engine in database.async_read_engines:
+        await read_engine.dispose()
+
+
+
+def check_count_mode(count: str):
+    """
+    Verify the count query parameter of a list
+
+    :param count: "exact", "approximate" or None when the total is not wanted
+    """
+
+    if count not in (None, "exact", "approximate"):
+        raise HTTPException(status_code=400, detail="Please enter the count as exact or approximate")
+
+
+def set_total_count(response: Response, total: int, approximated: bool):
+    """
+    Hand out the number of records matching the filters of a list
+
+    :param response: Response of the list
+    :param total: Number of records
+    :param approximated: Whether the number is an estimate of the table size
+    """
+
+    response.headers["X-Total-Count"] = str(total)
+    if approximated:
+        response.headers["X-Total-Count-Approximate"] = "true"
+
+
+def make_etag(*versions: int):
+    """
+    Build the ETag of a response from the versions of the records it contains
+
+    :param versions: Versions of the records
+
+    :returns result: Quoted strong entity tag
+    """
+
+    return '"' + "-".join(str(version) for version in versions) + '"'
+
+
+def etag_matches(if_none_match: str, etag: str):
+    """
+    Compare the If-None-Match header with the current ETag, weakly as the header requires
+
+    :param if_none_match: Value of the If-None-Match header
+    :param etag: Current ETag of the response
+
+    :returns result: True when the client copy is still current
+    """
+
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def patch_values(patch, entity: str):
+    """
+    Read the fields sent in a patch body, refusing the blank ones
+
+    :param patch: Patch body with the optional fields
+    :param entity: Name of the entity in the error messages, Ex: "candidate"
+
+    :returns result: Dictionary of the sent fields
+    """
+
+    # Sanity checks on the sent fields only
+    values = patch.dict(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail=f"Please enter the {entity} fields to be updated")
+    for field, value in values.items():
+        if value is None or not str(value).strip():
+            raise HTTPException(status_code=400, detail=f"Please enter the {entity} {field}")
+    return values
 
 
 @app.get("/candidate/{candidate_id}", response_model=schemas.Candidate)
-def read_candidate(candidate_id: int, db: Session = Depends(get_db)):
+@crud_async.endpoint
+def read_candidate(candidate_id: int, response: Response, if_none_match: str = Header(None), db: Session = Depends(get_db)):
     """
     Fetch the candidate using :
     - **id**: Id of the candidate to be fetched
@@ -36,6 +195,12 @@ def read_candidate(candidate_id: int, db: Session = Depends(get_db)):
     : param candidate_id: candidate's id
     """
 
+    # Confirm a current client copy from the version alone, without fetching the candidate
+    if if_none_match is not None:
+        version = crud.get_candidate_version(db, candidate_id)
+        if version is not None and etag_matches(if_none_match, make_etag(version)):
+            return Response(status_code=304, headers={"ETag": make_etag(version)})
+
     # Fetch the candidate using id
     db_candidate = crud.get_candidate(db, candidate_id=candidate_id)
 
@@ -43,32 +208,99 @@ def read_candidate(candidate_id: int, db: Session = Depends(get_db)):
     if db_candidate is None:
         raise HTTPException(status_code=404, detail="Candidate not found")
 
-    # Return the fetched candidate
+    # Return the fetched candidate along with its version
+    response.headers["ETag"] = make_etag(db_candidate.version)
     return db_candidate
 
 
 @app.get("/candidates/", response_model=list[schemas.Candidate])
-def read_candidates(name: str = None, email: str=None, status: str = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@serialization.fast_json(schemas.Candidate)
+@crud_async.endpoint
+def read_candidates(response: Response, name: str = None, email: str=None, status: str = None, skip: int = 0, limit: int = 100, cursor: str = None, count: str = None, db: Session = Depends(get_db)):
     """
     Fetch the candidate using :
     - **name**: full name of the candidate
     - **email**: personal email of the candidate
     - **status**: current hiring status of the candidate, Ex: "pre-hire", "active", "inactive"
+    - **cursor**: value of the X-Next-Cursor header of the previous page, used instead of skip
+    - **count**: "exact" or "approximate" to receive the number of matching records in the X-Total-Count header, approximate only estimates unfiltered lists
 
     """
 
-    # Fetch the candidate by applying all the filters
-    candidates = crud.get_candidates(db, name, email, status, skip=skip, limit=limit)
+    # Sanity check on the page size
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="Please enter a positive limit")
+    check_count_mode(count)
+
+    # Fetch the candidate by applying all the filters, one extra row tells if a next page exists
+    try:
+        candidates = crud.get_candidates(db, name, email, status, skip=skip, limit=limit + 1, cursor=cursor, read_only=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    candidates, next_cursor = crud.paginate(candidates, limit)
 
     # Verify if the candidates exists
     if not candidates:
         raise HTTPException(status_code=404, detail="Candidate not found")
 
+    # Hand out the cursor of the next page, if there is one
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    # Count every matching candidate when asked, from the cache until the next write
+    if count:
+        set_total_count(response, *crud.count_candidates(db, name, email, status, approximate=count == "approximate"))
+
     # Return the list of fetched candidates
     return candidates
 
 
+@app.get("/candidates/export")
+def export_candidates(format: str = "ndjson", db: Session = Depends(get_db)):
+    """
+    Stream every candidate using :
+    - **format**: "ndjson" for one json object per line or "csv"
+
+    """
+
+    # Sanity check on the format
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="Please enter the format as ndjson or csv")
+
+    # Stream the candidates straight from the database cursor
+    return export.export_table(db, models.Candidate, format)
+
+
+@app.get("/candidates/search", response_model=list[schemas.Candidate])
+@serialization.fast_json(schemas.Candidate)
+@crud_async.endpoint
+def search_candidates(response: Response, q: str, limit: int = 20, db: Session = Depends(get_db)):
+    """
+    Search the candidates by name using :
+    - **q**: start of the name or a misspelled name, Ex: "aman gu" or "amna"
+    - **limit**: number of candidates to return, the best match first
+
+    """
+
+    # Sanity checks on the search text and the page size
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Please enter the search text")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="Please enter a positive limit")
+
+    # Fetch the best matches from the trigram index of the names
+    candidates = crud.search_candidates(db, q, limit)
+
+    # Verify if the candidates exists
+    if not candidates:
+        raise HTTPException(status_code=404, detail="Candidate not found")
+
+    # Return the list of matched candidates
+    return candidates
+
+
 @app.post("/candidate/", response_model=schemas.Candidate, status_code=201)
+@crud_async.endpoint
 def create_candidate(candidate: schemas.CandidateBase, db: Session = Depends(get_db)):
     """
     Create a candidate with following information:
@@ -89,15 +321,64 @@ def create_candidate(candidate: schemas.CandidateBase, db: Session = Depends(get
     if not candidate.status.strip():
         raise HTTPException(status_code=400, detail="Please enter the candidate status")
 
-    # Verify existence of given email in database
-    db_candidate = crud.get_candidate_by_email(db, email=candidate.email)
-    if db_candidate:
+    # Create and return the candidate, the unique email constraint rejects a registered email
+    try:
+        return crud.create_candidate(db=db, candidate=candidate)
+    except IntegrityError:
         raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Create and return the candidate
-    return crud.create_candidate(db=db, candidate=candidate)
+
+
+@app.post("/candidates/bulk", response_model=schemas.CandidateBulkResult, status_code=201)
+@crud_async.endpoint
+def create_candidates(candidates: list[schemas.CandidateBase], db: Session = Depends(get_db)):
+    """
+    Create many candidates at once, each with following information:
+
+    - **name**: full name of the candidate
+    - **email**: personal email of the candidate
+    - **status**: current hiring status of the candidate, Ex: "pre-hire", "active", "inactive"
+
+    Invalid items are reported in **errors** by their index and do not stop the others.
+
+    \f
+    :param candidates: List of candidate model inputs
+    """
+
+    errors = []
+    valid = []
+
+    # Sanity checks on every item of the post body
+    for index, candidate in enumerate(candidates):
+        if not candidate.name.strip():
+            errors.append(schemas.BulkError(index=index, detail="Please enter the candidate name"))
+        elif not candidate.email.strip():
+            errors.append(schemas.BulkError(index=index, detail="Please enter the candidate email"))
+        elif not candidate.status.strip():
+            errors.append(schemas.BulkError(index=index, detail="Please enter the candidate status"))
+        else:
+            valid.append((index, candidate))
+
+    # Verify existence of all given emails in database with one query
+    registered = crud.get_registered_candidate_emails(db, [candidate.email for _, candidate in valid])
+    new_candidates = []
+    for index, candidate in valid:
+        if candidate.email in registered:
+            errors.append(schemas.BulkError(index=index, detail="Email already registered"))
+        else:
+            registered.add(candidate.email)
+            new_candidates.append((index, candidate))
+
+    # Create all the remaining candidates in one transaction, rows losing a race on a constraint are reported
+    created = []
+    if new_candidates:
+        created, rejected = crud.create_candidates(db, [candidate for _, candidate in new_candidates])
+        errors.extend(schemas.BulkError(index=new_candidates[position][0], detail="Email already registered") for position in rejected)
+
+    # Return the created candidates along with the rejected items
+    return {"created": created, "errors": sorted(errors, key=lambda error: error.index)}
 
 @app.delete("/candidate/{candidate_id}")
+@crud_async.endpoint
 def delete_candidate(candidate_id: int, db: Session = Depends(get_db)):
     """
     Delete the candidate using :
@@ -113,7 +394,7 @@ def delete_candidate(candidate_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Candidate not found")
 
     # Verify if the candidate has any interview scheduled, else delete the candidate
-    interviews = crud.get_interviews(db, candidate_id=candidate_id)
+    interviews = crud.get_interviews(db, candidate_id=candidate_id, limit=1, read_only=True)
     if interviews:
         raise HTTPException(status_code=400, detail="Candidate can not be deleted as its interview is scheduled")
     else:
@@ -126,6 +407,7 @@ def delete_candidate(candidate_id: int, db: Session = Depends(get_db)):
 
 
 @app.delete("/candidate/")
+@crud_async.endpoint
 def delete_candidate_by_email(email: str, db:Session = Depends(get_db)):
     """
     Delete the candidate using :
@@ -141,7 +423,7 @@ def delete_candidate_by_email(email: str, db:Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Candidate not found")
 
     # Verify if the candidate has any interview scheduled, else delete the candidate
-    interviews = crud.get_interviews(db, candidate_id=db_candidate.id)
+    interviews = crud.get_interviews(db, candidate_id=db_candidate.id, limit=1, read_only=True)
     if interviews:
         raise HTTPException(status_code=400, detail="Candidate can not be deleted as its interview is scheduled")
     else:
@@ -153,7 +435,31 @@ def delete_candidate_by_email(email: str, db:Session = Depends(get_db)):
     return {"detail":"Candidate Deletion Unsuccessful"}
 
 
+@app.delete("/candidates/", response_model=schemas.BulkDeleteResult)
+@crud_async.endpoint
+def delete_candidates(candidates: schemas.BulkDelete, db: Session = Depends(get_db)):
+    """
+    Delete many candidates at once using :
+    - **ids**: Ids of the candidates to be deleted
+    - **emails**: Email ids of the candidates to be deleted
+
+    Candidates with an interview scheduled are reported in **blocked**, unknown ones in **missing_ids** and **missing_emails**.
+
+    \f
+    :param candidates: Ids and emails of the candidates
+    """
+
+    # Sanity check on the delete body
+    if not candidates.ids and not candidates.emails:
+        raise HTTPException(status_code=400, detail="Please enter the ids or emails of the candidates to be deleted")
+
+    # Delete every candidate without interviews in set based statements and report the others
+    deleted, blocked, missing_ids, missing_emails = crud.destroy_candidates(db, candidates.ids, candidates.emails)
+    return {"deleted": deleted, "blocked": blocked, "missing_ids": missing_ids, "missing_emails": missing_emails}
+
+
 @app.put("/candidate/{candidate_id}")
+@crud_async.endpoint
 def update_candidate(candidate_id: int, new_candidate: schemas.CandidateBase, db: Session = Depends(get_db)):
     """
     Update the candidate using:
@@ -163,12 +469,6 @@ def update_candidate(candidate_id: int, new_candidate: schemas.CandidateBase, db
     : param candidate_id: candidate's id
     """
 
-    # Verify if the candidate exists
-    old_candidate = read_candidate(candidate_id, db)
-    if not old_candidate:
-        raise HTTPException(status_code=404, detail="Candidate not found")
-
-
     # Sanity checks on post body
     if not new_candidate.name.strip():
         raise HTTPException(status_code=400, detail="Please enter the candidate name")
@@ -177,24 +477,46 @@ def update_candidate(candidate_id: int, new_candidate: schemas.CandidateBase, db
     if not new_candidate.status.strip():
         raise HTTPException(status_code=400, detail="Please enter the candidate status")
 
-    # verify if the email of new candidate already exists in db
-    candidate_email = crud.get_candidate_by_email(db, new_candidate.email)
-    if candidate_email and candidate_email.id != candidate_id:
+    # Update the candidate with one statement, the unique email constraint rejects a taken email
+    try:
+        res = crud.put_candidate(db, candidate_id, new_candidate.dict())
+    except IntegrityError:
         raise HTTPException(status_code=400, detail="Candidate with the provided email already exists")
 
-    # Append candidate id to CandidateBase schema to make it compatible as per Candidate schema
-    temp_record = new_candidate.dict()
-    temp_record["id"] = candidate_id
-    new_record = models.Candidate(**temp_record)
+    # Verify if the candidate exists and return details
+    if not res:
+        raise HTTPException(status_code=404, detail="Candidate not found")
+    return {"detail":"Candidate Updated Successfully"}
+
+
+@app.patch("/candidate/{candidate_id}")
+@crud_async.endpoint
+def patch_candidate(candidate_id: int, candidate: schemas.CandidatePatch, db: Session = Depends(get_db)):
+    """
+    Update only the sent fields of the candidate:
+    - **id**: Id of the candidate to be updated
+
+    \f
+    : param candidate_id: candidate's id
+    """
+
+    # Update the sent fields with one statement, the unique email constraint rejects a taken email
+    values = patch_values(candidate, "candidate")
+    try:
+        res = crud.put_candidate(db, candidate_id, values)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Candidate with the provided email already exists")
 
-    # Update the candidate and return details
-    crud.put_candidate(db, new_record)
+    # Verify if the candidate exists and return details
+    if not res:
+        raise HTTPException(status_code=404, detail="Candidate not found")
     return {"detail":"Candidate Updated Successfully"}
 
 # ++++++++++++++++++++++++++++++++============
 
 @app.get("/employee/{employee_id}", response_model=schemas.Employee)
-def read_employee(employee_id: int, db: Session = Depends(get_db)):
+@crud_async.endpoint
+def read_employee(employee_id: int, response: Response, if_none_match: str = Header(None), db: Session = Depends(get_db)):
     """
     Fetch the employee using :
     - **id**: Id of the employee to be fetched
@@ -202,39 +524,128 @@ def read_employee(employee_id: int, db: Session = Depends(get_db)):
     \f
     : param employee_id: employee's id
     """
+    # Confirm a current client copy from the version alone, without fetching the employee
+    if if_none_match is not None:
+        version = crud.get_employee_version(db, employee_id)
+        if version is not None and etag_matches(if_none_match, make_etag(version)):
+            return Response(status_code=304, headers={"ETag": make_etag(version)})
+
     # Fetch and verify if the employee exists
     db_employee = crud.get_employee(db, employee_id=employee_id)
     if db_employee is None:
         raise HTTPException(status_code=404, detail="Employee not found")
     
-    # Return the fetched employee
+    # Return the fetched employee along with its version
+    response.headers["ETag"] = make_etag(db_employee.version)
     return db_employee
 
 
 
 @app.get("/employees/", response_model=list[schemas.Employee])
-def read_employees(name: str = None, email: str=None, designation: str = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@serialization.fast_json(schemas.Employee)
+@crud_async.endpoint
+def read_employees(response: Response, name: str = None, email: str=None, designation: str = None, skip: int = 0, limit: int = 100, cursor: str = None, count: str = None, db: Session = Depends(get_db)):
     """
     Fetch the employee using :
 
     - **name**: full name of the employee
     - **email**: personal email of the employee
     - **designation**: current hiring designation of the employee, Ex: "CEO", "Developer", "Designer"
+    - **cursor**: value of the X-Next-Cursor header of the previous page, used instead of skip
+    - **count**: "exact" or "approximate" to receive the number of matching records in the X-Total-Count header, approximate only estimates unfiltered lists
 
     """
 
-    # Fetch the employees by applying all the filters
-    employees = crud.get_employees(db, name, email, designation, skip=skip, limit=limit)
+    # Sanity check on the page size
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="Please enter a positive limit")
+    check_count_mode(count)
+
+    # Fetch the employees by applying all the filters, one extra row tells if a next page exists
+    try:
+        employees = crud.get_employees(db, name, email, designation, skip=skip, limit=limit + 1, cursor=cursor, read_only=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    employees, next_cursor = crud.paginate(employees, limit)
 
     # Verify if any employee exists
     if not employees:
         raise HTTPException(status_code=404, detail="Employee not found")
 
+    # Hand out the cursor of the next page, if there is one
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    # Count every matching employee when asked, from the cache until the next write
+    if count:
+        set_total_count(response, *crud.count_employees(db, name, email, designation, approximate=count == "approximate"))
+
     # Return list of fetched employees
     return employees
 
 
+@app.get("/employees/workload", response_model=list[schemas.EmployeeWorkload])
+@serialization.fast_json(schemas.EmployeeWorkload)
+@crud_async.endpoint
+def read_employees_workload(response: Response, db: Session = Depends(get_db)):
+    """
+    Fetch the number of interviews of every employee:
+
+    - **total**: number of interviews of the employee
+    - **rounds**: number of interviews of the employee by round
+
+    """
+
+    # Count the interviews with one aggregate query, then from the workload cache
+    return crud.get_workload(db)
+
+
+@app.get("/employees/export")
+def export_employees(format: str = "ndjson", db: Session = Depends(get_db)):
+    """
+    Stream every employee using :
+    - **format**: "ndjson" for one json object per line or "csv"
+
+    """
+
+    # Sanity check on the format
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="Please enter the format as ndjson or csv")
+
+    # Stream the employees straight from the database cursor
+    return export.export_table(db, models.Employee, format)
+
+
+@app.get("/employees/search", response_model=list[schemas.Employee])
+@serialization.fast_json(schemas.Employee)
+@crud_async.endpoint
+def search_employees(response: Response, q: str, limit: int = 20, db: Session = Depends(get_db)):
+    """
+    Search the employees by name using :
+    - **q**: start of the name or a misspelled name, Ex: "aman gu" or "amna"
+    - **limit**: number of employees to return, the best match first
+
+    """
+
+    # Sanity checks on the search text and the page size
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Please enter the search text")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="Please enter a positive limit")
+
+    # Fetch the best matches from the trigram index of the names
+    employees = crud.search_employees(db, q, limit)
+
+    # Verify if the employees exists
+    if not employees:
+        raise HTTPException(status_code=404, detail="Employee not found")
+
+    # Return the list of matched employees
+    return employees
+
+
 @app.post("/employee/", response_model=schemas.Employee, status_code=201)
+@crud_async.endpoint
 def create_employee(employee: schemas.EmployeeBase, db: Session = Depends(get_db)):
     """
     Create a candidate with following information:
@@ -255,15 +666,64 @@ def create_employee(employee: schemas.EmployeeBase, db: Session = Depends(get_db
     if not employee.designation.strip():
         raise HTTPException(status_code=400, detail="Please enter the employee designation")
 
-    # Verify existence of given email in database
-    db_employee = crud.get_employee_by_email(db, email=employee.email)
-    if db_employee:
+    # Create and return the employee, the unique email constraint rejects a registered email
+    try:
+        return crud.create_employee(db=db, employee=employee)
+    except IntegrityError:
         raise HTTPException(status_code=400, detail="Employee with the provided email already exists")
-    
-    # Create and return the employee
-    return crud.create_employee(db=db, employee=employee)
+
+
+@app.post("/employees/bulk", response_model=schemas.EmployeeBulkResult, status_code=201)
+@crud_async.endpoint
+def create_employees(employees: list[schemas.EmployeeBase], db: Session = Depends(get_db)):
+    """
+    Create many employees at once, each with following information:
+
+    - **name**: full name of the employee
+    - **email**: personal email of the employee
+    - **designation**: current hiring designation of the employee, Ex: "CEO", "Developer", "Designer"
+
+    Invalid items are reported in **errors** by their index and do not stop the others.
+
+    \f
+    :param employees: List of employee model inputs
+    """
+
+    errors = []
+    valid = []
+
+    # Sanity checks on every item of the post body
+    for index, employee in enumerate(employees):
+        if not employee.name.strip():
+            errors.append(schemas.BulkError(index=index, detail="Please enter the employee name"))
+        elif not employee.email.strip():
+            errors.append(schemas.BulkError(index=index, detail="Please enter the employee email"))
+        elif not employee.designation.strip():
+            errors.append(schemas.BulkError(index=index, detail="Please enter the employee designation"))
+        else:
+            valid.append((index, employee))
+
+    # Verify existence of all given emails in database with one query
+    registered = crud.get_registered_employee_emails(db, [employee.email for _, employee in valid])
+    new_employees = []
+    for index, employee in valid:
+        if employee.email in registered:
+            errors.append(schemas.BulkError(index=index, detail="Employee with the provided email already exists"))
+        else:
+            registered.add(employee.email)
+            new_employees.append((index, employee))
+
+    # Create all the remaining employees in one transaction, rows losing a race on a constraint are reported
+    created = []
+    if new_employees:
+        created, rejected = crud.create_employees(db, [employee for _, employee in new_employees])
+        errors.extend(schemas.BulkError(index=new_employees[position][0], detail="Employee with the provided email already exists") for position in rejected)
+
+    # Return the created employees along with the rejected items
+    return {"created": created, "errors": sorted(errors, key=lambda error: error.index)}
 
 @app.delete("/employee/{employee_id}")
+@crud_async.endpoint
 def delete_employee(employee_id: int, db: Session = Depends(get_db)):
     """
     Delete the employee using :
@@ -280,7 +740,7 @@ def delete_employee(employee_id: int, db: Session = Depends(get_db)):
     
 
     # Verify if the employee has any interview scheduled, else delete the employee
-    interviews = crud.get_interviews(db, employee_id=employee_id)
+    interviews = crud.get_interviews(db, employee_id=employee_id, limit=1, read_only=True)
     if interviews:
         raise HTTPException(status_code=400, detail="Employee can not be deleted as its an interviewer")
     else:
@@ -293,6 +753,7 @@ def delete_employee(employee_id: int, db: Session = Depends(get_db)):
 
 
 @app.delete("/employee/")
+@crud_async.endpoint
 def delete_employee_by_email(email: str, db:Session = Depends(get_db)):
     """
     Delete the employee using :
@@ -308,7 +769,7 @@ def delete_employee_by_email(email: str, db:Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Employee not found")
 
     # Verify if the employee has any interview scheduled, else delete the employee
-    interviews = crud.get_interviews(db, employee_id=db_employee.id)
+    interviews = crud.get_interviews(db, employee_id=db_employee.id, limit=1, read_only=True)
     if interviews:
         raise HTTPException(status_code=400, detail="Employee can not be deleted as its an interviewer")
     else:
@@ -320,7 +781,31 @@ def delete_employee_by_email(email: str, db:Session = Depends(get_db)):
     return {"detail":"Employee Deletion Unsuccessful"}
 
 
+@app.delete("/employees/", response_model=schemas.BulkDeleteResult)
+@crud_async.endpoint
+def delete_employees(employees: schemas.BulkDelete, db: Session = Depends(get_db)):
+    """
+    Delete many employees at once using :
+    - **ids**: Ids of the employees to be deleted
+    - **emails**: Email ids of the employees to be deleted
+
+    Employees with an interview scheduled are reported in **blocked**, unknown ones in **missing_ids** and **missing_emails**.
+
+    \f
+    :param employees: Ids and emails of the employees
+    """
+
+    # Sanity check on the delete body
+    if not employees.ids and not employees.emails:
+        raise HTTPException(status_code=400, detail="Please enter the ids or emails of the employees to be deleted")
+
+    # Delete every employee without interviews in set based statements and report the others
+    deleted, blocked, missing_ids, missing_emails = crud.destroy_employees(db, employees.ids, employees.emails)
+    return {"deleted": deleted, "blocked": blocked, "missing_ids": missing_ids, "missing_emails": missing_emails}
+
+
 @app.put("/employee/{employee_id}")
+@crud_async.endpoint
 def update_employee(employee_id: int, new_employee: schemas.EmployeeBase, db: Session = Depends(get_db)):
     """
     Update the employee using:
@@ -330,11 +815,6 @@ def update_employee(employee_id: int, new_employee: schemas.EmployeeBase, db: Se
     : param employee_id: employee's id
     """
 
-    # Verify if the employee exists
-    old_employee = read_employee(employee_id, db)
-    if not old_employee:
-        raise HTTPException(status_code=404, detail="Employee not found")
-    
     # Sanity checks on post body
     if not new_employee.name.strip():
         raise HTTPException(status_code=400, detail="Please enter the employee name")
@@ -343,64 +823,201 @@ def update_employee(employee_id: int, new_employee: schemas.EmployeeBase, db: Se
     if not new_employee.designation.strip():
         raise HTTPException(status_code=400, detail="Please enter the employee designation")
 
-    # verify if the email of new employee already exists in db
-    employee_email  = crud.get_employee_by_email(db, new_employee.email)
-    if employee_email and employee_email.id != employee_id:
+    # Update the employee with one statement, the unique email constraint rejects a taken email
+    try:
+        res = crud.put_employee(db, employee_id, new_employee.dict())
+    except IntegrityError:
         raise HTTPException(status_code=400, detail="Employee with the provided email already exists")
-    
-    # Append employee id to EmployeeBase schema to make it compatible as per Employee schema
-    temp_record = new_employee.dict()
-    temp_record["id"] = employee_id
-    new_record = models.Employee(**temp_record)
 
-    # Update the employee and return details
-    crud.put_employee(db, new_record)
+    # Verify if the employee exists and return details
+    if not res:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    return {"detail":"Employee Updated Successfully"}
+
+
+@app.patch("/employee/{employee_id}")
+@crud_async.endpoint
+def patch_employee(employee_id: int, employee: schemas.EmployeePatch, db: Session = Depends(get_db)):
+    """
+    Update only the sent fields of the employee:
+    - **id**: Id of the employee to be updated
+
+    \f
+    : param employee_id: employee's id
+    """
+
+    # Update the sent fields with one statement, the unique email constraint rejects a taken email
+    values = patch_values(employee, "employee")
+    try:
+        res = crud.put_employee(db, employee_id, values)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Employee with the provided email already exists")
+
+    # Verify if the employee exists and return details
+    if not res:
+        raise HTTPException(status_code=404, detail="Employee not found")
     return {"detail":"Employee Updated Successfully"}
 
 # +++++++++++++++++++++++++
 
-@app.get("/interview/{interview_id}", response_model=schemas.Interview)
-def read_interview(interview_id: int, db: Session = Depends(get_db)):
+def parse_expand(expand: str):
+    """
+    Read the comma separated names of the related records to be embedded in interviews
+
+    :param expand: Value of the expand query parameter, Ex: "candidate,employee"
+
+    :returns result: Tuple of the names
+    """
+
+    # Verify every name is a relationship of the interview
+    names = tuple(dict.fromkeys(name.strip() for name in expand.split(",") if name.strip())) if expand else ()
+    for name in names:
+        if name not in crud.INTERVIEW_EXPANSIONS:
+            raise HTTPException(status_code=400, detail=f"Interview can not be expanded with {name}")
+    return names
+
+
+def expand_interview(interview, expand: tuple):
+    """
+    Embed the loaded related records in the interview response
+
+    :param interview: Interview record loaded with its related records
+    :param expand: Names of the related records to be embedded
+
+    :returns result: Expanded interview schema
+    """
+
+    return schemas.InterviewExpanded(
+        id=interview.id,
+        round=interview.round,
+        candidate_id=interview.candidate_id,
+        employee_id=interview.employee_id,
+        version=interview.version,
+        candidate=interview.candidates if "candidate" in expand else None,
+        employee=interview.employees if "employee" in expand else None,
+    )
+
+
+@app.get("/interview/{interview_id}", response_model=schemas.InterviewExpanded, response_model_exclude_none=True)
+@crud_async.endpoint
+def read_interview(interview_id: int, response: Response, expand: str = None, if_none_match: str = Header(None), db: Session = Depends(get_db)):
     """
     Fetch the interview using :
     - **interview_id**: Id of the interview to be fetched
+    - **expand**: related records to be embedded, Ex: "candidate,employee"
 
     \f
     : param interview_id: interview id
     """
 
+    expand = parse_expand(expand)
+
+    # Confirm a current client copy from the version alone, the expanded ones also depend on the related records
+    if if_none_match is not None and not expand:
+        version = crud.get_interview_version(db, interview_id)
+        if version is not None and etag_matches(if_none_match, make_etag(version)):
+            return Response(status_code=304, headers={"ETag": make_etag(version)})
+
     # Verify if the interview exists
-    db_interview = crud.get_interview(db, interview_id=interview_id)
+    db_interview = crud.get_interview(db, interview_id=interview_id, expand=expand)
     if db_interview is None:
         raise HTTPException(status_code=404, detail="Interview not found")
-    
-    # Return the fetched interview
-    return db_interview
-
 
-@app.get("/interviews/", response_model=list[schemas.Interview])
-def read_interviews(round: int = None, candidate_id: int=None, employee_id: int = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    # Return the fetched interview, with the related records when asked
+    if not expand:
+        response.headers["ETag"] = make_etag(db_interview.version)
+        return db_interview
+    expanded = expand_interview(db_interview, expand)
+    etag = make_etag(expanded.version, *(getattr(expanded, name).version for name in expand))
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return expanded
+
+
+@app.get("/interviews/", response_model=list[schemas.InterviewExpanded], response_model_exclude_none=True)
+@serialization.fast_json(schemas.InterviewExpanded, exclude_none=True)
+@crud_async.endpoint
+def read_interviews(response: Response, round: int = None, candidate_id: int=None, employee_id: int = None, skip: int = 0, limit: int = 100, cursor: str = None, count: str = None, expand: str = None, db: Session = Depends(get_db)):
     """
     Fetch interviews with following information:
 
     - **round**: round number of the interview
     - **candidate_id**: Id of the candidate to be interviewed
     - **employee_id**: Id of the employee interviewing
+    - **cursor**: value of the X-Next-Cursor header of the previous page, used instead of skip
+    - **count**: "exact" or "approximate" to receive the number of matching records in the X-Total-Count header, approximate only estimates unfiltered lists
+    - **expand**: related records to be embedded, Ex: "candidate,employee"
 
     """
 
-    # Fetch the interviews by applying all the filters
-    interviews = crud.get_interviews(db, round, candidate_id, employee_id, skip=skip, limit=limit)
+    # Sanity check on the page size
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="Please enter a positive limit")
+    check_count_mode(count)
+    expand = parse_expand(expand)
+
+    # Fetch the interviews by applying all the filters, one extra row tells if a next page exists
+    try:
+        interviews = crud.get_interviews(db, round, candidate_id, employee_id, skip=skip, limit=limit + 1, cursor=cursor, expand=expand, read_only=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    interviews, next_cursor = crud.paginate(interviews, limit)
 
     # Verify if the interview exists
     if not interviews:
         raise HTTPException(status_code=404, detail="Interview not found")
     
-    # Return the list of fetched interviews
+    # Hand out the cursor of the next page, if there is one
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    # Count every matching interview when asked, from the cache until the next write
+    if count:
+        set_total_count(response, *crud.count_interviews(db, round, candidate_id, employee_id, approximate=count == "approximate"))
+
+    # Return the list of fetched interviews, with the related records when asked
+    if expand:
+        return [expand_interview(interview, expand) for interview in interviews]
     return interviews
 
 
+@app.get("/interviews/export")
+def export_interviews(format: str = "ndjson", db: Session = Depends(get_db)):
+    """
+    Stream every interview using :
+    - **format**: "ndjson" for one json object per line or "csv"
+
+    """
+
+    # Sanity check on the format
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="Please enter the format as ndjson or csv")
+
+    # Stream the interviews straight from the database cursor
+    return export.export_table(db, models.Interview, format)
+
+
+def raise_interview_error(db: Session, values: dict, interview_id: int = None):
+    """
+    Find out why a guarded interview write was refused, only run on failure
+
+    :param db: Existing database session
+    :param values: Fields the write tried to set
+    :param interview_id: Id of the updated interview, None for a create
+    """
+
+    if interview_id is not None and crud.get_interview_version(db, interview_id) is None:
+        raise HTTPException(status_code=404, detail="Interview not found")
+    if "candidate_id" in values and not crud.get_candidate(db, values["candidate_id"]):
+        raise HTTPException(status_code=400, detail="Candidate to be interviewed is not registered")
+    if "employee_id" in values and not crud.get_employee(db, values["employee_id"]):
+        raise HTTPException(status_code=400, detail="Employee as Interviewer is not available")
+    raise HTTPException(status_code=400, detail="Interview already scheduled")
+
+
 @app.post("/interview/", response_model=schemas.Interview, status_code=201)
+@crud_async.endpoint
 def create_interview(interview: schemas.InterviewBase, db: Session = Depends(get_db)):
     """
     Create an interview with following information:
@@ -421,27 +1038,193 @@ def create_interview(interview: schemas.InterviewBase, db: Session = Depends(get
     if not interview.employee_id:
         raise HTTPException(status_code=400, detail="Please enter the non-zero employee id")
 
-    # Verify existence of given candidate and employee ID's in database
-    db_interview = crud.get_interviews(db, candidate_id=interview.candidate_id, employee_id=interview.employee_id)
-    if db_interview:
+    # Create the interview with one statement, the candidate and employee checks are part of it
+    # and a scheduled pair is refused by the unique constraint
+    try:
+        res = crud.create_interview(db=db, interview=interview)
+    except IntegrityError:
+        res = None
+    if res is None:
+        raise_interview_error(db, interview.dict())
+    return res
+
+
+@app.post("/interviews/bulk", response_model=schemas.InterviewBulkResult, status_code=201)
+@crud_async.endpoint
+def create_interviews(interviews: list[schemas.InterviewBase], db: Session = Depends(get_db)):
+    """
+    Create many interviews at once, each with following information:
+
+    - **round**: round number of the interview
+    - **candidate_id**: Id of the candidate to be interviewed
+    - **employee_id**: Id of the employee interviewing
+
+    Invalid items are reported in **errors** by their index and do not stop the others.
+
+    \f
+    :param interviews: List of interview model inputs
+    """
+
+    errors = []
+    valid = []
+
+    # Sanity checks on every item of the post body
+    for index, interview in enumerate(interviews):
+        if not interview.round:
+            errors.append(schemas.BulkError(index=index, detail="Please enter non-zero round"))
+        elif not interview.candidate_id:
+            errors.append(schemas.BulkError(index=index, detail="Please enter the non-zero candidate id"))
+        elif not interview.employee_id:
+            errors.append(schemas.BulkError(index=index, detail="Please enter the non-zero employee id"))
+        else:
+            valid.append((index, interview))
+
+    # Fetch the scheduled pairs and the registered candidates and employees with one query each
+    scheduled = crud.get_scheduled_pairs(db, {(interview.candidate_id, interview.employee_id) for _, interview in valid})
+    candidate_ids = crud.get_registered_candidate_ids(db, {interview.candidate_id for _, interview in valid})
+    employee_ids = crud.get_registered_employee_ids(db, {interview.employee_id for _, interview in valid})
+
+    new_interviews = []
+    for index, interview in valid:
+        pair = (interview.candidate_id, interview.employee_id)
+        if pair in scheduled:
+            errors.append(schemas.BulkError(index=index, detail="Interview already scheduled"))
+        elif interview.candidate_id not in candidate_ids:
+            errors.append(schemas.BulkError(index=index, detail="Candidate to be interviewed is not registered"))
+        elif interview.employee_id not in employee_ids:
+            errors.append(schemas.BulkError(index=index, detail="Employee as Interviewer is not available"))
+        else:
+            scheduled.add(pair)
+            new_interviews.append((index, interview))
+
+    # Create all the remaining interviews in one transaction, rows losing a race on a constraint are reported
+    created = []
+    if new_interviews:
+        created, rejected = crud.create_interviews(db, [interview for _, interview in new_interviews])
+        errors.extend(schemas.BulkError(index=new_interviews[position][0], detail="Interview already scheduled") for position in rejected)
+
+    # Return the created interviews along with the rejected items
+    return {"created": created, "errors": sorted(errors, key=lambda error: error.index)}
+
+
+
+@app.post("/interviews/schedule", response_model=schemas.InterviewBulkResult, status_code=201)
+@crud_async.endpoint
+def schedule_interviews(schedule: schemas.InterviewSchedule, db: Session = Depends(get_db)):
+    """
+    Create a whole round of interviews with one employee for many candidates:
+
+    - **round**: round number of the interviews
+    - **employee_id**: Id of the employee interviewing
+    - **candidate_ids**: Ids of the candidates to be interviewed
+
+    Candidates which are not registered or already have an interview with the employee are
+    reported in **errors** by their index and do not stop the others.
+
+    \f
+    :param schedule: Round, employee and candidates of the interviews
+    """
+
+    # Sanity checks on post body
+    if not schedule.round:
+        raise HTTPException(status_code=400, detail="Please enter non-zero round")
+    if not schedule.employee_id:
+        raise HTTPException(status_code=400, detail="Please enter the non-zero employee id")
+    if not schedule.candidate_ids:
+        raise HTTPException(status_code=400, detail="Please enter the candidate ids")
+    if not crud.get_employee(db, schedule.employee_id):
+        raise HTTPException(status_code=400, detail="Employee as Interviewer is not available")
+
+    # Create all the interviews in one transaction with set based inserts
+    try:
+        created = crud.schedule_interviews(db, schedule.round, schedule.employee_id, schedule.candidate_ids)
+    except IntegrityError:
         raise HTTPException(status_code=400, detail="Interview already scheduled")
 
-    # Fetch and verify if any of the provided candidate id or employee id is not registered
-    isCandidate = crud.get_candidate(db, interview.candidate_id)
-    isEmployee = crud.get_employee(db, interview.employee_id)
+    # Report the candidates left out, looking up only which of them are registered
+    created_ids = {interview.candidate_id for interview in created}
+    registered = crud.get_registered_candidate_ids(db, set(schedule.candidate_ids) - created_ids)
+    errors = []
+    for index, candidate_id in enumerate(schedule.candidate_ids):
+        if candidate_id in created_ids:
+            # Later repeats of the same candidate are already scheduled by the first one
+            created_ids.discard(candidate_id)
+            registered.add(candidate_id)
+        elif candidate_id in registered:
+            errors.append(schemas.BulkError(index=index, detail="Interview already scheduled"))
+        else:
+            errors.append(schemas.BulkError(index=index, detail="Candidate to be interviewed is not registered"))
+
+    # Return the created interviews along with the rejected items
+    return {"created": created, "errors": errors}
+
+
+@app.post("/interviews/auto-assign", response_model=schemas.InterviewBulkResult, status_code=201)
+@crud_async.endpoint
+def auto_assign_interviews(assign: schemas.InterviewAutoAssign, db: Session = Depends(get_db)):
+    """
+    Create an interview for every candidate with the least loaded employee who did not interview the candidate yet:
 
-    if not isCandidate:
-        raise HTTPException(status_code=400, detail="Candidate to be interviewed is not registered")
-    elif not isEmployee:
+    - **round**: round number of the interviews
+    - **candidate_ids**: Ids of the candidates to be interviewed
+    - **designation**: designation of the employees to pick from, Ex: "Developer", all of them when not given
+
+    Candidates which are not registered or have no employee left are reported in **errors** by their
+    index and do not stop the others.
+
+    \f
+    :param assign: Round, candidates and designation of the interviews
+    """
+
+    # Sanity checks on post body
+    if not assign.round:
+        raise HTTPException(status_code=400, detail="Please enter non-zero round")
+    if not assign.candidate_ids:
+        raise HTTPException(status_code=400, detail="Please enter the candidate ids")
+
+    # Fetch the load of the eligible employees with one aggregate query
+    loads = crud.get_employee_loads(db, assign.designation)
+    if not loads:
         raise HTTPException(status_code=400, detail="Employee as Interviewer is not available")
-    else:
-        # Create and return the interview 
-        res = crud.create_interview(db=db, interview=interview)
-        return res
 
+    # Fetch the registered candidates and the employees who met them with set based queries
+    registered = crud.get_registered_candidate_ids(db, set(assign.candidate_ids))
+    interviewed = crud.get_interviewed_employees(db, registered)
+
+    errors = []
+    pending = []
+    seen = set()
+    for index, candidate_id in enumerate(assign.candidate_ids):
+        if candidate_id not in registered:
+            errors.append(schemas.BulkError(index=index, detail="Candidate to be interviewed is not registered"))
+        elif candidate_id in seen:
+            # A repeated candidate is already assigned by its first occurrence
+            errors.append(schemas.BulkError(index=index, detail="Interview already scheduled"))
+        else:
+            seen.add(candidate_id)
+            pending.append((index, candidate_id))
+
+    # Pair the candidates with the employees in memory
+    new_interviews = []
+    employee_ids = assignment.assign_interviewers(loads, interviewed, [candidate_id for _, candidate_id in pending])
+    for (index, candidate_id), employee_id in zip(pending, employee_ids):
+        if employee_id is None:
+            errors.append(schemas.BulkError(index=index, detail="Employee as Interviewer is not available"))
+        else:
+            new_interviews.append((index, schemas.InterviewBase(round=assign.round, candidate_id=candidate_id, employee_id=employee_id)))
+
+    # Create all the interviews in one transaction, rows losing a race on a constraint are reported
+    created = []
+    if new_interviews:
+        created, rejected = crud.create_interviews(db, [interview for _, interview in new_interviews])
+        errors.extend(schemas.BulkError(index=new_interviews[position][0], detail="Interview already scheduled") for position in rejected)
+
+    # Return the created interviews along with the rejected items
+    return {"created": created, "errors": sorted(errors, key=lambda error: error.index)}
 
 
 @app.delete("/interview/{interview_id}")
+@crud_async.endpoint
 def delete_interview(interview_id: int, db: Session = Depends(get_db)):
     """
     Delete the interview using :
@@ -464,6 +1247,7 @@ def delete_interview(interview_id: int, db: Session = Depends(get_db)):
 
 
 @app.put("/interview/{interview_id}")
+@crud_async.endpoint
 def update_interview(interview_id: int, new_interview: schemas.InterviewBase, db: Session = Depends(get_db)):
     """
     Update the interview using:
@@ -473,25 +1257,140 @@ def update_interview(interview_id: int, new_interview: schemas.InterviewBase, db
     : param interview_id: interview id
     """
 
-    # Verify if the interview exists
-    old_interview = read_interview(interview_id, db)
-    if not old_interview:
-        raise HTTPException(status_code=404, detail="Interview not found")
+    # Update the interview with one statement guarded by the candidate and employee checks
+    try:
+        res = crud.put_interview(db, interview_id, new_interview.dict())
+    except IntegrityError:
+        res = 0
+    if not res:
+        raise_interview_error(db, new_interview.dict(), interview_id)
+    return {"detail":"Interview Updated Successfully"}
 
-    # Fetch and verify if any of the provided candidate id or employee id is not registered
-    isCandidate = crud.get_candidate(db, new_interview.candidate_id)
-    isEmployee = crud.get_employee(db, new_interview.employee_id)
 
-    if not isCandidate:
-        raise HTTPException(status_code=400, detail="Candidate to be interviewed is not registered")
-    elif not isEmployee:
-        raise HTTPException(status_code=400, detail="Employee as Interviewer is not available")
-    else:
-        # Append interview id to InterviewBase schema to make it compatible as per Interview schema
-        temp_record = new_interview.dict()
-        temp_record["id"] = interview_id
-        new_record = models.Interview(**temp_record)
-
-        # Create and return the details
-        crud.put_interview(db, new_record)
-        return {"detail":"Interview Updated Successfully"}
\ No newline at end of file
+@app.patch("/interview/{interview_id}")
+@crud_async.endpoint
+def patch_interview(interview_id: int, interview: schemas.InterviewPatch, db: Session = Depends(get_db)):
+    """
+    Update only the sent fields of the interview:
+    - **interview_id**: Id of the interview to be updated
+
+    \f
+    : param interview_id: interview id
+    """
+
+    # Sanity checks on the sent fields only
+    values = interview.dict(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="Please enter the interview fields to be updated")
+    if "round" in values and not values["round"]:
+        raise HTTPException(status_code=400, detail="Please enter non-zero round")
+    if "candidate_id" in values and not values["candidate_id"]:
+        raise HTTPException(status_code=400, detail="Please enter the non-zero candidate id")
+    if "employee_id" in values and not values["employee_id"]:
+        raise HTTPException(status_code=400, detail="Please enter the non-zero employee id")
+
+    # Update the sent fields with one statement guarded by the candidate and employee checks
+    try:
+        res = crud.put_interview(db, interview_id, values)
+    except IntegrityError:
+        res = 0
+    if not res:
+        raise_interview_error(db, values, interview_id)
+    return {"detail":"Interview Updated Successfully"}
+
+# +++++++++++++++++++++++++
+
+@app.get("/changes", response_model=schemas.ChangeFeed)
+async def read_changes(since: int = 0, limit: int = 100, wait: float = 0, db: Session = Depends(get_db)):
+    """
+    Fetch the inserts, updates and deletes of candidates, employees and interviews in commit order using:
+    - **since**: sequence number of the last change already read, the next of the previous response
+    - **limit**: maximum number of changes to return
+    - **wait**: seconds to wait for a change when there is none yet, 0 to return at once
+
+    """
+
+    # Sanity checks on the position, the page size and the wait
+    if since < 0:
+        raise HTTPException(status_code=400, detail="Please enter a non-negative since")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="Please enter a positive limit")
+    if not 0 <= wait <= changelog.CHANGE_FEED_MAX_WAIT:
+        raise HTTPException(status_code=400, detail=f"Please enter a wait between 0 and {changelog.CHANGE_FEED_MAX_WAIT:g} seconds")
+
+    # Read the log again until a change arrives, no connection is held while waiting
+    deadline = time.monotonic() + wait
+    while True:
+        changes, position = await crud_async.get_changes(db, since, limit)
+        if changes or time.monotonic() + changelog.CHANGE_FEED_POLL_INTERVAL > deadline:
+            return {"changes": changes, "next": position}
+        await asyncio.sleep(changelog.CHANGE_FEED_POLL_INTERVAL)
+
+# +++++++++++++++++++++++++
+
+@app.get("/internal/pool")
+def read_pool_status():
+    """
+    Fetch the usage of the database connection pool:
+
+    - **checked_out**: connections currently lent to requests
+    - **overflow_in_use**: connections opened above the pool size
+    - **timeouts**: checkouts which gave up after the pool timeout
+    - **checkout_wait_seconds**: histogram of the time spent waiting for a connection
+
+    The read replicas, when configured, are reported in order under **replicas**
+    """
+
+    # Report the pool of the engine serving the requests
+    pool = async_engine.pool if SQLALCHEMY_ASYNC else engine.pool
+    status = {"primary": metrics.pool_status(pool, POOL_OPTIONS["max_overflow"])}
+    if database.read_engines:
+        status["replicas"] = [metrics.pool_status(read_engine.pool, POOL_OPTIONS["max_overflow"]) for read_engine in database.read_engines]
+    return status
+
+
+@app.get("/internal/cache")
+def read_cache_status():
+    """
+    Fetch the size, hits, misses and evictions of the single record caches and the list count caches,
+    along with the size and loads of the workload cache and the position of the change log tailer
+
+    """
+
+    # Report every entity cache
+    return {
+        "candidates": cache.candidates.stats(),
+        "employees": cache.employees.stats(),
+        "interviews": cache.interviews.stats(),
+        "candidate_counts": cache.candidate_counts.stats(),
+        "employee_counts": cache.employee_counts.stats(),
+        "interview_counts": cache.interview_counts.stats(),
+        "workload": cache.workload.stats(),
+        "change_log": changelog.tailer.stats(),
+    }
+
+
+@app.get("/internal/startup")
+def read_startup_report():
+    """
+    Fetch the cold start of this worker:
+
+    - **phases**: seconds spent booting (import until startup), opening the first connection, checking the schema, and in total
+    - **schema**: "unchanged" when the fingerprint matched, "synced" when the ddl ran, "skipped" when disabled
+
+    """
+
+    return startup_report
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """
+    Fetch the latency and queries per request histograms of every route along with
+    the connection pool metrics, in the prometheus text format
+
+    """
+
+    # Report the pool of the engine serving the requests
+    pool = async_engine.pool if SQLALCHEMY_ASYNC else engine.pool
+    return PlainTextResponse(metrics.render_prometheus(pool), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,384 @@
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.datastructures import MutableHeaders
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Upper bounds of the queries per request histogram buckets
+QUERY_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    """
+    Thread safe histogram of observed values with fixed bucket bounds
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        """
+        Record a value in the first bucket whose bound is greater or equal to it
+
+        :param value: Observed value
+        """
+
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        """
+        Read the histogram with cumulative bucket counts
+
+        :returns result: Dictionary of buckets, count and sum
+        """
+
+        with self.lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+
+        # Accumulate the counts as every bucket includes the ones below it
+        buckets = {}
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {"buckets": buckets, "count": count, "sum": total}
+
+
+class InstrumentedPool:
+    """
+    Pool mixin timing every connection checkout and counting the checkout timeouts
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = Histogram()
+        self.timeouts = 0
+        self.timeouts_lock = threading.Lock()
+
+    def _do_get(self):
+        # Time the wait for a free connection, including the connect of a new one
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self.timeouts_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - start)
+
+
+class InstrumentedQueuePool(InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrumented_pool_class(pool_class):
+    """
+    Find the instrumented version of the default pool class of a dialect
+
+    :param pool_class: Pool class the dialect would use for the connection string
+
+    :returns result: Instrumented pool class, or None when the pool is not a queue pool
+    """
+
+    # Only queue pools wait for connections, sqlite memory and aiosqlite use other pools
+    if issubclass(pool_class, AsyncAdaptedQueuePool):
+        return InstrumentedAsyncAdaptedQueuePool
+    if issubclass(pool_class, QueuePool):
+        return InstrumentedQueuePool
+    return None
+
+
+def pool_status(pool, max_overflow: int):
+    """
+    Report the usage of a connection pool
+
+    :param pool: Connection pool of an engine
+    :param max_overflow: Configured number of connections allowed above the pool size
+
+    :returns result: Dictionary of pool counters and checkout wait histogram
+    """
+
+    # Pools other than the queue pools only report their status string
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__, "status": pool.status()}
+
+    status = {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": max_overflow,
+        "timeout": pool.timeout(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow_in_use": max(pool.overflow(), 0),
+    }
+    if isinstance(pool, InstrumentedPool):
+        status["timeouts"] = pool.timeouts
+        status["checkout_wait_seconds"] = pool.checkout_wait.snapshot()
+    return status
+
+
+class RequestTimings:
+    """
+    Queries and durations collected while serving one request
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.route = None
+        self.queries = 0
+        self.db = 0.0
+        self.endpoint = 0.0
+        self.endpoint_end = None
+        self.handler_end = None
+
+    def server_timing(self):
+        """
+        Format the durations as a Server-Timing header value
+
+        :returns result: Header value with the db, app, serialize and total durations in milliseconds
+        """
+
+        total = time.perf_counter() - self.start
+        metrics = [f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"']
+        if self.endpoint_end is not None:
+            metrics.append(f"app;dur={max(self.endpoint - self.db, 0) * 1000:.2f}")
+        if self.endpoint_end is not None and self.handler_end is not None:
+            metrics.append(f"serialize;dur={(self.handler_end - self.endpoint_end) * 1000:.2f}")
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+# Timings of the request being served, threadpool workers and greenlets inherit it
+current_request = ContextVar("current_request", default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # A connection runs one statement at a time
+    conn.info["query_start"] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Charge the statement to the request being served, statements outside of requests are ignored
+    timings = current_request.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.db += time.perf_counter() - conn.info.pop("query_start")
+
+
+def instrument_engine(engine):
+    """
+    Count and time the statements an engine sends for the request being served
+
+    :param engine: Sync engine, the sync_engine of an async engine
+    """
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def time_endpoint(function):
+    """
+    Record the time spent in an endpoint function on the request timings
+
+    :param function: Endpoint function, sync or async
+
+    :returns wrapper: Endpoint of the same kind with the same signature
+    """
+
+    def record(start: float):
+        timings = current_request.get()
+        if timings is not None:
+            timings.endpoint_end = time.perf_counter()
+            timings.endpoint += timings.endpoint_end - start
+
+    # Keep the endpoint kind, fastapi runs sync endpoints on the threadpool
+    if asyncio.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                record(start)
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(start)
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    Route recording its path, the endpoint time and the end of the response serialization
+    """
+
+    def get_route_handler(self):
+        # The handler validates the response of the endpoint after it returns
+        self.dependant.call = time_endpoint(self.endpoint)
+        handler = super().get_route_handler()
+        path = self.path
+
+        async def timed_handler(request):
+            timings = current_request.get()
+            if timings is not None:
+                timings.route = path
+            response = await handler(request)
+            if timings is not None:
+                timings.handler_end = time.perf_counter()
+            return response
+
+        return timed_handler
+
+
+class RouteMetrics:
+    """
+    Latency and queries per request histograms of every route
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, method: str, route: str, seconds: float, queries: int):
+        """
+        Record a served request
+
+        :param method: Http method of the request
+        :param route: Path template of the matched route
+        :param seconds: Duration of the request
+        :param queries: Number of statements sent for the request
+        """
+
+        key = (method, route)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = (Histogram(), Histogram(QUERY_BUCKETS))
+            latency, queries_histogram = self.histograms[key]
+        latency.observe(seconds)
+        queries_histogram.observe(queries)
+
+    def snapshot(self):
+        """
+        Read the histograms of every route
+
+        :returns result: Dictionary of (method, route) to the latency and queries snapshots
+        """
+
+        with self.lock:
+            histograms = dict(self.histograms)
+        return {key: (latency.snapshot(), queries.snapshot()) for key, (latency, queries) in sorted(histograms.items())}
+
+
+# Histograms of the routes served by the app
+routes = RouteMetrics()
+
+
+class MetricsMiddleware:
+    """
+    Asgi middleware timing every request, adding the Server-Timing header and
+    recording the route histograms
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = current_request.set(timings)
+
+        async def send_with_timings(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            current_request.reset(token)
+            # Unmatched paths are not recorded so that scanners can not grow the label set
+            if timings.route is not None:
+                routes.observe(scope["method"], timings.route, time.perf_counter() - timings.start, timings.queries)
+
+
+def format_labels(labels: dict):
+    # Render prometheus labels, escaping the values
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+    return "{" + pairs + "}" if pairs else ""
+
+
+def format_histogram(lines: list, name: str, labels: dict, snapshot: dict):
+    # Render a histogram snapshot as prometheus bucket, sum and count samples
+    for bound, count in snapshot["buckets"].items():
+        lines.append(f"{name}_bucket{format_labels({**labels, 'le': bound})} {count}")
+    lines.append(f"{name}_sum{format_labels(labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{format_labels(labels)} {snapshot['count']}")
+
+
+def render_prometheus(pool):
+    """
+    Render the route and pool metrics in the prometheus text format
+
+    :param pool: Connection pool of the engine serving the requests
+
+    :returns result: Text of the metrics
+    """
+
+    snapshots = routes.snapshot()
+    lines = [
+        "# HELP http_request_duration_seconds Duration of the requests by route",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), (latency, queries) in snapshots.items():
+        format_histogram(lines, "http_request_duration_seconds", {"method": method, "route": route}, latency)
+    lines += [
+        "# HELP http_request_queries Number of sql statements sent per request by route",
+        "# TYPE http_request_queries histogram",
+    ]
+    for (method, route), (latency, queries) in snapshots.items():
+        format_histogram(lines, "http_request_queries", {"method": method, "route": route}, queries)
+
+    # Only the instrumented queue pools time their checkouts
+    if isinstance(pool, InstrumentedPool):
+        lines += [
+            "# HELP db_pool_checked_out Connections currently lent to requests",
+            "# TYPE db_pool_checked_out gauge",
+            f"db_pool_checked_out {pool.checkedout()}",
+            "# HELP db_pool_timeouts_total Checkouts which gave up after the pool timeout",
+            "# TYPE db_pool_timeouts_total counter",
+            f"db_pool_timeouts_total {pool.timeouts}",
+            "# HELP db_pool_checkout_wait_seconds Time spent waiting for a connection",
+            "# TYPE db_pool_checkout_wait_seconds histogram",
+        ]
+        format_histogram(lines, "db_pool_checkout_wait_seconds", {}, pool.checkout_wait.snapshot())
+    return "\n".join(lines) + "\n"
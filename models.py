@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Integer, String, Column, ForeignKey, text
+from sqlalchemy import Boolean, DateTime, Integer, String, Column, ForeignKey, Index, func, text
 from sqlalchemy.orm import relationship
 
 try:
@@ -14,6 +14,15 @@ class Candidate(Base):
     name = Column(String(50), nullable=False)
     email = Column(String(50), unique=True, nullable=False)
     status = Column(String(50), nullable=False,)
+    # Incremented by every update, served as the ETag of the record
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+
+    # Indexes for the filters of the candidates list, the id is implicitly part of each index
+    __table_args__ = (
+        Index("ix_candidates_name_status", "name", "status"),
+        Index("ix_candidates_status", "status"),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
 class Employee(Base):
     __tablename__ = "employees"
@@ -22,6 +31,15 @@ class Employee(Base):
     name = Column(String(50), nullable=False)
     email = Column(String(50), unique=True, nullable=False)
     designation = Column(String(50), nullable=False)
+    # Incremented by every update, served as the ETag of the record
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+
+    # Indexes for the filters of the employees list, the id is implicitly part of each index
+    __table_args__ = (
+        Index("ix_employees_name_designation", "name", "designation"),
+        Index("ix_employees_designation", "designation"),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
 class Interview(Base):
     __tablename__="interviews"
@@ -30,7 +48,56 @@ class Interview(Base):
     round = Column(Integer, nullable=False)
     candidate_id = Column(Integer, ForeignKey("candidates.id"), nullable=False)
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
+    # Incremented by every update, served as the ETag of the record
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
 
     candidates = relationship("Candidate")
     employees = relationship("Employee")
 
+    # Indexes for the filters of the interviews list, a candidate has one interview per employee
+    __table_args__ = (
+        Index("uq_interviews_candidate_employee", "candidate_id", "employee_id", unique=True),
+        Index("ix_interviews_candidate_round", "candidate_id", "round"),
+        Index("ix_interviews_employee_round", "employee_id", "round"),
+        Index("ix_interviews_round", "round"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+
+# Trigrams of the names, the search index of the candidates and employees tables
+class CandidateTrigram(Base):
+    __tablename__ = "candidate_trigrams"
+
+    # The primary key leads with the trigram, so the lookup of a trigram reads one index range
+    trigram = Column(String(3), primary_key=True)
+    record_id = Column(Integer, ForeignKey("candidates.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_candidate_trigrams_record_id", "record_id"),
+    )
+
+class EmployeeTrigram(Base):
+    __tablename__ = "employee_trigrams"
+
+    # The primary key leads with the trigram, so the lookup of a trigram reads one index range
+    trigram = Column(String(3), primary_key=True)
+    record_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_employee_trigrams_record_id", "record_id"),
+    )
+
+# Every insert, update and delete of the records, in the order of the ids
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(20), nullable=False)
+    record_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False)
+    # Worker which wrote the change, it does not need to evict its own caches again
+    worker = Column(String(32), nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    # Ids of deleted rows are never handed out again on sqlite either
+    __table_args__ = {"sqlite_autoincrement": True}
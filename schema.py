@@ -0,0 +1,225 @@
+import argparse
+import hashlib
+import os
+
+from sqlalchemy import Column, MetaData, String, Table, exc, func, inspect, select, text
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+try:
+    from . import changelog, models, search
+    from .database import engine
+except:
+    import changelog, models, search
+    from database import engine
+
+# Check the schema when the app starts, disable when the deployment runs "python schema.py" instead
+SCHEMA_SYNC_ON_STARTUP = os.getenv("SCHEMA_SYNC_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Indexes the models no longer declare, dropped from existing tables once their replacement exists
+RETIRED_INDEXES = {
+    "interviews": ("ix_interviews_candidate_employee",),
+}
+
+# Fingerprint of the models the database schema was last synced with, kept apart from the models
+schema_fingerprint = Table(
+    "schema_fingerprint",
+    MetaData(),
+    Column("fingerprint", String(64), primary_key=True),
+)
+
+
+def ensure_columns(bind):
+    """
+    Add the columns declared on the models which are missing from existing tables,
+    the new columns need a server default to fill the existing rows
+
+    :param bind: Engine of the database
+
+    :returns added: Names of the added columns as table.column
+    """
+
+    inspector = inspect(bind)
+    added = []
+    for table in models.Base.metadata.sorted_tables:
+        # Tables missing entirely are left to create_all
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                with bind.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {bind.dialect.identifier_preparer.format_table(table)} ADD COLUMN {ddl}"))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def find_duplicates(bind, index):
+    """
+    Find the rows sharing the values of the columns of a unique index
+
+    :param bind: Engine of the database
+    :param index: Unique index declared on a model
+
+    :returns result: List of tuples of the shared values and the ids of the rows sharing them, lowest first
+    """
+
+    table = index.table
+    columns = list(index.columns)
+    with bind.connect() as conn:
+        groups = conn.execute(select(*columns).group_by(*columns).having(func.count() > 1).order_by(*columns)).all()
+        duplicates = []
+        for values in groups:
+            ids = conn.execute(select(table.c.id).where(*(column == value for column, value in zip(columns, values))).order_by(table.c.id)).scalars().all()
+            duplicates.append((tuple(values), ids))
+    return duplicates
+
+
+def remove_duplicates(bind, index, duplicates: list):
+    """
+    Delete the rows sharing the values of a unique index but the first of each, and log the deletes
+
+    :param bind: Engine of the database
+    :param index: Unique index declared on a model
+    :param duplicates: Result of find_duplicates
+    """
+
+    table = index.table
+    ids = [row_id for _, ids in duplicates for row_id in ids[1:]]
+    model = next((model for model in changelog.ENTITIES if model.__table__ is table), None)
+    with bind.begin() as conn:
+        conn.execute(table.delete().where(table.c.id.in_(ids)))
+        if model is not None:
+            changelog.record(conn, model, "delete", ids)
+
+
+def ensure_indexes(bind, dedupe: bool = False):
+    """
+    Create the indexes declared on the models which are missing from existing tables,
+    create_all only adds indexes when it creates the table itself
+
+    :param bind: Engine or connection of the database
+    :param dedupe: Keep only the first of the rows a new unique index would reject, instead of failing
+
+    :returns created: Names of the created indexes
+    """
+
+    inspector = inspect(bind)
+    created = []
+    for table in models.Base.metadata.sorted_tables:
+        # Tables missing entirely are left to create_all
+        if not inspector.has_table(table.name):
+            continue
+
+        # Compare the declared indexes with the ones of the database by name
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                # Rows written before a unique index existed may break it
+                duplicates = find_duplicates(bind, index) if index.unique else []
+                if duplicates and not dedupe:
+                    listed = "; ".join(f"{values} ids {ids}" for values, ids in duplicates)
+                    raise RuntimeError(
+                        f"Cannot create {index.name}, rows of {table.name} share its columns "
+                        f"({', '.join(column.name for column in index.columns)}): {listed}. "
+                        "Remove them or run python schema.py --dedupe to keep the first row of each"
+                    )
+                if duplicates:
+                    remove_duplicates(bind, index, duplicates)
+                index.create(bind)
+                created.append(index.name)
+
+        # Drop the replaced indexes after the new ones were created, from the reflected table
+        retired = [name for name in RETIRED_INDEXES.get(table.name, ()) if name in existing]
+        if retired:
+            reflected = Table(table.name, MetaData(), autoload_with=bind)
+            for index in reflected.indexes:
+                if index.name in retired:
+                    index.drop(bind)
+    return created
+
+
+def create_schema(bind, dedupe: bool = False):
+    """
+    Create the missing tables, columns and indexes of the models
+
+    :param bind: Engine of the database
+    :param dedupe: Keep only the first of the rows a new unique index would reject, instead of failing
+
+    :returns created: Names of the columns and indexes added to existing tables
+    """
+
+    # Search indexes created next to existing tables are filled from their rows afterwards
+    inspector = inspect(bind)
+    backfill = [model for model, index in search.INDEXES.items() if inspector.has_table(model.__tablename__) and not inspector.has_table(index.__tablename__)]
+
+    # Create the tables with their indexes, then the columns and indexes added to existing tables
+    models.Base.metadata.create_all(bind=bind)
+    created = ensure_columns(bind) + ensure_indexes(bind, dedupe)
+    for model in backfill:
+        search.reindex(bind, model)
+    return created
+
+
+def fingerprint(bind):
+    """
+    Hash the ddl of the models as the dialect of the database would run it
+
+    :param bind: Engine or connection of the database
+
+    :returns result: Hex digest of the tables and indexes ddl
+    """
+
+    ddl = []
+    for table in models.Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=bind.dialect)))
+        ddl.extend(str(CreateIndex(index).compile(dialect=bind.dialect)) for index in sorted(table.indexes, key=lambda index: index.name))
+    return hashlib.sha256("\n".join(ddl).encode()).hexdigest()
+
+
+def sync_schema(bind, force: bool = False, dedupe: bool = False):
+    """
+    Create the missing tables and indexes unless the database was already synced
+    with the same models, which costs a single select instead of the reflection
+
+    :param bind: Engine of the database
+    :param force: Run the ddl even when the fingerprint matches
+    :param dedupe: Keep only the first of the rows a new unique index would reject, instead of failing
+
+    :returns created: Names of the columns and indexes added to existing tables, None when the ddl was skipped
+    """
+
+    expected = fingerprint(bind)
+
+    # A missing fingerprint table means the schema was never synced
+    if not force:
+        with bind.connect() as conn:
+            try:
+                stored = conn.execute(select(schema_fingerprint.c.fingerprint)).scalar()
+            except exc.DBAPIError:
+                stored = None
+        if stored == expected:
+            return None
+
+    created = create_schema(bind, dedupe)
+
+    # Store the fingerprint once the ddl succeeded
+    with bind.begin() as conn:
+        schema_fingerprint.create(conn, checkfirst=True)
+        conn.execute(schema_fingerprint.delete())
+        conn.execute(schema_fingerprint.insert().values(fingerprint=expected))
+    return created
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the missing tables and indexes of the database")
+    parser.add_argument("--force", action="store_true", help="run the ddl even when the schema fingerprint is unchanged")
+    parser.add_argument("--dedupe", action="store_true", help="delete the rows a new unique index would reject but the first of each")
+    args = parser.parse_args()
+
+    created = sync_schema(engine, force=args.force, dedupe=args.dedupe)
+    if created is None:
+        print("Schema is up to date")
+    for name in created or []:
+        print(f"Created {name}")
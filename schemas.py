@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
 
 # Define pydantic models for data validation
 class CandidateBase(BaseModel):
@@ -10,8 +13,16 @@ class CandidateBase(BaseModel):
         orm_mode = True
 
 
+class CandidatePatch(BaseModel):
+    name: Optional[str] = None
+    email: Optional[str] = None
+    status: Optional[str] = None
+
+
 class Candidate(CandidateBase):
     id: int
+    # Served in the ETag header only, new records start at version 1
+    version: int = Field(1, exclude=True)
 
     class Config:
         orm_mode = True
@@ -26,8 +37,16 @@ class EmployeeBase(BaseModel):
         orm_mode = True
 
 
+class EmployeePatch(BaseModel):
+    name: Optional[str] = None
+    email: Optional[str] = None
+    designation: Optional[str] = None
+
+
 class Employee(EmployeeBase):
     id: int
+    # Served in the ETag header only, new records start at version 1
+    version: int = Field(1, exclude=True)
 
     class Config:
         orm_mode = True
@@ -42,8 +61,87 @@ class InterviewBase(BaseModel):
         orm_mode = True
 
 
+class InterviewPatch(BaseModel):
+    round: Optional[int] = None
+    candidate_id: Optional[int] = None
+    employee_id: Optional[int] = None
+
+
 class Interview(InterviewBase):
     id: int
+    # Served in the ETag header only, new records start at version 1
+    version: int = Field(1, exclude=True)
+
+    class Config:
+        orm_mode = True
+
+
+class InterviewExpanded(Interview):
+    candidate: Optional[Candidate] = None
+    employee: Optional[Employee] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class BulkError(BaseModel):
+    index: int
+    detail: str
+
+
+class CandidateBulkResult(BaseModel):
+    created: list[Candidate]
+    errors: list[BulkError]
+
+
+class EmployeeBulkResult(BaseModel):
+    created: list[Employee]
+    errors: list[BulkError]
+
+
+class InterviewBulkResult(BaseModel):
+    created: list[Interview]
+    errors: list[BulkError]
+
+
+class InterviewSchedule(BaseModel):
+    round: int
+    employee_id: int
+    candidate_ids: list[int]
+
+
+class InterviewAutoAssign(BaseModel):
+    round: int
+    candidate_ids: list[int]
+    designation: Optional[str] = None
+
+
+class EmployeeWorkload(BaseModel):
+    employee_id: int
+    total: int
+    rounds: dict[int, int]
+
+
+class BulkDelete(BaseModel):
+    ids: list[int] = []
+    emails: list[str] = []
+
+
+class BulkDeleteResult(BaseModel):
+    deleted: list[int]
+    blocked: list[int]
+    missing_ids: list[int]
+    missing_emails: list[str]
+
+
+class Change(BaseModel):
+    seq: int
+    entity: str
+    id: int
+    operation: str
+    changed_at: datetime
+
+
+class ChangeFeed(BaseModel):
+    changes: list[Change]
+    # Sequence number to pass as since on the next request
+    next: int
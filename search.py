@@ -0,0 +1,181 @@
+import os
+import re
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, select, union
+
+try:
+    from . import cache, models
+except:
+    import cache, models
+
+# Load key-value pairs from .env file
+load_dotenv()
+
+# Trigram table indexing the names of every searchable model
+INDEXES = {
+    models.Candidate: models.CandidateTrigram,
+    models.Employee: models.EmployeeTrigram,
+}
+
+# Number of records whose trigrams are written at a time when the index is rebuilt
+REINDEX_BATCH_SIZE = 1000
+
+# Most records a search ranks, taken from the postings of its rarest trigrams, the search is exact
+# while those postings fit and keeps the first records of the rarest ones otherwise
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "2000"))
+
+# Seconds the number of records of a trigram is kept, it only orders the trigrams by rarity
+SEARCH_FREQUENCY_TTL = float(os.getenv("SEARCH_FREQUENCY_TTL", "3600"))
+
+# Number of records of every searched trigram, by trigram table and trigram
+frequencies = cache.LRUCache(ttl=SEARCH_FREQUENCY_TTL)
+
+
+def trigrams(text: str, prefix: bool = False):
+    """
+    Split a text in the lowercase trigrams of its words, each word padded with two spaces
+    in front and one behind so that the start and the end of a word are trigrams of their own
+
+    :param text: Text to be split
+    :param prefix: Leave the last word open at its end, for text typed so far
+
+    :returns result: Set of trigrams
+    """
+
+    grams = set()
+    words = re.findall(r"\w+", text.lower())
+    for position, word in enumerate(words):
+        padded = "  " + word + ("" if prefix and position == len(words) - 1 else " ")
+        grams.update(padded[start:start + 3] for start in range(len(padded) - 2))
+    return grams
+
+
+def index_records(db, model, records: list, replace: bool = False):
+    """
+    Write the trigrams of the names of the records, inside the transaction of the caller
+
+    :param db: Existing database session or connection
+    :param model: Model of the records
+    :param records: Tuples of id and name of the records
+    :param replace: Remove the trigrams the records were indexed with before
+    """
+
+    index = INDEXES.get(model)
+    if index is None or not records:
+        return
+    if replace:
+        unindex_records(db, model, [record_id for record_id, _ in records])
+
+    # Insert all the trigrams of the records with one executemany
+    rows = [{"trigram": gram, "record_id": record_id} for record_id, name in records for gram in sorted(trigrams(name))]
+    if rows:
+        db.execute(insert(index.__table__), rows)
+
+
+def unindex_records(db, model, ids: list):
+    """
+    Remove the trigrams of the records, inside the transaction of the caller
+
+    :param db: Existing database session or connection
+    :param model: Model of the records
+    :param ids: Ids of the records
+    """
+
+    index = INDEXES.get(model)
+    if index is None or not ids:
+        return
+    db.execute(delete(index.__table__).where(index.record_id.in_(ids)))
+
+
+def reindex(bind, model):
+    """
+    Rebuild the trigrams of every record of a model, Ex: for the rows which existed before the index
+
+    :param bind: Engine of the database
+    :param model: Model of the records
+    """
+
+    index = INDEXES[model]
+    with bind.begin() as conn:
+        conn.execute(delete(index.__table__))
+        result = conn.execute(select(model.id, model.name).execution_options(yield_per=REINDEX_BATCH_SIZE))
+        for records in result.partitions():
+            index_records(conn, model, records)
+
+
+def trigram_frequencies(db, model, grams: set):
+    """
+    Fetch the number of records of every trigram, counted once per SEARCH_FREQUENCY_TTL
+
+    :param db: Existing database session
+    :param model: Model of the records
+    :param grams: Trigrams of the search text
+
+    :returns result: Dictionary of trigram to number of records
+    """
+
+    index = INDEXES[model]
+    counts = {gram: frequencies.get((index.__tablename__, gram)) for gram in grams}
+    missing = sorted(gram for gram, count in counts.items() if count is None)
+    if missing:
+        found = dict(db.execute(select(index.trigram, func.count()).where(index.trigram.in_(missing)).group_by(index.trigram)).all())
+        for gram in missing:
+            counts[gram] = found.get(gram, 0)
+            frequencies.set((index.__tablename__, gram), counts[gram])
+    return counts
+
+
+def search_query(db, model, columns: list, q: str, limit: int):
+    """
+    Build the query of the records whose names share at least half of the trigrams of the
+    search text, ranked by the number of shared trigrams then by the shortest name
+
+    A record sharing half of the trigrams shares one of the rarest ones past the other half, so only
+    the records of those trigrams are ranked, at most SEARCH_MAX_CANDIDATES of them, instead of the
+    postings of the common trigrams which grow with the table
+
+    :param db: Existing database session
+    :param model: Model of the records
+    :param columns: Columns of the model to be selected
+    :param q: Search text, its last word may be incomplete
+    :param limit: Number of records to return
+
+    :returns result: Select statement, None when the text has no word to search for
+    """
+
+    grams = trigrams(q, prefix=True)
+    if not grams:
+        return None
+
+    # Take the records of the rarest trigrams first until the candidates are spent, the limit of every
+    # trigram bounds the read even when its cached frequency is behind
+    index = INDEXES[model]
+    counts = trigram_frequencies(db, model, grams)
+    rarest = sorted(grams, key=lambda gram: (counts[gram], gram))[:len(grams) - (len(grams) + 1) // 2 + 1]
+    postings = []
+    remaining = SEARCH_MAX_CANDIDATES
+    for gram in rarest:
+        if remaining <= 0:
+            break
+        postings.append(select(index.record_id).where(index.trigram == gram).limit(remaining))
+        remaining -= counts[gram]
+    candidates = union(*(posting.subquery().select() for posting in postings))
+
+    # Count the matching trigrams of the candidates only, from the primary key of the trigram index
+    hits = func.count().label("hits")
+    matches = (
+        select(index.record_id, hits)
+        .where(index.trigram.in_(sorted(grams)), index.record_id.in_(candidates))
+        .group_by(index.record_id)
+        .having(func.count() * 2 >= len(grams))
+        .subquery()
+    )
+
+    # Fetch only the best records
+    return (
+        select(*columns)
+        .join(matches, matches.c.record_id == model.id)
+        .order_by(matches.c.hits.desc(), func.length(model.name), model.id)
+        .limit(limit)
+    )
@@ -0,0 +1,114 @@
+import asyncio
+import functools
+import json
+import os
+
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Load key-value pairs from .env file
+load_dotenv()
+
+# Serve the routes decorated with fast_json without the response model pass when enabled
+FAST_JSON = os.getenv("FAST_JSON", "true").lower() in ("1", "true", "yes")
+
+
+def dumps(content):
+    """
+    Encode the content as compact json, the same bytes JSONResponse would render
+
+    :param content: Json compatible content
+
+    :returns result: Encoded bytes
+    """
+
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Json response encoded with orjson when it is installed
+    """
+
+    def render(self, content):
+        return dumps(content)
+
+
+@functools.lru_cache(maxsize=None)
+def schema_fields(schema):
+    # Names of the serialized fields along with the schema of the nested ones, in declaration order
+    fields = []
+    for name, field in schema.__fields__.items():
+        if field.field_info.exclude:
+            continue
+        nested = field.type_ if isinstance(field.type_, type) and issubclass(field.type_, BaseModel) else None
+        fields.append((name, nested))
+    return tuple(fields)
+
+
+def dump(schema, record, exclude_none: bool = False):
+    """
+    Read the fields of a schema from a trusted record without validating them again
+
+    :param schema: Schema the record was validated against, or whose columns it was loaded from
+    :param record: Orm object, schema instance or dictionary
+    :param exclude_none: Leave out the fields whose value is None
+
+    :returns result: Dictionary in the same shape as the response model would produce
+    """
+
+    content = {}
+    for name, nested in schema_fields(schema):
+        # Missing attributes read as None, the same as from_orm with the optional fields
+        value = record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+        if value is None:
+            if not exclude_none:
+                content[name] = None
+            continue
+        content[name] = dump(nested, value, exclude_none) if nested is not None else value
+    return content
+
+
+def fast_json(schema, exclude_none: bool = False):
+    """
+    Serve a route returning a list of trusted records straight as json, skipping the
+    response model validation and the jsonable encoder, the response model stays for the docs
+
+    :param schema: Schema of the records of the list
+    :param exclude_none: Same as response_model_exclude_none of the route
+
+    :returns decorator: Decorator of an endpoint taking the response as the response keyword argument
+    """
+
+    def decorator(function):
+        if not FAST_JSON:
+            return function
+
+        def render(records, response):
+            # Keep the headers the endpoint set on the response, Ex: X-Next-Cursor, the repeated ones
+            # such as Set-Cookie included
+            content = [dump(schema, record, exclude_none) for record in records]
+            rendered = FastJSONResponse(content)
+            rendered.raw_headers.extend(header for header in response.raw_headers if header[0] not in (b"content-length", b"content-type"))
+            return rendered
+
+        # Keep the endpoint kind, fastapi runs sync endpoints on the threadpool
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                return render(await function(*args, **kwargs), kwargs["response"])
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                return render(function(*args, **kwargs), kwargs["response"])
+        return wrapper
+
+    return decorator
@@ -1,10 +1,25 @@
 from fastapi.testclient import TestClient
 
+import datetime
+import json
 import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
 from .main import app
-from . import models
+from . import assignment, bench, changelog, crud, database, main, metrics, models, schema, schemas, search, serialization
+
+from contextlib import contextmanager
 
-from sqlalchemy import create_engine, text
+from fastapi.encoders import jsonable_encoder
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, event, func, inspect, text
+from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
 # Load key-value pairs from .env file
@@ -30,6 +45,30 @@ with engine.connect() as conn:
 
 client = TestClient(app)
 
+# The statement counts of the tests leave out the change log polls, the change log tests poll explicitly
+changelog.tailer.interval = 1e9
+
+
+@contextmanager
+def count_statements():
+    # Collect the statements the app sends to the database
+    app_engine = database.async_engine.sync_engine if database.async_engine else database.engine
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(app_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(app_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def lifespan():
+    # Run the startup and shutdown handlers of the app around the tests
+    with client:
+        yield
+
 def test_read_candidate():
     res = client.get("/candidate/1")
     assert res.status_code == 200
@@ -900,4 +939,1096 @@ def test_update_interview_with_non_existent_employee():
   "employee_id": 200
     })
     assert res.status_code == 400
-    assert res.json() == {"detail":"Employee as Interviewer is not available"}
\ No newline at end of file
+    assert res.json() == {"detail":"Employee as Interviewer is not available"}
+
+# =====================================================
+# PAGINATION TESTS
+# =====================================================
+
+
+def test_read_employees_cursor_pages():
+    res = client.get("/employees/?limit=2")
+    assert res.status_code == 200
+    assert [employee["id"] for employee in res.json()] == [1, 2]
+    cursor = res.headers["X-Next-Cursor"]
+
+    res = client.get(f"/employees/?limit=2&cursor={cursor}")
+    assert res.status_code == 200
+    assert [employee["id"] for employee in res.json()] == [3]
+    assert "X-Next-Cursor" not in res.headers
+
+def test_read_interviews_cursor_with_filter():
+    res = client.get("/interviews/?round=3&limit=1")
+    assert res.status_code == 200
+    assert [interview["id"] for interview in res.json()] == [3]
+
+    res = client.get(f"/interviews/?round=3&limit=1&cursor={res.headers['X-Next-Cursor']}")
+    assert res.status_code == 200
+    assert [interview["id"] for interview in res.json()] == [4]
+
+def test_read_candidates_invalid_cursor():
+    res = client.get("/candidates/?cursor=not-a-cursor")
+    assert res.status_code == 400
+    assert res.json() == {"detail":"Invalid cursor"}
+
+def test_read_candidates_non_positive_limit():
+    for limit in (0, -1):
+        res = client.get(f"/candidates/?limit={limit}")
+        assert res.status_code == 400
+        assert res.json() == {"detail":"Please enter a positive limit"}
+
+def test_read_candidates_forged_cursor():
+    res = client.get("/candidates/?cursor=eyJpZCI6dHJ1ZX0")
+    assert res.status_code == 400
+    assert res.json() == {"detail":"Invalid cursor"}
+
+
+# =====================================================
+# BULK TESTS
+# =====================================================
+
+
+def test_create_candidates_bulk():
+    res = client.post("/candidates/bulk", json=[
+        {"name": "riya", "email": "riya@gmail.com", "status": "pre-hire"},
+        {"name": "jayam", "email": "vardhman@gmail.com", "status": "active"},
+        {"name": "", "email": "nobody@gmail.com", "status": "active"},
+        {"name": "karan", "email": "karan@gmail.com", "status": "active"},
+        {"name": "riya", "email": "riya@gmail.com", "status": "active"},
+    ])
+    assert res.status_code == 201
+    assert [(candidate["name"], candidate["email"]) for candidate in res.json()["created"]] == [
+        ("riya", "riya@gmail.com"),
+        ("karan", "karan@gmail.com"),
+    ]
+    assert res.json()["errors"] == [
+        {"index": 1, "detail": "Email already registered"},
+        {"index": 2, "detail": "Please enter the candidate name"},
+        {"index": 4, "detail": "Email already registered"},
+    ]
+
+def test_create_employees_bulk():
+    res = client.post("/employees/bulk", json=[
+        {"name": "neha", "email": "neha@gmail.com", "designation": "Developer"},
+        {"name": "jatin", "email": "jatin@gmail.com", "designation": "CEO"},
+    ])
+    assert res.status_code == 201
+    assert [employee["email"] for employee in res.json()["created"]] == ["neha@gmail.com"]
+    assert res.json()["errors"] == [{"index": 1, "detail": "Employee with the provided email already exists"}]
+
+def test_create_interviews_bulk():
+    candidate_id = client.get("/candidates/?email=riya@gmail.com").json()[0]["id"]
+    res = client.post("/interviews/bulk", json=[
+        {"round": 1, "candidate_id": candidate_id, "employee_id": 1},
+        {"round": 1, "candidate_id": 1, "employee_id": 1},
+        {"round": 1, "candidate_id": 200, "employee_id": 1},
+        {"round": 1, "candidate_id": candidate_id, "employee_id": 200},
+        {"round": 0, "candidate_id": candidate_id, "employee_id": 2},
+    ])
+    assert res.status_code == 201
+    assert [(interview["candidate_id"], interview["employee_id"]) for interview in res.json()["created"]] == [(candidate_id, 1)]
+    assert res.json()["errors"] == [
+        {"index": 1, "detail": "Interview already scheduled"},
+        {"index": 2, "detail": "Candidate to be interviewed is not registered"},
+        {"index": 3, "detail": "Employee as Interviewer is not available"},
+        {"index": 4, "detail": "Please enter non-zero round"},
+    ]
+
+def test_create_candidates_bulk_reports_constraint_conflicts():
+    with Session(engine) as db:
+        created, rejected = crud.create_candidates(db, [
+            schemas.CandidateBase(name="tara", email="tara@gmail.com", status="active"),
+            schemas.CandidateBase(name="riya", email="riya@gmail.com", status="active"),
+            schemas.CandidateBase(name="om", email="om@gmail.com", status="active"),
+        ])
+    assert [candidate.email for candidate in created] == ["tara@gmail.com", "om@gmail.com"]
+    assert rejected == [1]
+
+
+def test_delete_candidates_bulk():
+    created = client.post("/candidates/bulk", json=[{"name": f"purge {i}", "email": f"purge{i}@gmail.com", "status": "inactive"} for i in range(3)]).json()["created"]
+    ids = [candidate["id"] for candidate in created]
+    with count_statements() as statements:
+        res = client.request("DELETE", "/candidates/", json={"ids": [ids[0], 1, 100000], "emails": ["purge1@gmail.com", "purge2@gmail.com", "nobody@gmail.com"]})
+    assert res.status_code == 200
+    assert res.json() == {"deleted": ids, "blocked": [1], "missing_ids": [100000], "missing_emails": ["nobody@gmail.com"]}
+    assert sum(statement.lstrip().upper().startswith("DELETE FROM CANDIDATES ") for statement in statements) == 1
+    assert sum(statement.lstrip().upper().startswith("DELETE FROM CANDIDATE_TRIGRAMS ") for statement in statements) == 1
+    assert client.get(f"/candidate/{ids[0]}").status_code == 404
+    assert client.get("/candidate/1").status_code == 200
+
+def test_delete_employees_bulk():
+    created = client.post("/employees/bulk", json=[{"name": "purge", "email": "purge@gmail.com", "designation": "Intern"}]).json()["created"]
+    res = client.request("DELETE", "/employees/", json={"ids": [1], "emails": ["purge@gmail.com"]})
+    assert res.status_code == 200
+    assert res.json() == {"deleted": [created[0]["id"]], "blocked": [1], "missing_ids": [], "missing_emails": []}
+
+def test_delete_candidates_bulk_empty():
+    res = client.request("DELETE", "/candidates/", json={})
+    assert res.status_code == 400
+    assert res.json() == {"detail":"Please enter the ids or emails of the candidates to be deleted"}
+
+
+def test_read_candidates_total_count():
+    client.post("/candidates/bulk", json=[{"name": f"tally {i}", "email": f"tally{i}@gmail.com", "status": "active"} for i in range(2)])
+    with count_statements() as statements:
+        res = client.get("/candidates/", params={"status": "active", "limit": 1, "count": "exact"})
+    assert res.status_code == 200
+    total = int(res.headers["X-Total-Count"])
+    assert total == len(client.get("/candidates/", params={"status": "active", "limit": 1000}).json())
+    assert "X-Total-Count-Approximate" not in res.headers
+    assert sum("count(" in statement.lower() for statement in statements) == 1
+
+    # The next page reuses the cached count, a write invalidates it
+    with count_statements() as statements:
+        res = client.get("/candidates/", params={"status": "active", "limit": 1, "cursor": res.headers["X-Next-Cursor"], "count": "exact"})
+    assert int(res.headers["X-Total-Count"]) == total
+    assert len(statements) == 1
+    client.post("/candidate/", json={"name": "count", "email": "count@gmail.com", "status": "active"})
+    assert int(client.get("/candidates/", params={"status": "active", "count": "exact"}).headers["X-Total-Count"]) == total + 1
+    assert "X-Total-Count" not in client.get("/candidates/", params={"status": "active"}).headers
+
+def test_read_interviews_total_count():
+    res = client.get("/interviews/", params={"candidate_id": 1, "count": "exact"})
+    assert int(res.headers["X-Total-Count"]) == len(res.json())
+    res = client.get("/employees/", params={"limit": 1, "count": "approximate"})
+    assert res.headers["X-Total-Count-Approximate"] == "true"
+    assert int(res.headers["X-Total-Count"]) >= len(client.get("/employees/", params={"limit": 1000}).json())
+    res = client.get("/employees/", params={"designation": "CEO", "count": "approximate"})
+    assert "X-Total-Count-Approximate" not in res.headers
+
+def test_read_candidates_invalid_count():
+    res = client.get("/candidates/", params={"count": "some"})
+    assert res.status_code == 400
+    assert res.json() == {"detail":"Please enter the count as exact or approximate"}
+
+
+def test_read_employees_workload():
+    crud.cache.workload.clear()
+    with count_statements() as statements:
+        workload = client.get("/employees/workload").json()
+    assert len(statements) == 1
+    assert "GROUP BY" in statements[0].upper()
+    interviews = client.get("/interviews/", params={"limit": 1000}).json()
+    for employee in workload:
+        rounds = {}
+        for interview in interviews:
+            if interview["employee_id"] == employee["employee_id"]:
+                rounds[str(interview["round"])] = rounds.get(str(interview["round"]), 0) + 1
+        assert employee["rounds"] == rounds
+        assert employee["total"] == sum(rounds.values())
+    assert [employee["employee_id"] for employee in workload] == sorted(employee["id"] for employee in client.get("/employees/", params={"limit": 1000}).json())
+
+def test_read_employees_workload_follows_writes():
+    client.get("/employees/workload")
+    employee_id = client.post("/employee/", json={"name": "leela", "email": "leela@gmail.com", "designation": "Developer"}).json()["id"]
+    interview_id = client.post("/interview", json={"round": 7, "candidate_id": 1, "employee_id": employee_id}).json()["id"]
+    with count_statements() as statements:
+        workload = {employee["employee_id"]: employee for employee in client.get("/employees/workload").json()}
+    assert statements == []
+    assert workload[employee_id] == {"employee_id": employee_id, "total": 1, "rounds": {"7": 1}}
+
+    client.delete(f"/interview/{interview_id}")
+    client.delete(f"/employee/{employee_id}")
+    workload = {employee["employee_id"]: employee for employee in client.get("/employees/workload").json()}
+    assert employee_id not in workload
+
+def test_read_employees_workload_follows_interview_updates():
+    employee_id = client.post("/employee/", json={"name": "lalit", "email": "lalit@gmail.com", "designation": "Developer"}).json()["id"]
+    other_id = client.post("/employee/", json={"name": "lavanya", "email": "lavanya@gmail.com", "designation": "Developer"}).json()["id"]
+    candidate_id = client.post("/candidate/", json={"name": "lakshmi", "email": "lakshmi@gmail.com", "status": "active"}).json()["id"]
+    interview_id = client.post("/interview", json={"round": 1, "candidate_id": candidate_id, "employee_id": employee_id}).json()["id"]
+    client.get("/employees/workload")
+    loads = client.get("/internal/cache").json()["workload"]["loads"]
+
+    # A put with unchanged employee and round keeps the counts, a moved interview is counted again
+    assert client.put(f"/interview/{interview_id}", json={"round": 1, "candidate_id": candidate_id, "employee_id": employee_id}).status_code == 200
+    assert client.patch(f"/interview/{interview_id}", json={"round": 2}).status_code == 200
+    assert client.put(f"/interview/{interview_id}", json={"round": 3, "candidate_id": candidate_id, "employee_id": other_id}).status_code == 200
+    workload = {employee["employee_id"]: employee for employee in client.get("/employees/workload").json()}
+    assert workload[employee_id] == {"employee_id": employee_id, "total": 0, "rounds": {}}
+    assert workload[other_id] == {"employee_id": other_id, "total": 1, "rounds": {"3": 1}}
+    assert client.get("/internal/cache").json()["workload"]["loads"] == loads
+
+    client.delete(f"/interview/{interview_id}")
+
+def test_read_employees_workload_shares_cached_rows():
+    client.get("/employees/workload")
+    with Session(database.engine) as db:
+        rows = crud.get_workload(db)
+        assert crud.get_workload(db) is rows
+
+        # A write replaces the row of its employee, the list handed out before stays as it was
+        before = {row["employee_id"]: row["total"] for row in rows}
+        crud.cache.workload.add(rows[0]["employee_id"], 1)
+        try:
+            assert {row["employee_id"]: row["total"] for row in rows} == before
+            assert crud.get_workload(db)[0]["total"] == rows[0]["total"] + 1
+        finally:
+            crud.cache.workload.clear()
+
+
+# =====================================================
+# INTERNAL TESTS
+# =====================================================
+
+
+def test_read_pool_status():
+    before = client.get("/internal/pool").json()["primary"]
+    if "checkout_wait_seconds" not in before:
+        pytest.skip(f"{before['pool']} does not queue checkouts")
+    before = before["checkout_wait_seconds"]["count"]
+    assert client.get("/candidates/?limit=1").status_code == 200
+
+    res = client.get("/internal/pool")
+    assert res.status_code == 200
+    status = res.json()["primary"]
+    assert status["checked_out"] == 0
+    assert status["overflow_in_use"] == 0
+    assert status["max_overflow"] == 10
+    assert status["timeouts"] == 0
+    assert status["checkout_wait_seconds"]["count"] == before + 1
+    assert status["checkout_wait_seconds"]["buckets"]["+Inf"] == status["checkout_wait_seconds"]["count"]
+
+def test_read_candidate_cache():
+    before = client.get("/internal/cache").json()["candidates"]
+    assert client.get("/candidate/1").status_code == 200
+    assert client.get("/candidate/1").status_code == 200
+
+    after = client.get("/internal/cache").json()["candidates"]
+    assert after["hits"] >= before["hits"] + 1
+    assert after["size"] >= 1
+
+def test_update_employee_invalidates_cache():
+    assert client.get("/employee/3").json()["name"] == "mayank"
+    res = client.put("/employee/3", json={
+  "name": "mayank D",
+  "email": "mayank@gmail.com",
+  "designation": "Designer"
+    })
+    assert res.status_code == 200
+    assert client.get("/employee/3").json()["name"] == "mayank D"
+
+def test_read_candidate_not_cached_over_concurrent_write():
+    crud.cache.candidates.invalidate(1)
+    app_engine = database.async_engine.sync_engine if database.async_engine else database.engine
+
+    # A write invalidates the candidate while the read is loading the row it replaced
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "FROM candidates" in statement:
+            crud.cache.candidates.invalidate(1)
+    event.listen(app_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        assert client.get("/candidate/1").status_code == 200
+    finally:
+        event.remove(app_engine, "before_cursor_execute", before_cursor_execute)
+    assert crud.cache.candidates.get(1) is None
+
+    # The next read fills the cache again
+    assert client.get("/candidate/1").status_code == 200
+    assert crud.cache.candidates.get(1) is not None
+
+def test_delete_candidate_by_email_invalidates_cache():
+    candidate_id = client.get("/candidates/?email=om@gmail.com").json()[0]["id"]
+    assert client.get(f"/candidate/{candidate_id}").status_code == 200
+    assert client.delete("/candidate/?email=om@gmail.com").status_code == 200
+    assert client.get(f"/candidate/{candidate_id}").status_code == 404
+
+
+# =====================================================
+# ROUND TRIP TESTS
+# =====================================================
+
+
+def test_create_candidate_single_statement():
+    with count_statements() as statements:
+        res = client.post("/candidate", json={"name": "dev", "email": "dev@gmail.com", "status": "active"})
+    assert res.status_code == 201
+    assert res.json()["email"] == "dev@gmail.com"
+    # One insert of the record, one of the trigrams of its name and one of the change log
+    assert len(statements) == 3
+    assert statements[0].lstrip().upper().startswith("INSERT INTO CANDIDATES")
+    assert statements[1].lstrip().upper().startswith("INSERT INTO CANDIDATE_TRIGRAMS")
+    assert statements[2].lstrip().upper().startswith("INSERT INTO CHANGE_LOG")
+
+def test_create_employee_with_existing_email_single_statement():
+    with count_statements() as statements:
+        res = client.post("/employee", json={"name": "jatin", "email": "jatin@gmail.com", "designation": "CEO"})
+    assert res.status_code == 400
+    assert res.json() == {"detail":"Employee with the provided email already exists"}
+    assert len(statements) == 1
+
+
+def test_update_candidate_single_statement():
+    candidate_id = client.post("/candidate/", json={"name": "ravi", "email": "ravi@gmail.com", "status": "active"}).json()["id"]
+    with count_statements() as statements:
+        res = client.put(f"/candidate/{candidate_id}", json={"name": "ravi K", "email": "ravi@gmail.com", "status": "inactive"})
+    assert res.status_code == 200
+    # One update of the record, then the trigrams of the new name replace the old ones and the change is logged
+    assert len(statements) == 4
+    assert statements[0].lstrip().upper().startswith("UPDATE")
+    assert [statement.lstrip().upper().split()[0] for statement in statements[1:3]] == ["DELETE", "INSERT"]
+    assert statements[3].lstrip().upper().startswith("INSERT INTO CHANGE_LOG")
+    assert client.get(f"/candidate/{candidate_id}").json()["name"] == "ravi K"
+
+def test_patch_candidate():
+    candidate_id = client.post("/candidate/", json={"name": "neha", "email": "neha@gmail.com", "status": "active"}).json()["id"]
+    with count_statements() as statements:
+        res = client.patch(f"/candidate/{candidate_id}", json={"status": "inactive"})
+    assert res.status_code == 200
+    assert res.json() == {"detail":"Candidate Updated Successfully"}
+    # One update of the record and one insert of the change log
+    assert len(statements) == 2
+    assert "name" not in statements[0].split("WHERE")[0]
+    assert client.get(f"/candidate/{candidate_id}").json() == {"id": candidate_id, "name": "neha", "email": "neha@gmail.com", "status": "inactive"}
+
+def test_patch_candidate_errors():
+    assert client.patch("/candidate/100000", json={"status": "active"}).json() == {"detail":"Candidate not found"}
+    client.post("/candidate/", json={"name": "taken", "email": "taken@gmail.com", "status": "active"})
+    assert client.patch("/candidate/1", json={"email": "taken@gmail.com"}).json() == {"detail":"Candidate with the provided email already exists"}
+    assert client.patch("/candidate/1", json={"name": " "}).json() == {"detail":"Please enter the candidate name"}
+    assert client.patch("/candidate/1", json={"status": None}).json() == {"detail":"Please enter the candidate status"}
+    assert client.patch("/candidate/1", json={}).json() == {"detail":"Please enter the candidate fields to be updated"}
+
+def test_patch_employee():
+    employee_id = client.post("/employee/", json={"name": "kiran", "email": "kiran@gmail.com", "designation": "Developer"}).json()["id"]
+    res = client.patch(f"/employee/{employee_id}", json={"designation": "Manager"})
+    assert res.status_code == 200
+    assert client.get(f"/employee/{employee_id}").json()["designation"] == "Manager"
+    assert client.patch(f"/employee/{employee_id}", json={"email": "jatin@gmail.com"}).status_code == 400
+
+def test_patch_interview():
+    with count_statements() as statements:
+        res = client.patch("/interview/2", json={"round": 5})
+    assert res.status_code == 200
+    # The read of the round counted in the workload, the update and the insert of the change log
+    assert len(statements) == 3
+    assert statements[0].lstrip().upper().startswith("SELECT INTERVIEWS.EMPLOYEE_ID, INTERVIEWS.ROUND")
+    assert statements[2].lstrip().upper().startswith("INSERT INTO CHANGE_LOG")
+    assert client.get("/interview/2").json()["round"] == 5
+    assert client.patch("/interview/2", json={"candidate_id": 200}).json() == {"detail":"Candidate to be interviewed is not registered"}
+    assert client.patch("/interview/2", json={"employee_id": 200}).json() == {"detail":"Employee as Interviewer is not available"}
+    assert client.patch("/interview/100000", json={"round": 1}).json() == {"detail":"Interview not found"}
+    assert client.patch("/interview/2", json={"round": 0}).json() == {"detail":"Please enter non-zero round"}
+
+def test_create_interview_single_statement():
+    employee_id = client.post("/employee/", json={"name": "mohan", "email": "mohan@gmail.com", "designation": "Developer"}).json()["id"]
+    candidate_id = client.post("/candidate/", json={"name": "gita", "email": "gita@gmail.com", "status": "active"}).json()["id"]
+    with count_statements() as statements:
+        res = client.post("/interview", json={"round": 1, "candidate_id": candidate_id, "employee_id": employee_id})
+    assert res.status_code == 201
+    assert res.json()["employee_id"] == employee_id
+    assert len(statements) == 2
+    assert statements[0].lstrip().upper().startswith("INSERT INTO INTERVIEWS")
+    assert statements[1].lstrip().upper().startswith("INSERT INTO CHANGE_LOG")
+
+    # A duplicate is refused by the unique constraint, then diagnosed
+    res = client.post("/interview", json={"round": 2, "candidate_id": candidate_id, "employee_id": employee_id})
+    assert res.json() == {"detail":"Interview already scheduled"}
+    assert client.post("/interview", json={"round": 1, "candidate_id": 100000, "employee_id": employee_id}).json() == {"detail":"Candidate to be interviewed is not registered"}
+    assert client.post("/interview", json={"round": 1, "candidate_id": candidate_id, "employee_id": 100000}).json() == {"detail":"Employee as Interviewer is not available"}
+
+def test_update_interview_to_scheduled_pair():
+    interview = client.get("/interview/2").json()
+    pair = next(item for item in client.get("/interviews/").json() if item["id"] != interview["id"])
+    res = client.patch("/interview/2", json={"candidate_id": pair["candidate_id"], "employee_id": pair["employee_id"]})
+    assert res.status_code == 400
+    assert res.json() == {"detail":"Interview already scheduled"}
+    assert client.get("/interview/2").json() == interview
+
+def test_schedule_interviews():
+    employee_id = client.post("/employee/", json={"name": "sunil", "email": "sunil@gmail.com", "designation": "Manager"}).json()["id"]
+    first, second = [client.post("/candidate/", json={"name": name, "email": f"{name}@gmail.com", "status": "active"}).json()["id"] for name in ("hari", "uma")]
+    client.post("/interview", json={"round": 1, "candidate_id": second, "employee_id": employee_id})
+    with count_statements() as statements:
+        res = client.post("/interviews/schedule", json={"round": 2, "employee_id": employee_id, "candidate_ids": [first, second, 100000, first]})
+    assert res.status_code == 201
+    body = res.json()
+    assert [(item["round"], item["candidate_id"], item["employee_id"]) for item in body["created"]] == [(2, first, employee_id)]
+    assert body["errors"] == [
+        {"index": 1, "detail": "Interview already scheduled"},
+        {"index": 2, "detail": "Candidate to be interviewed is not registered"},
+        {"index": 3, "detail": "Interview already scheduled"},
+    ]
+    assert len([statement for statement in statements if statement.lstrip().upper().startswith("INSERT INTO INTERVIEWS")]) == 1
+
+def test_assign_interviewers():
+    # Employee 2 is least loaded but already met candidate 10
+    assert assignment.assign_interviewers({1: 3, 2: 0, 3: 1}, {10: {2}}, [10, 11, 12, 13]) == [3, 2, 2, 2]
+    assert assignment.assign_interviewers({1: 0}, {10: {1}}, [10, 11]) == [None, 1]
+
+def test_auto_assign_interviews():
+    employee_ids = [client.post("/employee/", json={"name": f"auto {i}", "email": f"auto{i}@gmail.com", "designation": "Recruiter"}).json()["id"] for i in range(3)]
+    candidates = client.post("/candidates/bulk", json=[{"name": f"auto {i}", "email": f"auto{i}@gmail.com", "status": "active"} for i in range(7)]).json()["created"]
+    candidate_ids = [candidate["id"] for candidate in candidates]
+    client.post("/interview", json={"round": 1, "candidate_id": candidate_ids[0], "employee_id": employee_ids[0]})
+
+    with count_statements() as statements:
+        res = client.post("/interviews/auto-assign", json={"round": 2, "designation": "Recruiter", "candidate_ids": candidate_ids + [100000, candidate_ids[1]]})
+    assert res.status_code == 201
+    body = res.json()
+    assert body["errors"] == [
+        {"index": 7, "detail": "Candidate to be interviewed is not registered"},
+        {"index": 8, "detail": "Interview already scheduled"},
+    ]
+    assigned = {interview["candidate_id"]: interview["employee_id"] for interview in body["created"]}
+    assert sorted(assigned) == candidate_ids
+    assert assigned[candidate_ids[0]] != employee_ids[0]
+    loads = [list(assigned.values()).count(employee_id) + (employee_id == employee_ids[0]) for employee_id in employee_ids]
+    assert max(loads) - min(loads) <= 1
+    assert len(statements) <= 7
+
+    # Every recruiter already met the first candidate after two more rounds
+    client.post("/interviews/auto-assign", json={"round": 3, "designation": "Recruiter", "candidate_ids": candidate_ids[:1]})
+    res = client.post("/interviews/auto-assign", json={"round": 4, "designation": "Recruiter", "candidate_ids": candidate_ids[:1]})
+    assert res.json()["errors"] == [{"index": 0, "detail": "Employee as Interviewer is not available"}]
+    assert client.post("/interviews/auto-assign", json={"round": 1, "designation": "Astronaut", "candidate_ids": [1]}).json() == {"detail":"Employee as Interviewer is not available"}
+
+def test_schedule_interviews_errors():
+    assert client.post("/interviews/schedule", json={"round": 1, "employee_id": 100000, "candidate_ids": [1]}).json() == {"detail":"Employee as Interviewer is not available"}
+    assert client.post("/interviews/schedule", json={"round": 0, "employee_id": 1, "candidate_ids": [1]}).json() == {"detail":"Please enter non-zero round"}
+    assert client.post("/interviews/schedule", json={"round": 1, "employee_id": 1, "candidate_ids": []}).json() == {"detail":"Please enter the candidate ids"}
+
+
+# =====================================================
+# SEARCH TESTS
+# =====================================================
+
+
+def test_search_trigrams():
+    assert search.trigrams("Aman") == {"  a", " am", "ama", "man", "an "}
+    assert search.trigrams("aman gu", prefix=True) == {"  a", " am", "ama", "man", "an ", "  g", " gu"}
+    assert search.trigrams(" - ") == set()
+
+def test_search_candidates():
+    ids = [client.post("/candidate/", json={"name": name, "email": f"{name.replace(' ', '.')}@search.test", "status": "active"}).json()["id"] for name in ("zubin mistry", "zubin mistry junior", "zoya mirza")]
+    with count_statements() as statements:
+        res = client.get("/candidates/search", params={"q": "zubin mis"})
+    assert res.status_code == 200
+    assert [candidate["id"] for candidate in res.json()] == ids[:2]
+    assert "version" not in res.json()[0]
+    assert len(statements) == 2
+
+    # The trigram frequencies are counted once, then the search is a single statement
+    with count_statements() as statements:
+        assert client.get("/candidates/search", params={"q": "zubin mis"}).status_code == 200
+    assert len(statements) == 1
+
+    # Misspelled names still match, the closest first
+    assert [candidate["name"] for candidate in client.get("/candidates/search", params={"q": "zubni mistry"}).json()][:2] == ["zubin mistry", "zubin mistry junior"]
+    assert client.get("/candidates/search", params={"q": "zoya", "limit": 1}).json()[0]["id"] == ids[2]
+
+def test_search_ranks_bounded_candidates(monkeypatch):
+    ids = [client.post("/candidate/", json={"name": f"xavier {suffix}", "email": f"xavier.{suffix}@search.test", "status": "active"}).json()["id"] for suffix in ("one", "two", "three")]
+    assert sorted(candidate["id"] for candidate in client.get("/candidates/search", params={"q": "xavier"}).json()) == ids
+
+    # Only the first records of the rarest trigrams are ranked past the candidates limit
+    monkeypatch.setattr(search, "SEARCH_MAX_CANDIDATES", 2)
+    assert [candidate["id"] for candidate in client.get("/candidates/search", params={"q": "xavier"}).json()] == ids[:2]
+
+def test_search_follows_updates_and_deletes():
+    candidate_id = client.post("/candidate/", json={"name": "qadir", "email": "qadir@search.test", "status": "active"}).json()["id"]
+    client.patch(f"/candidate/{candidate_id}", json={"name": "quentin"})
+    assert client.get("/candidates/search", params={"q": "qadir"}).status_code == 404
+    assert client.get("/candidates/search", params={"q": "quentin"}).json()[0]["id"] == candidate_id
+    client.delete(f"/candidate/{candidate_id}")
+    assert client.get("/candidates/search", params={"q": "quentin"}).json() == {"detail":"Candidate not found"}
+
+def test_search_employees():
+    employee_id = client.post("/employee/", json={"name": "yamini", "email": "yamini@search.test", "designation": "Developer"}).json()["id"]
+    assert client.get("/employees/search", params={"q": "yam"}).json()[0]["id"] == employee_id
+    client.request("DELETE", "/employees/", json={"ids": [employee_id]})
+    assert client.get("/employees/search", params={"q": "yam"}).status_code == 404
+
+def test_search_errors():
+    assert client.get("/candidates/search", params={"q": " "}).json() == {"detail":"Please enter the search text"}
+    assert client.get("/employees/search", params={"q": "a", "limit": 0}).json() == {"detail":"Please enter a positive limit"}
+
+
+# =====================================================
+# CHANGE LOG TESTS
+# =====================================================
+
+
+def read_change_log(entity, record_id, since=0):
+    with Session(engine) as db:
+        log = models.ChangeLog
+        return db.query(log.operation, log.worker).filter(log.entity == entity, log.record_id == record_id, log.id > since).order_by(log.id).all()
+
+def test_change_log_follows_writes():
+    # Ids of deleted records may be handed out again, only the entries of this test are compared
+    with Session(engine) as db:
+        since = db.query(func.max(models.ChangeLog.id)).scalar() or 0
+    candidate_id = client.post("/candidate/", json={"name": "tanvi", "email": "tanvi@gmail.com", "status": "active"}).json()["id"]
+    client.patch(f"/candidate/{candidate_id}", json={"status": "inactive"})
+    client.delete(f"/candidate/{candidate_id}")
+    assert read_change_log("candidate", candidate_id, since) == [("insert", changelog.WORKER_ID), ("update", changelog.WORKER_ID), ("delete", changelog.WORKER_ID)]
+
+    candidate_id = client.post("/candidate/", json={"name": "tarun", "email": "tarun@gmail.com", "status": "active"}).json()["id"]
+    interviews = client.post("/interviews/schedule", json={"round": 3, "employee_id": 2, "candidate_ids": [candidate_id]}).json()["created"]
+    assert [operation for operation, _ in read_change_log("interview", interviews[0]["id"], since)] == ["insert"]
+
+def test_change_log_rolled_back_with_write():
+    client.post("/candidate/", json={"name": "once", "email": "once@gmail.com", "status": "active"})
+    with Session(engine) as db:
+        before = db.query(models.ChangeLog).count()
+    assert client.post("/candidate/", json={"name": "once", "email": "once@gmail.com", "status": "active"}).status_code == 400
+    assert client.patch("/candidate/100000", json={"status": "active"}).status_code == 404
+    with Session(engine) as db:
+        assert db.query(models.ChangeLog).count() == before
+
+def test_change_log_evicts_writes_of_other_process():
+    candidate_id = client.post("/candidate/", json={"name": "varun", "email": "varun@gmail.com", "status": "active"}).json()["id"]
+    employee_id = client.post("/employee/", json={"name": "vinay", "email": "vinay@gmail.com", "designation": "Developer"}).json()["id"]
+    interval = changelog.tailer.interval
+    try:
+        # Cache both records and move the tailer to the end of the log
+        changelog.tailer.interval = 0
+        assert client.get(f"/candidate/{candidate_id}").json()["name"] == "varun"
+        assert client.get(f"/employee/{employee_id}").status_code == 200
+        changelog.tailer.interval = 1e9
+
+        # Another process writes to the same database file
+        script = textwrap.dedent(f"""
+            import crud, database
+            db = database.SessionLocal()
+            assert crud.put_candidate(db, {candidate_id}, {{"name": "varun K"}}) == 1
+            assert crud.destroy_employee(db, {employee_id}) == 1
+        """)
+        env = dict(os.environ, SQLALCHEMY_DATABASE_URL=str(engine.url), SQLALCHEMY_ASYNC="false")
+        res = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, timeout=60)
+        assert res.returncode == 0, res.stderr
+
+        # The cache serves the stale records until the next poll of the change log
+        assert client.get(f"/candidate/{candidate_id}").json()["name"] == "varun"
+        changelog.tailer.interval = 0
+        assert client.get(f"/candidate/{candidate_id}").json()["name"] == "varun K"
+        assert client.get(f"/employee/{employee_id}").status_code == 404
+        assert client.get("/internal/cache").json()["change_log"]["evicted"] >= 2
+    finally:
+        changelog.tailer.interval = interval
+
+def test_change_log_tailer_reads_skipped_ids_again():
+    tailer = changelog.ChangeLogTailer(interval=0)
+    with Session(engine) as db:
+        tailer.poll(db)
+        start = tailer.position
+        db.execute(models.ChangeLog.__table__.insert(), [{"id": start + 2, "entity": "candidate", "record_id": 1, "operation": "update", "worker": "other"}])
+        db.commit()
+        tailer.poll(db)
+        assert (tailer.position, sorted(tailer.gaps)) == (start + 2, [start + 1])
+
+        # The transaction holding the skipped id commits later
+        crud.cache.candidates.set(2, "stale")
+        db.execute(models.ChangeLog.__table__.insert(), [{"id": start + 1, "entity": "candidate", "record_id": 2, "operation": "update", "worker": "other"}])
+        db.commit()
+        tailer.poll(db)
+        assert tailer.gaps == {}
+        assert crud.cache.candidates.get(2) is None
+
+def last_change():
+    with Session(engine) as db:
+        return db.query(func.max(models.ChangeLog.id)).scalar() or 0
+
+def test_change_feed_returns_writes_in_order():
+    since = last_change()
+    candidate_id = client.post("/candidate/", json={"name": "ujjwal", "email": "ujjwal@gmail.com", "status": "active"}).json()["id"]
+    client.patch(f"/candidate/{candidate_id}", json={"status": "inactive"})
+    client.delete(f"/candidate/{candidate_id}")
+    res = client.get(f"/changes?since={since}")
+    assert res.status_code == 200
+    changes = res.json()["changes"]
+    assert [(change["entity"], change["id"], change["operation"]) for change in changes] == [("candidate", candidate_id, operation) for operation in ("insert", "update", "delete")]
+    assert [change["seq"] for change in changes] == [since + 1, since + 2, since + 3]
+    assert res.json()["next"] == since + 3
+
+    # The next position pages through the log and stays put at its end
+    assert client.get(f"/changes?since={since}&limit=2").json()["next"] == since + 2
+    assert client.get(f"/changes?since={since + 3}").json() == {"changes": [], "next": since + 3}
+
+def test_change_feed_stops_before_recent_gap():
+    since = last_change()
+    table = models.ChangeLog.__table__
+    with Session(engine) as db:
+        db.execute(table.insert(), [{"id": since + 2, "entity": "candidate", "record_id": 1, "operation": "update", "worker": "other"}])
+        db.commit()
+    assert client.get(f"/changes?since={since}").json() == {"changes": [], "next": since}
+
+    # The transaction holding the skipped id commits
+    with Session(engine) as db:
+        db.execute(table.insert(), [{"id": since + 1, "entity": "candidate", "record_id": 2, "operation": "update", "worker": "other"}])
+        db.commit()
+    assert [change["seq"] for change in client.get(f"/changes?since={since}").json()["changes"]] == [since + 1, since + 2]
+
+    # A skipped id older than the gap timeout was rolled back
+    with Session(engine) as db:
+        db.execute(table.insert(), [{"id": since + 4, "entity": "candidate", "record_id": 3, "operation": "update", "worker": "other", "created_at": datetime.datetime(2000, 1, 1)}])
+        db.commit()
+    assert client.get(f"/changes?since={since + 2}").json()["next"] == since + 4
+
+def test_change_feed_long_poll(monkeypatch):
+    monkeypatch.setattr(changelog, "CHANGE_FEED_POLL_INTERVAL", 0.05)
+    since = last_change()
+    start = time.monotonic()
+    assert client.get(f"/changes?since={since}&wait=0.2").json() == {"changes": [], "next": since}
+    assert time.monotonic() - start >= 0.15
+
+    # A write made while the request waits is returned at once
+    def write():
+        time.sleep(0.3)
+        with Session(engine) as db:
+            crud.create_candidate(db, schemas.CandidateBase(name="udit", email="udit@gmail.com", status="active"))
+    writer = threading.Thread(target=write)
+    writer.start()
+    start = time.monotonic()
+    changes = client.get(f"/changes?since={since}&wait=10").json()["changes"]
+    writer.join()
+    assert [(change["entity"], change["operation"]) for change in changes] == [("candidate", "insert")]
+    assert time.monotonic() - start < 5
+
+def test_change_feed_invalid_parameters():
+    assert client.get("/changes?since=-1").json()["detail"] == "Please enter a non-negative since"
+    assert client.get("/changes?limit=0").json()["detail"] == "Please enter a positive limit"
+    assert client.get("/changes?wait=31").json()["detail"] == "Please enter a wait between 0 and 30 seconds"
+
+
+# =====================================================
+# EXPAND TESTS
+# =====================================================
+
+
+def test_read_interview_expand():
+    res = client.get("/interview/1?expand=candidate,employee")
+    assert res.status_code == 200
+    assert res.json() == {
+  "id": 1,
+  "round": 1,
+  "candidate_id": 1,
+  "employee_id": 1,
+  "candidate": {"id": 1, "name": "vardhman", "email": "vardhman@gmail.com", "status": "pre-hire"},
+  "employee": {"id": 1, "name": "jatin", "email": "jatin@gmail.com", "designation": "CEO"}
+}
+
+def test_read_interviews_expand_single_query():
+    with count_statements() as statements:
+        res = client.get("/interviews/?candidate_id=1&expand=employee")
+    assert res.status_code == 200
+    assert [(interview["id"], interview["employee"]["name"]) for interview in res.json()] == [(1, "jatin"), (4, "mayank D")]
+    assert all("candidate" not in interview for interview in res.json())
+    assert len(statements) == 1
+
+def test_read_interviews_invalid_expand():
+    res = client.get("/interviews/?expand=salary")
+    assert res.status_code == 400
+    assert res.json() == {"detail":"Interview can not be expanded with salary"}
+
+
+# =====================================================
+# ETAG TESTS
+# =====================================================
+
+
+def test_read_candidate_etag_not_modified():
+    res = client.get("/candidate/2")
+    assert res.status_code == 200
+    etag = res.headers["etag"]
+    assert "version" not in res.json()
+
+    with count_statements() as statements:
+        res = client.get("/candidate/2", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers["etag"] == etag
+    assert res.content == b""
+    assert statements == []
+
+def test_read_employee_etag_version_only_query():
+    etag = client.get("/employee/2").headers["etag"]
+    crud.cache.employees.clear()
+    with count_statements() as statements:
+        res = client.get("/employee/2", headers={"If-None-Match": f'W/{etag}, "other"'})
+    assert res.status_code == 304
+    assert len(statements) == 1
+    assert "version" in statements[0] and "designation" not in statements[0]
+
+def test_read_candidate_etag_changes_on_update():
+    res = client.post("/candidate/", json={"name": "etag", "email": "etag@gmail.com", "status": "active"})
+    candidate_id = res.json()["id"]
+    etag = client.get(f"/candidate/{candidate_id}").headers["etag"]
+    assert client.put(f"/candidate/{candidate_id}", json={"name": "etag K", "email": "etag@gmail.com", "status": "active"}).status_code == 200
+
+    res = client.get(f"/candidate/{candidate_id}", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.json()["name"] == "etag K"
+    assert res.headers["etag"] != etag
+
+def test_read_interview_expand_etag():
+    res = client.get("/interview/2?expand=candidate,employee")
+    assert res.status_code == 200
+    etag = res.headers["etag"]
+    assert client.get("/interview/2?expand=candidate,employee", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/interview/2", headers={"If-None-Match": etag}).status_code == 200
+
+def test_read_missing_candidate_with_etag():
+    res = client.get("/candidate/100000", headers={"If-None-Match": '"1"'})
+    assert res.status_code == 404
+
+
+# =====================================================
+# SERIALIZATION TESTS
+# =====================================================
+
+
+@pytest.mark.parametrize("path, schema, expand", [
+    ("/candidates/?status=active", schemas.Candidate, None),
+    ("/employees/", schemas.Employee, None),
+    ("/interviews/?candidate_id=1&expand=employee", schemas.InterviewExpanded, ("employee",)),
+])
+def test_fast_json_same_bytes_as_response_model(path, schema, expand):
+    res = client.get(path)
+    assert res.status_code == 200
+
+    # Render the same records through the response model the way fastapi does
+    with Session(database.engine) as db:
+        if expand:
+            records = [main.expand_interview(interview, expand) for interview in crud.get_interviews(db, candidate_id=1, expand=expand)]
+        elif schema is schemas.Candidate:
+            records = crud.get_candidates(db, status="active")
+        else:
+            records = crud.get_employees(db)
+        expected = [schema.from_orm(record) for record in records]
+    assert res.content == JSONResponse(jsonable_encoder(expected, exclude_none=bool(expand))).body
+
+def test_fast_json_keeps_headers():
+    res = client.get("/candidates/?limit=1")
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/json"
+    assert "x-next-cursor" in res.headers
+    assert "server-timing" in res.headers
+
+def test_fast_json_keeps_repeated_headers():
+    @serialization.fast_json(schemas.Candidate)
+    def endpoint(response):
+        response.set_cookie("first", "1")
+        response.set_cookie("second", "2")
+        return [schemas.Candidate(id=1, name="asha", email="asha@gmail.com", status="active")]
+
+    if not serialization.FAST_JSON:
+        pytest.skip("the response model renders the records when FAST_JSON is disabled")
+    res = endpoint(response=Response())
+    cookies = [value for name, value in res.raw_headers if name == b"set-cookie"]
+    assert [cookie.split(b";")[0] for cookie in cookies] == [b"first=1", b"second=2"]
+    assert res.headers["content-type"] == "application/json"
+    assert json.loads(res.body) == [{"id": 1, "name": "asha", "email": "asha@gmail.com", "status": "active"}]
+
+
+def test_read_only_rows_are_not_tracked():
+    with Session(database.engine) as db:
+        rows = crud.get_candidates(db, status="active", read_only=True)
+        assert rows and len(db.identity_map) == 0
+        assert schemas.Candidate.from_orm(rows[0]) == schemas.Candidate.from_orm(crud.get_candidates(db, status="active")[0])
+
+        interviews = crud.get_interviews(db, candidate_id=1, expand=("employee",), read_only=True)
+        assert interviews[0].employees.name == "jatin"
+
+
+# =====================================================
+# SCHEMA TESTS
+# =====================================================
+
+
+def test_create_schema_adds_indexes_to_existing_tables(tmp_path):
+    old_engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old_engine.begin() as conn:
+        conn.execute(text("create table candidates (id integer primary key, name varchar(50) not null, email varchar(50) not null unique, status varchar(50) not null)"))
+        conn.execute(text("insert into candidates (name, email, status) values ('asha', 'asha@gmail.com', 'active')"))
+
+    created = schema.create_schema(old_engine)
+    assert created == ["candidates.version", "ix_candidates_id", "ix_candidates_name_status", "ix_candidates_status"]
+    assert schema.ensure_indexes(old_engine) == []
+
+    with old_engine.connect() as conn:
+        plan = conn.execute(text("explain query plan select id from candidates where status = 'active' order by id")).all()
+    assert "ix_candidates_status" in str(plan)
+    with Session(old_engine) as db:
+        assert db.get(models.Candidate, 1).version == 1
+
+def test_create_schema_replaces_retired_interview_index(tmp_path):
+    old_engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    models.Base.metadata.create_all(bind=old_engine)
+    with old_engine.begin() as conn:
+        conn.execute(text("drop index uq_interviews_candidate_employee"))
+        conn.execute(text("create index ix_interviews_candidate_employee on interviews (candidate_id, employee_id)"))
+
+    assert schema.create_schema(old_engine) == ["uq_interviews_candidate_employee"]
+    indexes = {index["name"]: index["unique"] for index in inspect(old_engine).get_indexes("interviews")}
+    assert "ix_interviews_candidate_employee" not in indexes
+    assert indexes["uq_interviews_candidate_employee"]
+
+def test_sync_schema_with_duplicate_interviews(tmp_path):
+    old_engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    models.Base.metadata.create_all(bind=old_engine)
+    with old_engine.begin() as conn:
+        conn.execute(text("drop index uq_interviews_candidate_employee"))
+        conn.execute(text("insert into candidates (id, name, email, status) values (1, 'asha', 'asha@gmail.com', 'active')"))
+        conn.execute(text("insert into employees (id, name, email, designation) values (1, 'farhan', 'farhan@gmail.com', 'CEO')"))
+        conn.execute(text("insert into interviews (id, round, candidate_id, employee_id) values (1, 1, 1, 1), (2, 2, 1, 1), (3, 3, 1, 1)"))
+
+    # The duplicates are listed and the schema is left unsynced
+    with pytest.raises(RuntimeError, match=r"uq_interviews_candidate_employee.*\(1, 1\) ids \[1, 2, 3\]"):
+        schema.sync_schema(old_engine)
+    assert "uq_interviews_candidate_employee" not in {index["name"] for index in inspect(old_engine).get_indexes("interviews")}
+
+    # Deduping keeps the first interview of the pair and logs the deletes
+    assert schema.sync_schema(old_engine, dedupe=True) == ["uq_interviews_candidate_employee"]
+    with Session(old_engine) as db:
+        assert db.query(models.Interview.id).all() == [(1,)]
+        assert db.query(models.ChangeLog.record_id, models.ChangeLog.operation).all() == [(2, "delete"), (3, "delete")]
+
+def test_create_schema_backfills_search_index(tmp_path):
+    old_engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old_engine.begin() as conn:
+        conn.execute(text("create table employees (id integer primary key, name varchar(50) not null, email varchar(50) not null unique, designation varchar(50) not null)"))
+        conn.execute(text("insert into employees (name, email, designation) values ('farhan', 'farhan@gmail.com', 'CEO')"))
+
+    schema.create_schema(old_engine)
+    with Session(old_engine) as db:
+        assert [employee.id for employee in crud.search_employees(db, "farh")] == [1]
+
+def test_sync_schema_skips_unchanged_schema(tmp_path):
+    new_engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    assert schema.sync_schema(new_engine) == []
+
+    statements = []
+    event.listen(new_engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    assert schema.sync_schema(new_engine) is None
+    assert len(statements) == 1
+
+    with new_engine.begin() as conn:
+        conn.execute(schema.schema_fingerprint.update().values(fingerprint="outdated"))
+    assert schema.sync_schema(new_engine) == []
+    assert schema.sync_schema(new_engine) is None
+
+def test_import_does_not_touch_database(tmp_path):
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URL=f"sqlite:///{tmp_path / 'cold.db'}")
+    res = subprocess.run([sys.executable, "-c", "import main"], cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, timeout=60)
+    assert res.returncode == 0, res.stderr
+    assert not (tmp_path / "cold.db").exists()
+
+def test_startup_report():
+    res = client.get("/internal/startup")
+    assert res.status_code == 200
+    assert set(res.json()["phases"]) == {"boot", "connect", "schema", "total"}
+    assert res.json()["schema"] in ("synced", "unchanged")
+
+# =====================================================
+# EXPORT TESTS
+# =====================================================
+
+
+def test_export_candidates_ndjson():
+    res = client.get("/candidates/export")
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert rows[0] == {"id": 1, "name": "vardhman", "email": "vardhman@gmail.com", "status": "pre-hire", "version": 1}
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+    with Session(database.engine) as db:
+        assert len(rows) == db.query(models.Candidate).count()
+
+def test_export_employees_csv():
+    res = client.get("/employees/export?format=csv")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/csv")
+    assert res.headers["content-disposition"] == 'attachment; filename="employees.csv"'
+    lines = res.text.splitlines()
+    assert lines[0] == "id,name,email,designation,version"
+    assert lines[1] == "1,jatin,jatin@gmail.com,CEO,1"
+
+def test_export_interviews_single_statement():
+    with count_statements() as statements:
+        res = client.get("/interviews/export")
+    assert res.status_code == 200
+    assert json.loads(res.text.splitlines()[0]) == {"id": 1, "round": 1, "candidate_id": 1, "employee_id": 1, "version": 1}
+    assert len(statements) == 1
+
+def test_export_invalid_format():
+    res = client.get("/candidates/export?format=xml")
+    assert res.status_code == 400
+    assert res.json() == {"detail":"Please enter the format as ndjson or csv"}
+
+# =====================================================
+# METRICS TESTS
+# =====================================================
+
+
+def test_server_timing_header():
+    res = client.get("/candidates/?status=active")
+    assert res.status_code == 200
+    timing = dict(metric.split(";", 1) for metric in res.headers["server-timing"].split(", "))
+    assert set(timing) == {"db", "app", "serialize", "total"}
+    assert timing["db"].endswith('desc="1 queries"')
+
+def test_server_timing_header_on_error():
+    res = client.get("/candidate/100000")
+    assert res.status_code == 404
+    assert "total;dur=" in res.headers["server-timing"]
+
+def test_metrics():
+    client.get("/employee/1")
+    client.get("/employees/?designation=Developer")
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    assert '# TYPE http_request_duration_seconds histogram' in res.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/employees/",le="+Inf"}' in res.text
+    assert 'http_request_queries_bucket{method="GET",route="/employee/{employee_id}",le="+Inf"}' in res.text
+    assert "/employees/?designation" not in res.text
+
+def test_metrics_counts_queries_per_route():
+    before = metrics.routes.snapshot().get(("GET", "/employees/"))
+    client.get("/employees/?designation=Developer")
+    latency, queries = metrics.routes.snapshot()[("GET", "/employees/")]
+    assert queries["count"] == (before[1]["count"] if before else 0) + 1
+    assert queries["sum"] == (before[1]["sum"] if before else 0) + 1
+
+
+# =====================================================
+# BENCHMARK TESTS
+# =====================================================
+
+
+def test_bench_covers_every_route():
+    assert bench.missing_routes(app, 100) == []
+
+def test_bench_compare():
+    baseline = {"GET /candidates/": {"p95_ms": 10.0, "queries": 1.0}}
+    assert bench.compare({"GET /candidates/": {"p95_ms": 11.0, "queries": 1.0}}, baseline, 0.2) == []
+    assert bench.compare({"GET /candidates/": {"p95_ms": 13.0, "queries": 2.0}}, baseline, 0.2) == [
+        "GET /candidates/: p95 10.00 ms -> 13.00 ms",
+        "GET /candidates/: queries per request 1.00 -> 2.00",
+    ]
+
+def test_bench_run(tmp_path):
+    command = [sys.executable, "bench.py", "--rows", "30", "--requests", "2", "--database", str(tmp_path / "bench.db"), "--output", str(tmp_path / "bench_output.txt")]
+    res = subprocess.run(command + ["--save-baseline", str(tmp_path / "baseline.json")], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=120)
+    assert res.returncode == 0, res.stderr
+    with open(tmp_path / "baseline.json") as f:
+        routes = json.load(f)["routes"]
+    assert all(route["failures"] == 0 for route in routes.values())
+
+    res = subprocess.run(command + ["--compare", str(tmp_path / "baseline.json"), "--threshold", "1000"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=120)
+    assert res.returncode == 0, res.stderr
+    assert (tmp_path / "bench_output.txt").read_text().endswith("No regressions\n")
+
+
+# =====================================================
+# REPLICA TESTS
+# =====================================================
+
+
+@pytest.mark.parametrize("async_mode", ["false", "true"])
+def test_read_replicas(tmp_path, async_mode):
+    script = textwrap.dedent("""
+        from fastapi.testclient import TestClient
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+        import changelog, database, main, models, schema
+
+        # Every replica holds a candidate of its own, to tell which database served a read
+        for index, url in enumerate(database.SQLALCHEMY_READ_DATABASE_URLS):
+            replica = create_engine(url)
+            schema.sync_schema(replica)
+            with Session(replica) as db:
+                db.add(models.Candidate(name=f"replica {index}", email=f"replica{index}@gmail.com", status="active"))
+                db.commit()
+            replica.dispose()
+
+        with TestClient(main.app) as client:
+            # The reads go to the replicas in turn
+            names = [[candidate["name"] for candidate in client.get("/candidates/").json()] for _ in range(4)]
+            assert names == [["replica 0"], ["replica 1"], ["replica 0"], ["replica 1"]], names
+
+            # The writes go to the primary, then the reads of the same client follow them
+            res = client.post("/candidate/", json={"name": "asha", "email": "asha@gmail.com", "status": "active"})
+            assert res.status_code == 201, res.text
+            assert "read_primary_until" in res.headers["set-cookie"]
+            assert [candidate["name"] for candidate in client.get("/candidates/").json()] == ["asha"]
+            assert [candidate["name"] for candidate in client.get("/candidates/").json()] == ["asha"]
+
+            # Other clients keep reading from the replicas
+            with TestClient(main.app) as other:
+                assert [candidate["name"] for candidate in other.get("/candidates/").json()] == ["replica 0"]
+
+            # A malformed cookie reads from the replicas
+            client.cookies.set("read_primary_until", "soon")
+            assert [candidate["name"] for candidate in client.get("/candidates/").json()] == ["replica 1"]
+
+            assert len(client.get("/internal/pool").json()["replicas"]) == 2
+            assert changelog.tailer.stats()["replicas"] == 2
+    """)
+    replicas = ",".join(f"sqlite:///{tmp_path / f'replica{index}.db'}" for index in range(2))
+    env = dict(os.environ, SQLALCHEMY_ASYNC=async_mode, SQLALCHEMY_DATABASE_URL=f"sqlite:///{tmp_path / 'primary.db'}", SQLALCHEMY_READ_DATABASE_URL=replicas)
+    res = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, timeout=60)
+    assert res.returncode == 0, res.stderr
+
+
+@pytest.mark.parametrize("async_mode", ["false", "true"])
+def test_read_replicas_keep_cache_out_of_read_your_writes(tmp_path, async_mode):
+    script = textwrap.dedent("""
+        from fastapi.testclient import TestClient
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+        import database, main, models, schema
+
+        # The primary and the replica start from the same candidate, the replica never receives the write
+        for url in [database.SQLALCHEMY_DATABASE_URL] + database.SQLALCHEMY_READ_DATABASE_URLS:
+            seeded = create_engine(url)
+            schema.sync_schema(seeded)
+            with Session(seeded) as db:
+                db.add(models.Candidate(id=1, name="asha", email="asha@gmail.com", status="active"))
+                db.commit()
+            seeded.dispose()
+
+        with TestClient(main.app) as writer, TestClient(main.app) as reader:
+            etag = writer.get("/candidate/1").headers["ETag"]
+            assert writer.put("/candidate/1", json={"name": "asha K", "email": "asha@gmail.com", "status": "active"}).status_code == 200
+
+            # Another client caches the candidate from the lagging replica
+            assert reader.get("/candidate/1").json()["name"] == "asha"
+            assert reader.get("/candidate/1").json()["name"] == "asha"
+
+            # The writer still reads its own write, and its old copy is not confirmed as current
+            assert writer.get("/candidate/1").json()["name"] == "asha K"
+            res = writer.get("/candidate/1", headers={"If-None-Match": etag})
+            assert res.status_code == 200 and res.json()["name"] == "asha K", res.text
+    """)
+    replica = f"sqlite:///{tmp_path / 'replica.db'}"
+    env = dict(os.environ, SQLALCHEMY_ASYNC=async_mode, SQLALCHEMY_DATABASE_URL=f"sqlite:///{tmp_path / 'primary.db'}", SQLALCHEMY_READ_DATABASE_URL=replica)
+    res = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, timeout=60)
+    assert res.returncode == 0, res.stderr
+
+
+# =====================================================
+# ASYNC MODE TESTS
+# =====================================================
+
+
+def test_async_mode(tmp_path):
+    script = textwrap.dedent("""
+        import asyncio
+        from fastapi.testclient import TestClient
+        import database, main, models
+
+        assert asyncio.iscoroutinefunction(main.read_candidate)
+        with TestClient(main.app) as client:
+            assert client.get("/internal/startup").json()["schema"] == "synced"
+            res = client.post("/candidate/", json={"name": "asha", "email": "asha@gmail.com", "status": "active"})
+            assert res.status_code == 201, res.text
+            assert client.get(f"/candidate/{res.json()['id']}").json()["name"] == "asha"
+            assert client.put(f"/candidate/{res.json()['id']}", json={"name": "asha K", "email": "asha@gmail.com", "status": "active"}).status_code == 200
+            assert [candidate["name"] for candidate in client.get("/candidates/").json()] == ["asha K"]
+            assert client.get("/candidates/export?format=csv").text.splitlines() == ["id,name,email,status,version", f"{res.json()['id']},asha K,asha@gmail.com,active,2"]
+    """)
+    env = dict(os.environ, SQLALCHEMY_ASYNC="true", SQLALCHEMY_DATABASE_URL=f"sqlite:///{tmp_path / 'async.db'}")
+    res = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, timeout=60)
+    assert res.returncode == 0, res.stderr